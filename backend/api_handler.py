@@ -2,9 +2,15 @@ import os
 from openai import OpenAI
 from dotenv import load_dotenv
 import json
-import requests
+import hashlib
+import math
+import threading
+import time
+import uuid
 from bs4 import BeautifulSoup
 import re
+import unicodedata
+from http_client import http_get
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +24,41 @@ DISCOVERY_LEVELS = {
     5: {'exclude_known': 0, 'include_known': True, 'label': 'Comfort Zone'},  # Actively suggest from known
 }
 
+# Cache of recommendation results for identical effective prompt inputs (shared by workers via SQLite)
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv('RECOMMENDATION_CACHE_TTL_SECONDS', 900))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv('RECOMMENDATION_CACHE_MAX_ENTRIES', 500))
+
+# Exclusions listed in the prompt are capped at a token budget; the full set is
+# enforced by a local post-filter, over-generating when some are left out
+PROMPT_EXCLUSION_TOKEN_BUDGET = int(os.getenv('PROMPT_EXCLUSION_TOKEN_BUDGET', 400))
+EXCLUSION_OVERGENERATE_RATIO = float(os.getenv('EXCLUSION_OVERGENERATE_RATIO', 0.4))
+EXCLUSION_BACKFILL_ROUNDS = 1
+
+# Recommendations are matched against exclusions by a fuzzy artist-name index (cached per user)
+ARTIST_FUZZY_THRESHOLD = float(os.getenv('ARTIST_FUZZY_THRESHOLD', 0.7))   # trigram Jaccard similarity
+ARTIST_FUZZY_MIN_LENGTH = 5                                                  # shorter names only match exactly
+EXCLUSION_INDEX_MAX_USERS = int(os.getenv('EXCLUSION_INDEX_MAX_USERS', 100))
+EXCLUSION_INDEX_REBUILD_RATIO = 0.25   # names added since a user's index was built, before it's rebuilt
+_FEATURING_RE = re.compile(r'\s*[(\[]?\s*\b(?:feat|ft|featuring)\b.*$')
+_exclusion_lock = threading.Lock()
+_exclusion_indexes = {}
+_exclusion_filter_stats = {'checked': 0, 'exact': 0, 'fuzzy': 0, 'duplicate': 0}
+
+# Taste contexts by user: (synced_at of the taste data, context), see get_user_taste_context.
+# Least recently used first; only the TASTE_CONTEXT_MAX_USERS most recent users are kept.
+TASTE_CONTEXT_MAX_USERS = int(os.getenv('TASTE_CONTEXT_MAX_USERS', 100))
+_taste_context_lock = threading.Lock()
+_taste_contexts = {}
+
+# Identical LLM calls in flight at the same time share one request (see _coalesced_completion)
+LLM_COMPLETION_PARAMS = {'model': 'gpt-5.1', 'temperature': 0.7, 'max_completion_tokens': 1000}
+LLM_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('LLM_SINGLE_FLIGHT_TIMEOUT', 120))   # seconds to wait on another call
+LLM_SINGLE_FLIGHT_POLL_SECONDS = 0.1
+LLM_SINGLE_FLIGHT_RESULT_SECONDS = 30   # how long a finished call's response stays readable by waiters
+_inflight_lock = threading.Lock()
+_inflight_calls = {}
+_single_flight_stats = {'calls': 0, 'coalesced': 0}
+
 # Initialize OpenAI client (using US regional endpoint for business API key)
 client = OpenAI(
     api_key=os.getenv('OPENAI_API_KEY'),
@@ -29,7 +70,7 @@ def scrape_reddit_music(genre=None):
     try:
         url = "https://www.reddit.com/r/Music/hot.json?limit=25"
         headers = {'User-Agent': 'DailyJams/1.0'}
-        response = requests.get(url, headers=headers, timeout=5)
+        response = http_get(url, read_timeout=5, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -88,19 +129,16 @@ def search_trending_music(genres=None):
     else:
         return "Focus on popular artists from 2024-2025 based on your training data."
 
-def get_user_taste_context(user_id):
+def derive_taste_context(taste, genre_counts=None):
     """
-    Build taste context from user's synced Spotify data.
+    Derive the taste context from a user's synced Spotify data (see get_taste_data).
 
-    Returns dict with known_artists, top_genres, artist_count or None if no data.
-    """
-    from database import get_taste_data
-
-    taste = get_taste_data(user_id)
-    if not taste:
-        return None
+    Pass the user's precomputed genre_counts (see get_taste_genres) to rank
+    genres from them instead of counting the artists' genres here.
 
-    known_artists = set()
+    Returns dict with known_artists, top_genres, artist_count.
+    """
+    known_artists = {}   # insertion-ordered set: top artists come first
     favorite_genres = {}
 
     # Process each data type
@@ -114,20 +152,22 @@ def get_user_taste_context(user_id):
             for time_range, artists in data.items():
                 if isinstance(artists, list):
                     for artist in artists:
-                        known_artists.add(artist.get('name', ''))
+                        known_artists[artist.get('name', '')] = True
                         for genre in artist.get('genres', []):
                             favorite_genres[genre] = favorite_genres.get(genre, 0) + 1
         elif isinstance(data, list):
             # followed_artists, saved_tracks
             for artist in data:
-                known_artists.add(artist.get('name', ''))
+                known_artists[artist.get('name', '')] = True
                 for genre in artist.get('genres', []):
                     favorite_genres[genre] = favorite_genres.get(genre, 0) + 1
 
     # Remove empty strings
-    known_artists.discard('')
+    known_artists.pop('', None)
 
     # Sort genres by frequency
+    if genre_counts is not None:
+        favorite_genres = dict(genre_counts)
     top_genres = sorted(favorite_genres.items(), key=lambda x: -x[1])[:10]
 
     return {
@@ -137,17 +177,87 @@ def get_user_taste_context(user_id):
     }
 
 
-def get_music_recommendations(time_of_day, mood, tempo, instruments_yes, instruments_no, sources, excluded_bands=None, genres=None, trending_now=False, discover_new=False, interest=None, user_id=None, discovery_level=3, user_set_genres=False):
+def _cache_taste_context(user_id, entry):
+    """Cache a user's (synced_at, context) entry (None to drop it), evicting the least recently used."""
+    with _taste_context_lock:
+        _taste_contexts.pop(user_id, None)
+        if entry is not None:
+            _taste_contexts[user_id] = entry
+            while len(_taste_contexts) > TASTE_CONTEXT_MAX_USERS:
+                _taste_contexts.pop(next(iter(_taste_contexts)))
+
+
+def refresh_user_taste_context(user_id):
     """
-    Get music recommendations from ChatGPT based on user preferences.
+    Recompute a user's taste context from their synced data, then persist and cache it.
+
+    Called after a taste sync, so recommend requests never rebuild it.
+
+    Returns the context, or None if the user has no taste data.
+    """
+    from database import get_taste_data, get_taste_genres, save_taste_context
+
+    taste = get_taste_data(user_id)
+    if not taste:
+        _cache_taste_context(user_id, None)
+        return None
+
+    context = derive_taste_context(taste, get_taste_genres(user_id, limit=10))
+    save_taste_context(user_id, taste['synced_at'], context)
+    _cache_taste_context(user_id, (taste['synced_at'], context))
+    return context
+
+
+def get_user_taste_context(user_id):
+    """
+    Get the taste context for a user's synced Spotify data.
+
+    Served from memory, or from the copy saved at sync time, as long as it
+    was derived from the latest sync; otherwise it is recomputed.
+
+    Returns dict with known_artists, top_genres, artist_count or None if no data.
+    """
+    from database import get_taste_sync_status, get_taste_context
+
+    synced_at = get_taste_sync_status(user_id)['last_synced']
+    if not synced_at:
+        return None
+
+    with _taste_context_lock:
+        cached = _taste_contexts.pop(user_id, None)
+        if cached:
+            _taste_contexts[user_id] = cached
+    if cached and cached[0] == synced_at:
+        return cached[1]
+
+    stored = get_taste_context(user_id)
+    if stored and stored[0] == synced_at:
+        _cache_taste_context(user_id, stored)
+        return stored[1]
+
+    return refresh_user_taste_context(user_id)
+
+
+def build_recommendation_prompt(time_of_day, mood, tempo, instruments_yes, instruments_no, sources, excluded_bands=None, genres=None, trending_now=False, discover_new=False, interest=None, user_id=None, discovery_level=3, user_set_genres=False, count=5):
+    """
+    Build the ChatGPT prompt for a recommendation request.
+
+    excluded_bands should be in priority order (most important first): only
+    as many as fit in PROMPT_EXCLUSION_TOKEN_BUDGET are listed in the prompt.
+    When some are left out, extra recommendations are requested so the
+    caller can drop excluded ones and still return `count`.
+
+    Returns:
+        Tuple of (prompt, trending_bands_list, exclusions) where exclusions is
+        a dict with the full 'excluded' list, the number 'in_prompt' and the
+        number of recommendations to 'generate'
     """
 
     # Store trending bands for display
     trending_bands_list = []
 
-    # Build the prompt with only filled-in preferences
-    prompt = """You are a music discovery assistant. Based on the user's preferences, recommend 5 bands or artists that match their criteria.
-
+    # Build the prompt with only filled-in preferences (the intro with the count is added last)
+    prompt = """
 USER PREFERENCES:
 """
 
@@ -225,8 +335,16 @@ USER PREFERENCES:
     for source in sources:
         prompt += f"- {source['source_name']}: {source['description']}\n"
     
-    if excluded_bands and len(excluded_bands) > 0:
-        prompt += f"\nIMPORTANT: DO NOT suggest any of these bands (user has recently skipped them): {', '.join(excluded_bands)}\n"
+    excluded_bands = list(dict.fromkeys(band for band in excluded_bands if band))
+    prompt_exclusions = _budget_exclusions(excluded_bands)
+    if prompt_exclusions:
+        prompt += f"\nIMPORTANT: DO NOT suggest any of these bands (user has recently skipped them): {', '.join(prompt_exclusions)}\n"
+
+    # Ask for spares when the filter may have to drop exclusions the prompt left out
+    generate = count
+    if len(prompt_exclusions) < len(excluded_bands):
+        generate += math.ceil(count * EXCLUSION_OVERGENERATE_RATIO)
+    prompt = f"You are a music discovery assistant. Based on the user's preferences, recommend {generate} bands or artists that match their criteria.\n" + prompt
     
     prompt += """
 IMPORTANT: Return ONLY a valid JSON array with exactly this structure:
@@ -238,58 +356,538 @@ IMPORTANT: Return ONLY a valid JSON array with exactly this structure:
         "match_reason": "Why this matches the user's preferences"
     }
 ]
-
-Return 5 recommendations. Make sure the response is ONLY valid JSON, no other text.
 """
-    # DEBUG: Print the full prompt being sent to ChatGPT
-    print("\n" + "="*80)
-    print("📤 SENDING TO CHATGPT:")
-    print("="*80)
-    print(prompt)
-    print("="*80 + "\n")
-    
+    prompt += f"\nReturn {generate} recommendations. Make sure the response is ONLY valid JSON, no other text.\n"
+    exclusions = {'excluded': excluded_bands, 'in_prompt': len(prompt_exclusions), 'generate': generate}
+    return prompt, trending_bands_list, exclusions
+
+
+def estimate_tokens(text):
+    """Estimate the token count of prompt text (about 4 characters per token for English)."""
+    return -(-len(text) // 4)
+
+
+def _budget_exclusions(excluded_bands, budget=None):
+    """
+    Take exclusions in priority order until the prompt token budget is spent.
+
+    Returns:
+        List of band names to list in the prompt
+    """
+    budget = PROMPT_EXCLUSION_TOKEN_BUDGET if budget is None else budget
+    selected = []
+    for band in excluded_bands:
+        budget -= estimate_tokens(band + ', ')
+        if budget < 0:
+            break
+        selected.append(band)
+    return selected
+
+
+def _recommendation_messages(prompt):
+    """Chat messages for a recommendation prompt."""
+    return [
+        {"role": "system", "content": "You are a helpful music discovery assistant. You only respond with valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _mark_trending(rec, trending_now, trending_bands_list):
+    """Add the trending indicator to a recommendation."""
+    if trending_now and trending_bands_list:
+        rec['trending_enabled'] = True
+        rec['trending_count'] = len(trending_bands_list)
+    return rec
+
+
+def _count_llm_call(kind):
+    with _inflight_lock:
+        _single_flight_stats[kind] += 1
+
+
+def get_llm_single_flight_stats():
+    """Get this process's counts of LLM calls made vs. served by another in-flight call."""
+    with _inflight_lock:
+        return dict(_single_flight_stats)
+
+
+def _completion_params(count):
+    """Completion parameters for a request of `count` recommendations (output budget scales with count)."""
+    params = dict(LLM_COMPLETION_PARAMS)
+    params['max_completion_tokens'] *= max(1, -(-count // 5))
+    return params
+
+
+def _call_completion(messages, stream, params):
+    """Make one OpenAI chat completion call, yielding the response text."""
+    _count_llm_call('calls')
+    if stream:
+        response = client.chat.completions.create(messages=messages, stream=True, **params)
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    else:
+        response = client.chat.completions.create(messages=messages, **params)
+        yield response.choices[0].message.content
+
+
+def _cross_process_completion(call_key, messages, stream, params):
+    """
+    Make the call unless another worker process already has it in flight.
+
+    The llm_calls table acts as the lock: the worker that claims the key
+    makes the call and publishes the response text; the others poll for it.
+    If the owner fails or the wait exceeds LLM_SINGLE_FLIGHT_TIMEOUT, a
+    waiter makes the call itself. The result is read before every claim
+    attempt, so a call finished moments ago is reused rather than repeated.
+
+    Yields the response text and returns it in full.
+    """
+    from database import claim_llm_call, get_llm_call_result, finish_llm_call, release_llm_call
+
+    owner = f'{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}'
+    deadline = time.time() + LLM_SINGLE_FLIGHT_TIMEOUT
+    claimed = False
+    while time.time() < deadline:
+        text = get_llm_call_result(call_key)
+        if text is not None:
+            _count_llm_call('coalesced')
+            yield text
+            return text
+        claimed = claim_llm_call(call_key, owner, LLM_SINGLE_FLIGHT_TIMEOUT, LLM_SINGLE_FLIGHT_RESULT_SECONDS)
+        if claimed:
+            break
+        time.sleep(LLM_SINGLE_FLIGHT_POLL_SECONDS)
+
+    parts = []
     try:
-        # Call ChatGPT API
-        response = client.chat.completions.create(
-            model="gpt-5.1",
-            messages=[
-                {"role": "system", "content": "You are a helpful music discovery assistant. You only respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_completion_tokens=1000
-        )
-        
-        # Extract the response text
-        response_text = response.choices[0].message.content.strip()
-                # DEBUG: Print the raw response from ChatGPT
-        print("\n" + "="*80)
-        print("📥 RECEIVED FROM CHATGPT:")
-        print("="*80)
-        print(response_text)
-        print("="*80 + "\n")
-        
-        # Try to parse as JSON
-        try:
-            recommendations = json.loads(response_text)
-        except json.JSONDecodeError:
-            # If it's not valid JSON, try to extract JSON from the response
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
-            if start_idx != -1 and end_idx != 0:
-                json_str = response_text[start_idx:end_idx]
-                recommendations = json.loads(json_str)
-            else:
-                raise ValueError("Could not parse JSON from ChatGPT response")
-        
-        # Add trending indicator to each recommendation
-        if trending_now and trending_bands_list:
-            for rec in recommendations:
-                rec['trending_enabled'] = True
-                rec['trending_count'] = len(trending_bands_list)
-        
+        for chunk in _call_completion(messages, stream, params):
+            parts.append(chunk)
+            yield chunk
+    except BaseException:
+        if claimed:
+            release_llm_call(call_key, owner)
+        raise
+
+    text = ''.join(parts)
+    if claimed:
+        finish_llm_call(call_key, owner, text)
+    return text
+
+
+def _coalesced_completion(messages, stream=False, params=None):
+    """
+    Get the completion text for messages, sharing identical in-flight calls.
+
+    Within a process, concurrent callers with the same messages wait for the
+    first one's result; across processes they coordinate through the
+    llm_calls lock table. The leader streams chunks as they arrive when
+    stream=True; waiters get the full text as a single chunk.
+
+    Yields:
+        Response text chunks
+    """
+    params = params or LLM_COMPLETION_PARAMS
+    call_key = hashlib.sha256(json.dumps(
+        {'messages': messages, **params}, sort_keys=True
+    ).encode()).hexdigest()
+
+    with _inflight_lock:
+        call = _inflight_calls.get(call_key)
+        leader = call is None
+        if leader:
+            call = {'done': threading.Event(), 'text': None}
+            _inflight_calls[call_key] = call
+
+    if not leader:
+        call['done'].wait(LLM_SINGLE_FLIGHT_TIMEOUT)
+        if call['text'] is not None:
+            _count_llm_call('coalesced')
+            yield call['text']
+        else:
+            # The leader failed - make our own call
+            yield from _call_completion(messages, stream, params)
+        return
+
+    try:
+        call['text'] = yield from _cross_process_completion(call_key, messages, stream, params)
+    finally:
+        with _inflight_lock:
+            _inflight_calls.pop(call_key, None)
+        call['done'].set()
+
+
+def recommendation_cache_key(time_of_day, mood, tempo, instruments_yes, instruments_no, sources, excluded_bands=None, genres=None, trending_now=False, discover_new=False, interest=None, user_id=None, discovery_level=3, user_set_genres=False, count=5):
+    """
+    Build a canonical hash of the inputs that shape a recommendation prompt.
+
+    Takes the same arguments as get_music_recommendations. Free text is
+    casefolded and lists are sorted, so equivalent requests share a key.
+    The user's taste data only enters the key (as user id + last sync time)
+    if they have synced it, so profiles without taste data can share entries.
+    discover_new only matters through the exclusions it produces.
+    """
+    from database import get_taste_sync_status, normalize_artist_name
+
+    def text(value):
+        return ' '.join(str(value or '').casefold().split())
+
+    taste = None
+    if user_id:
+        status = get_taste_sync_status(user_id)
+        if status['has_data']:
+            taste = [user_id, status['last_synced']]
+
+    fields = {
+        'time_of_day': text(time_of_day),
+        'mood': text(mood),
+        'interest': text(interest),
+        'tempo': tempo,
+        'instruments_yes': sorted(text(i) for i in instruments_yes or []),
+        'instruments_no': sorted(text(i) for i in instruments_no or []),
+        'genres': sorted(text(g) for g in genres or []),
+        'sources': sorted(source['source_name'] for source in sources),
+        'excluded': sorted({normalize_artist_name(band) for band in excluded_bands or []}),
+        'trending_now': bool(trending_now),
+        'discovery_level': discovery_level,
+        'user_set_genres': bool(user_set_genres),
+        'taste': taste,
+        'count': count,
+    }
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _get_cached_recommendations(cache_key, excluded_bands, user_id, cache_info):
+    """
+    Look up a cached result, dropping any band the user now excludes (see exclusion_filter).
+
+    Fills cache_info (if given) with hit/miss metadata.
+
+    Returns:
+        List of recommendations, or None on a miss
+    """
+    from database import get_cached_recommendations
+
+    cached = get_cached_recommendations(cache_key, RECOMMENDATION_CACHE_TTL_SECONDS)
+    recommendations = None
+    if cached:
+        entries, age = cached
+        is_excluded = exclusion_filter(excluded_bands, user_id)
+        recommendations = [rec for rec in entries if not is_excluded(rec.get('band_name'))]
+        if recommendations:
+            print(f"♻️  Recommendation cache hit ({len(recommendations)} of {len(entries)} kept, {age:.0f}s old)")
+            if cache_info is not None:
+                cache_info.update({'hit': True, 'age_seconds': round(age, 1),
+                                   'filtered': len(entries) - len(recommendations)})
+            return recommendations
+
+    if cache_info is not None:
+        cache_info.update({'hit': False})
+    return None
+
+
+def _save_cached_recommendations(cache_key, recommendations):
+    """Store a successful result in the recommendation cache."""
+    from database import save_cached_recommendations
+
+    save_cached_recommendations(cache_key, recommendations, RECOMMENDATION_CACHE_TTL_SECONDS,
+                                RECOMMENDATION_CACHE_MAX_ENTRIES)
+
+
+def _parse_recommendations(response_text):
+    """Parse the JSON array of recommendations from a complete ChatGPT response."""
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        # If it's not valid JSON, try to extract JSON from the response
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']') + 1
+        if start_idx != -1 and end_idx != 0:
+            return json.loads(response_text[start_idx:end_idx])
+        raise ValueError("Could not parse JSON from ChatGPT response")
+
+
+def artist_match_key(name):
+    """
+    Reduce an artist name to the key used for exclusion matching.
+
+    Strips accents, case, punctuation, a leading "The" and featured-artist
+    suffixes, and spells "&" / "+" as "and", so "The Beatles", "beatles"
+    and "Beatles feat. Someone" share a key.
+    """
+    text = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = _FEATURING_RE.sub('', text)
+    text = re.sub(r'[&+]', ' and ', text)
+    words = re.sub(r'[\W_]+', ' ', text).split()
+    if len(words) > 1 and words[0] == 'the':
+        words = words[1:]
+    return ' '.join(words)
+
+
+def _trigrams(key):
+    padded = f' {key} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _build_exclusion_index(names):
+    """Build a matching index over artist names. It's never modified afterwards, so requests can share it."""
+    index = {'names': frozenset(names), 'keys': {}, 'grams': {}, 'postings': {}}
+    for name in index['names']:
+        key = artist_match_key(name)
+        if not key:
+            continue
+        if key in index['keys']:
+            index['keys'][key].add(name)
+            continue
+        index['keys'][key] = {name}
+        if len(key) >= ARTIST_FUZZY_MIN_LENGTH:
+            grams = _trigrams(key)
+            index['grams'][key] = grams
+            for gram in grams:
+                index['postings'].setdefault(gram, set()).add(key)
+    return index
+
+
+def _get_exclusion_index(user_id, names):
+    """
+    Get a matching index over excluded artist names for one request.
+
+    The user's cached base index is shared and never modified: names added
+    since it was built go into an overlay index of this request's own, and
+    names it doesn't exclude (e.g. a skip cooled down, or known artists the
+    cached and pooled paths don't re-check) are masked out. Once the added
+    names outgrow EXCLUSION_INDEX_REBUILD_RATIO of the base, a new base is
+    built from this request's names and replaces it.
+
+    Args:
+        user_id: User whose base index to use, or None for an uncached one
+        names: Every artist name excluded for this request
+
+    Returns:
+        Dict with the shared 'base' index, this request's 'overlay' index and
+        the 'removed' base names
+    """
+    names = frozenset(names)
+    with _exclusion_lock:
+        base = _exclusion_indexes.pop(user_id, None) if user_id else None
+        if base is not None:
+            _exclusion_indexes[user_id] = base
+
+    added = names - base['names'] if base is not None else names
+    removed = base['names'] - names if base is not None else frozenset()
+    if base is None or len(added) > EXCLUSION_INDEX_REBUILD_RATIO * len(base['names']):
+        base = _build_exclusion_index(names)
+        added = removed = frozenset()
+        if user_id:
+            with _exclusion_lock:
+                _exclusion_indexes.pop(user_id, None)
+                _exclusion_indexes[user_id] = base
+                while len(_exclusion_indexes) > EXCLUSION_INDEX_MAX_USERS:
+                    _exclusion_indexes.pop(next(iter(_exclusion_indexes)))
+    return {'base': base, 'overlay': _build_exclusion_index(added), 'removed': removed}
+
+
+def _match_index(index, key, removed):
+    """Check a match key against one index, ignoring keys only its removed names had: 'exact', 'fuzzy' or None."""
+    def live(candidate):
+        return not removed or not index['keys'][candidate] <= removed
+
+    if key in index['keys'] and live(key):
+        return 'exact'
+    if len(key) < ARTIST_FUZZY_MIN_LENGTH:
+        return None
+
+    grams = _trigrams(key)
+    postings = index['postings']
+    rarest = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+    prefix = len(grams) - math.ceil(ARTIST_FUZZY_THRESHOLD * len(grams)) + 1
+    candidates = set().union(*(postings.get(gram, ()) for gram in rarest[:prefix]))
+    for candidate in candidates:
+        other = index['grams'][candidate]
+        shared = len(grams & other)
+        if shared >= ARTIST_FUZZY_THRESHOLD * (len(grams) + len(other) - shared) and live(candidate):
+            return 'fuzzy'
+    return None
+
+
+def _match_exclusion(index, key):
+    """
+    Check a match key against an exclusion index from _get_exclusion_index.
+
+    An exact key match is tried first, then trigram similarity. Candidates
+    come from the posting lists of the query's rarest trigrams: any key
+    with Jaccard similarity >= ARTIST_FUZZY_THRESHOLD must share one of them.
+
+    Returns:
+        'exact', 'fuzzy' or None
+    """
+    matches = [_match_index(index['overlay'], key, ()), _match_index(index['base'], key, index['removed'])]
+    if 'exact' in matches:
+        return 'exact'
+    return 'fuzzy' if 'fuzzy' in matches else None
+
+
+def exclusion_filter(excluded_bands, user_id=None):
+    """
+    Get a check for excluded artists that matches the way fresh recommendations
+    are filtered: by artist_match_key, exactly or fuzzily, against the user's
+    exclusion index. Use it wherever already generated recommendations
+    (cached, pooled, prefetched) are served.
+
+    Args:
+        excluded_bands: Band names the user currently excludes
+        user_id: User whose cached exclusion index to use
+
+    Returns:
+        Function taking a band name and returning True if it's excluded
+    """
+    index = _get_exclusion_index(user_id, [band for band in excluded_bands or [] if band])
+
+    def is_excluded(band_name):
+        key = artist_match_key(band_name)
+        match = _match_exclusion(index, key) if key else None
+        with _exclusion_lock:
+            _exclusion_filter_stats['checked'] += 1
+            if match:
+                _exclusion_filter_stats[match] += 1
+        return bool(match)
+
+    return is_excluded
+
+
+def get_exclusion_filter_stats():
+    """Get this process's counts of recommendations checked vs. filtered (exact/fuzzy exclusion match or repeat)."""
+    with _exclusion_lock:
+        return dict(_exclusion_filter_stats)
+
+
+def _generate_recommendations(prompt_args, count, stream, cache_info):
+    """
+    Generate `count` recommendations, enforcing every exclusion locally.
+
+    The prompt only lists the exclusions that fit its token budget, so each
+    recommendation is checked against the full set (and against the ones
+    already accepted) using the user's fuzzy exclusion index, so respellings
+    like "Beatles" for "The Beatles" are caught. If too many are dropped, a backfill call asks for
+    the shortfall with the dropped names listed first.
+
+    Fills cache_info (if given) with the prompt token estimate and
+    exclusion counts.
+
+    Yields:
+        Each accepted recommendation dict; returns the list of them
+    """
+    trending_now = prompt_args['trending_now']
+    accepted = []
+    accepted_keys = set()
+    dropped = []
+    index = None
+    prompt_tokens = 0
+    for attempt in range(1 + EXCLUSION_BACKFILL_ROUNDS):
+        needed = count - len(accepted)
+        if attempt:
+            if needed <= 0 or not dropped:
+                break
+            print(f"🔁 Backfilling {needed} recommendation(s) after dropping {len(dropped)} excluded")
+            recent = dropped + [rec['band_name'] for rec in accepted]
+            prompt_args = dict(prompt_args, excluded_bands=recent + list(prompt_args['excluded_bands'] or []),
+                               trending_now=False)
+
+        prompt, trending_bands, exclusions = build_recommendation_prompt(**prompt_args, count=needed)
+        if index is None:
+            index = _get_exclusion_index(prompt_args['user_id'], exclusions['excluded'])
+            trending_bands_list = trending_bands
+            exclusion_counts = {'total': len(exclusions['excluded']), 'in_prompt': exclusions['in_prompt']}
+        messages = _recommendation_messages(prompt)
+        prompt_tokens += sum(estimate_tokens(message['content']) for message in messages)
+        params = _completion_params(exclusions['generate'])
+
+        if stream:
+            print("📤 STREAMING FROM CHATGPT...")
+            recommendations = iter_json_array_objects(_coalesced_completion(messages, stream=True, params=params))
+        else:
+            # DEBUG: Print the full prompt being sent to ChatGPT
+            print("\n" + "="*80)
+            print("📤 SENDING TO CHATGPT:")
+            print("="*80)
+            print(prompt)
+            print("="*80 + "\n")
+
+            # Call ChatGPT API (sharing the call with identical in-flight requests)
+            response_text = ''.join(_coalesced_completion(messages, params=params)).strip()
+            # DEBUG: Print the raw response from ChatGPT
+            print("\n" + "="*80)
+            print("📥 RECEIVED FROM CHATGPT:")
+            print("="*80)
+            print(response_text)
+            print("="*80 + "\n")
+            recommendations = _parse_recommendations(response_text)
+
+        # Read the whole response even once `count` are accepted, so coalesced callers get it all
+        for rec in recommendations:
+            if not rec.get('band_name'):
+                continue
+            key = artist_match_key(rec['band_name'])
+            match = 'duplicate' if key in accepted_keys else _match_exclusion(index, key)
+            with _exclusion_lock:
+                _exclusion_filter_stats['checked'] += 1
+                if match:
+                    _exclusion_filter_stats[match] += 1
+            if match:
+                dropped.append(rec['band_name'])
+                continue
+            if len(accepted) >= count:
+                continue
+            accepted_keys.add(key)
+            _mark_trending(rec, trending_now, trending_bands_list)
+            accepted.append(dict(rec))
+            yield rec
+
+    print(f"📏 Prompt ~{prompt_tokens} tokens: {exclusion_counts['in_prompt']}/{exclusion_counts['total']} "
+          f"exclusions listed, {len(dropped)} filtered locally")
+    if cache_info is not None:
+        cache_info.update({
+            'prompt_tokens': prompt_tokens,
+            'exclusions': dict(exclusion_counts, filtered=len(dropped)),
+        })
+    return accepted
+
+
+def get_music_recommendations(time_of_day, mood, tempo, instruments_yes, instruments_no, sources, excluded_bands=None, genres=None, trending_now=False, discover_new=False, interest=None, user_id=None, discovery_level=3, user_set_genres=False, count=5, cache_info=None):
+    """
+    Get music recommendations from ChatGPT based on user preferences.
+
+    Identical requests within RECOMMENDATION_CACHE_TTL_SECONDS are served from
+    the recommendation cache. Pass a dict as cache_info to receive hit/miss
+    metadata and the prompt token and exclusion counts.
+    """
+    cache_key = recommendation_cache_key(
+        time_of_day, mood, tempo, instruments_yes, instruments_no, sources,
+        excluded_bands=excluded_bands, genres=genres, trending_now=trending_now,
+        discover_new=discover_new, interest=interest, user_id=user_id,
+        discovery_level=discovery_level, user_set_genres=user_set_genres,
+        count=count
+    )
+    cached = _get_cached_recommendations(cache_key, excluded_bands, user_id, cache_info)
+    if cached:
+        return cached
+
+    prompt_args = dict(
+        time_of_day=time_of_day, mood=mood, tempo=tempo, instruments_yes=instruments_yes,
+        instruments_no=instruments_no, sources=sources,
+        excluded_bands=excluded_bands, genres=genres, trending_now=trending_now,
+        discover_new=discover_new, interest=interest, user_id=user_id,
+        discovery_level=discovery_level, user_set_genres=user_set_genres
+    )
+
+    try:
+        recommendations = list(_generate_recommendations(prompt_args, count, False, cache_info))
+        if recommendations:
+            _save_cached_recommendations(cache_key, recommendations)
         return recommendations
-    
+
     except Exception as e:
         print(f"Error calling ChatGPT API: {str(e)}")
         return [{
@@ -298,3 +896,96 @@ Return 5 recommendations. Make sure the response is ONLY valid JSON, no other te
             "description": f"Sorry, there was an error getting recommendations: {str(e)}",
             "match_reason": "N/A"
         }]
+
+
+def iter_json_array_objects(chunks):
+    """
+    Incrementally parse a streamed JSON array of objects.
+
+    Scans text chunks as they arrive and yields each top-level object as
+    soon as its closing brace is seen, without waiting for the whole
+    array. Text outside the objects (brackets, commas, code fences) is
+    ignored.
+
+    Args:
+        chunks: Iterable of text chunks
+
+    Yields:
+        Parsed dict for each complete object
+    """
+    buffer = ''
+    depth = 0
+    start = None
+    in_string = False
+    escaped = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        offset = len(buffer)
+        buffer += chunk
+
+        for i in range(offset, len(buffer)):
+            char = buffer[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = depth > 0
+            elif char == '{':
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif char == '}' and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield json.loads(buffer[start:i + 1])
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed recommendation: {str(e)}")
+                    start = None
+
+        # Keep only the object currently being read
+        if depth == 0:
+            buffer = ''
+        elif start:
+            buffer = buffer[start:]
+            start = 0
+
+
+def stream_music_recommendations(time_of_day, mood, tempo, instruments_yes, instruments_no, sources, excluded_bands=None, genres=None, trending_now=False, discover_new=False, interest=None, user_id=None, discovery_level=3, user_set_genres=False, count=5, cache_info=None):
+    """
+    Stream music recommendations from ChatGPT as they are generated.
+
+    Takes the same arguments as get_music_recommendations, but yields each
+    recommendation dict as soon as the model has finished writing it.
+    A cache hit yields the cached result at once.
+    API errors are raised to the caller.
+    """
+    cache_key = recommendation_cache_key(
+        time_of_day, mood, tempo, instruments_yes, instruments_no, sources,
+        excluded_bands=excluded_bands, genres=genres, trending_now=trending_now,
+        discover_new=discover_new, interest=interest, user_id=user_id,
+        discovery_level=discovery_level, user_set_genres=user_set_genres,
+        count=count
+    )
+    cached = _get_cached_recommendations(cache_key, excluded_bands, user_id, cache_info)
+    if cached:
+        yield from cached
+        return
+
+    prompt_args = dict(
+        time_of_day=time_of_day, mood=mood, tempo=tempo, instruments_yes=instruments_yes,
+        instruments_no=instruments_no, sources=sources,
+        excluded_bands=excluded_bands, genres=genres, trending_now=trending_now,
+        discover_new=discover_new, interest=interest, user_id=user_id,
+        discovery_level=discovery_level, user_set_genres=user_set_genres
+    )
+
+    recommendations = yield from _generate_recommendations(prompt_args, count, True, cache_info)
+    if recommendations:
+        _save_cached_recommendations(cache_key, recommendations)
@@ -1,31 +1,45 @@
-from flask import Flask, render_template, request, jsonify, redirect, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, session
 from functools import wraps
+import json
 import os
+import queue
 import sys
+import threading
+import time
+import uuid
 
 # Add the backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import (
-    initialize_database, insert_default_sources, save_suggestion, save_user_preferences,
-    save_feedback, get_enabled_sources, get_excluded_bands, get_full_feedback_history,
+    run_migrations, save_recommendation_batch,
+    save_feedback, get_enabled_sources, get_excluded_bands,
+    get_feedback_history_page, get_feedback_stats, HISTORY_PAGE_SIZE,
     get_all_sources, update_source_preference, add_new_source, delete_source,
-    get_all_rated_bands, save_playlist, link_playlist_to_suggestions,
-    get_all_playlists, get_playlist_with_details, update_playlist_track_count,
-    get_bands_in_playlists, migrate_add_user_support, migrate_add_spotify_support,
-    migrate_add_user_source_preferences, migrate_add_pin_support,
-    ensure_default_user, create_user, get_all_users, get_user_by_id, delete_user,
+    get_all_rated_bands, save_playlist,
+    get_all_playlists, get_playlist_with_details,
+    get_bands_in_playlists, ensure_default_user,
+    create_user, get_all_users, get_user_by_id, delete_user,
     get_user_count, save_spotify_auth, get_spotify_auth, update_spotify_token,
-    clear_spotify_auth, save_taste_data, get_taste_data, get_taste_sync_status,
-    verify_user_pin, set_user_pin, user_has_pin, get_user_by_spotify_id
+    clear_spotify_auth, save_taste_data, get_taste_data, get_taste_sync_status, get_taste_genres,
+    verify_user_pin, set_user_pin, user_has_pin, get_user_by_spotify_id,
+    take_pool_candidates, add_pool_candidates, count_pool_candidates, claim_llm_call, release_llm_call,
+    start_prefetched_batch, save_prefetched_batch, take_prefetched_batch,
+    start_taste_sync_job, update_taste_sync_job, get_taste_sync_job
+)
+from api_handler import (
+    stream_music_recommendations, recommendation_cache_key,
+    get_llm_single_flight_stats, get_exclusion_filter_stats, refresh_user_taste_context,
+    exclusion_filter, LLM_SINGLE_FLIGHT_TIMEOUT
 )
-from api_handler import get_music_recommendations
 from spotify_handler import (
     get_spotify_oauth, get_spotify_client, get_current_user,
-    get_tracks_for_artists, create_playlist, add_tracks_to_playlist,
+    get_tracks_for_artists, create_playlist, write_playlist_tracks,
     get_user_playlists as get_spotify_user_playlists, get_artist_images,
-    get_spotify_client_for_user, sync_all_taste_data
+    get_spotify_client_for_user, sync_all_taste_data, get_artist_cache_stats,
+    get_spotify_client_cache_stats, forget_spotify_client, get_top_tracks_cache_stats
 )
+from http_client import get_http_stats, get_rate_limit_stats, request_priority
 
 app = Flask(__name__,
             template_folder='../frontend/templates',
@@ -36,12 +50,7 @@ app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-product
 
 # Initialize database on startup
 with app.app_context():
-    initialize_database()
-    insert_default_sources()
-    migrate_add_user_support()
-    migrate_add_spotify_support()
-    migrate_add_user_source_preferences()
-    migrate_add_pin_support()
+    run_migrations()
     ensure_default_user()
 
 
@@ -429,66 +438,222 @@ def switch_user():
             'error': str(e)
         }), 500
 
+def _recommendation_request_args(data, user_id):
+    """
+    Build the get_music_recommendations arguments for a recommend request body.
+
+    Returns:
+        Tuple of (keyword arguments dict, list of enabled source ids)
+    """
+    genres = data.get('genres', [])
+    discover_new = data.get('discover_new', False)
+    excluded_artists = data.get('excluded_artists', [])  # Session-based exclusions from swipe UI
+
+    # Get enabled sources for this user
+    sources = get_enabled_sources(user_id)
+
+    # Get excluded bands for this user
+    if discover_new:
+        # Exclude ALL previously rated bands
+        excluded_bands = get_all_rated_bands(user_id)
+    else:
+        # Only exclude recently skipped bands (5-day cooldown)
+        excluded_bands = get_excluded_bands(user_id)
+
+    # Merge session exclusions (from swipe UI) with database exclusions.
+    # Keep them in priority order (session first, then most recent) - only
+    # the first ones fit in the prompt, the rest are filtered locally.
+    excluded_bands = list(dict.fromkeys(excluded_artists + excluded_bands))
+
+    args = {
+        'time_of_day': data.get('time_of_day', ''),
+        'mood': data.get('mood', ''),
+        'tempo': data.get('tempo', 50),
+        'instruments_yes': data.get('instruments_yes', []),
+        'instruments_no': data.get('instruments_no', []),
+        'sources': sources,
+        'excluded_bands': excluded_bands,
+        'genres': genres,
+        'trending_now': data.get('trending_now', False),
+        'discover_new': discover_new,
+        'interest': data.get('interest', ''),
+        'user_id': user_id,
+        'discovery_level': data.get('discovery_level', 3),  # 1=pure discovery, 5=comfort zone
+        # Check if user explicitly set genres (for taste context override logic)
+        'user_set_genres': len(genres) > 0
+    }
+
+    # Get list of source ids for tracking
+    return args, [s['id'] for s in sources]
+
+
+def _save_recommendations(recommendations, args, source_ids):
+    """Save a batch of recommendations with the request that produced them. Returns the new IDs."""
+    # Save the whole batch (the request preferences + its suggestions) in one transaction
+    return save_recommendation_batch(
+        recommendations,
+        time_of_day=args['time_of_day'],
+        mood=args['mood'],
+        tempo=args['tempo'],
+        instruments_yes=args['instruments_yes'],
+        instruments_no=args['instruments_no'],
+        source_ids=source_ids,
+        user_id=args['user_id']
+    )
+
+
+# Per-user candidate pools: one large LLM call fills a pool that later
+# batches for the same request context are served from
+RECOMMENDATION_BATCH_SIZE = 5
+CANDIDATE_POOL_SIZE = int(os.getenv('CANDIDATE_POOL_SIZE', 25))
+CANDIDATE_POOL_LOW_WATERMARK = int(os.getenv('CANDIDATE_POOL_LOW_WATERMARK', 10))
+CANDIDATE_POOL_TTL_SECONDS = int(os.getenv('CANDIDATE_POOL_TTL_SECONDS', 6 * 3600))
+
+
+def _candidate_pool_key(args):
+    """Pool key for a request: its prompt inputs without the exclusions (those are applied when serving)."""
+    return recommendation_cache_key(**dict(args, excluded_bands=None, count=CANDIDATE_POOL_SIZE))
+
+
+def _refill_candidate_pool(args, pool_key, owner, served_bands, serve=None):
+    """
+    Generate CANDIDATE_POOL_SIZE candidates in one call and add them to the user's pool.
+
+    With a serve queue (for a request the pool couldn't answer), the first
+    RECOMMENDATION_BATCH_SIZE candidates are put on it as they are generated,
+    followed by None (or the exception the call raised), and only the rest
+    are pooled. The refill claim held by owner is released when done.
+    """
+    user_id = args['user_id']
+    candidates = []
+    served = 0
+    try:
+        for rec in stream_music_recommendations(**dict(
+            args,
+            excluded_bands=list(args['excluded_bands']) + list(served_bands),
+            count=CANDIDATE_POOL_SIZE
+        )):
+            if serve is not None and served < RECOMMENDATION_BATCH_SIZE:
+                serve.put(rec)
+                served += 1
+                if served == RECOMMENDATION_BATCH_SIZE:
+                    serve.put(None)
+                continue
+            candidates.append(rec)
+        # Warm the artist image cache so pooled batches don't wait on Spotify
+        with request_priority('background'):
+            get_artist_images([c['band_name'] for c in candidates], user_id=user_id)
+        size = add_pool_candidates(user_id, pool_key, candidates, CANDIDATE_POOL_TTL_SECONDS)
+        print(f"🧺 Candidate pool for user {user_id} refilled: {size} candidates")
+    except Exception as e:
+        print(f"Error refilling candidate pool for user {user_id}: {str(e)}")
+        if serve is not None and served < RECOMMENDATION_BATCH_SIZE:
+            serve.put(e)
+            served = RECOMMENDATION_BATCH_SIZE
+    finally:
+        if serve is not None and served < RECOMMENDATION_BATCH_SIZE:
+            serve.put(None)
+        release_llm_call(_pool_refill_key(user_id, pool_key), owner)
+
+
+def _pool_refill_key(user_id, pool_key):
+    return f'pool-refill:{user_id}:{pool_key}'
+
+
+def _claim_pool_refill(user_id, pool_key):
+    """
+    Claim a pool's refill, across worker processes (through the llm_calls lock table).
+
+    A claim whose worker died expires after LLM_SINGLE_FLIGHT_TIMEOUT.
+
+    Returns:
+        The claim's owner token, or None if a refill of this pool is already running
+    """
+    owner = f'{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}'
+    if claim_llm_call(_pool_refill_key(user_id, pool_key), owner, LLM_SINGLE_FLIGHT_TIMEOUT, 0):
+        return owner
+    return None
+
+
+def _take_pooled_batch(args):
+    """
+    Serve a batch from the user's candidate pool, refilling it in the background when low.
+
+    An empty pool isn't refilled here: the caller generates the batch with
+    _stream_refill_batch, whose call refills the pool as well.
+
+    Returns:
+        List of recommendations, or an empty list if the pool can't fill a batch
+    """
+    user_id = args['user_id']
+    pool_key = _candidate_pool_key(args)
+    batch, remaining = take_pool_candidates(
+        user_id, pool_key, exclusion_filter(args['excluded_bands'], user_id),
+        RECOMMENDATION_BATCH_SIZE, CANDIDATE_POOL_TTL_SECONDS
+    )
+
+    if batch and remaining < CANDIDATE_POOL_LOW_WATERMARK:
+        owner = _claim_pool_refill(user_id, pool_key)
+        if owner:
+            threading.Thread(
+                target=_refill_candidate_pool,
+                args=(args, pool_key, owner, [rec['band_name'] for rec in batch]),
+                daemon=True
+            ).start()
+
+    return batch
+
+
+def _stream_refill_batch(args, cache_info=None):
+    """
+    Generate a batch the pool couldn't serve, refilling the pool with the same call.
+
+    One CANDIDATE_POOL_SIZE call yields its first RECOMMENDATION_BATCH_SIZE
+    recommendations as soon as they are written, and pools the rest in the
+    background, so a cold pool costs one LLM call instead of two. If this
+    pool is already being refilled (by any worker), a batch-sized call is
+    made instead. Only for the swipe flow, which goes on to use the pool.
+
+    Yields:
+        Each recommendation dict
+    """
+    user_id = args['user_id']
+    pool_key = _candidate_pool_key(args)
+    owner = _claim_pool_refill(user_id, pool_key)
+    if not owner:
+        yield from stream_music_recommendations(**args, cache_info=cache_info)
+        return
+
+    if cache_info is not None:
+        cache_info['pool_refill'] = True
+    cards = queue.Queue()
+    threading.Thread(target=_refill_candidate_pool, args=(args, pool_key, owner, [], cards), daemon=True).start()
+    while True:
+        card = cards.get()
+        if card is None:
+            return
+        if isinstance(card, Exception):
+            raise card
+        yield card
+
+
 @app.route('/api/recommend', methods=['POST'])
 @require_auth
 def recommend():
     """Get music recommendations based on user preferences."""
     try:
-        # Get data from the request
-        data = request.json
-        
-        time_of_day = data.get('time_of_day', '')
-        mood = data.get('mood', '')
-        interest = data.get('interest', '')
-        tempo = data.get('tempo', 50)
-        instruments_yes = data.get('instruments_yes', [])
-        instruments_no = data.get('instruments_no', [])
-        genres = data.get('genres', [])
-        trending_now = data.get('trending_now', False)
-        discover_new = data.get('discover_new', False)
-        discovery_level = data.get('discovery_level', 3)  # 1=pure discovery, 5=comfort zone
-        excluded_artists = data.get('excluded_artists', [])  # Session-based exclusions from swipe UI
-
-        # Check if user explicitly set genres (for taste context override logic)
-        user_set_genres = len(genres) > 0
-
         # Get current user
         user_id = get_current_user_id()
 
-        # Get enabled sources for this user
-        sources = get_enabled_sources(user_id)
+        args, source_ids = _recommendation_request_args(request.json, user_id)
 
-        # Get excluded bands for this user
-        if discover_new:
-            # Exclude ALL previously rated bands
-            excluded_bands = get_all_rated_bands(user_id)
-        else:
-            # Only exclude recently skipped bands (5-day cooldown)
-            excluded_bands = get_excluded_bands(user_id)
-
-        # Merge session exclusions (from swipe UI) with database exclusions
-        excluded_bands = list(set(excluded_bands + excluded_artists))
-        
-        # Get list of source names for tracking
-        source_names = [s['source_name'] for s in sources]
-        
-        # Call ChatGPT to get recommendations
-        recommendations = get_music_recommendations(
-            time_of_day=time_of_day,
-            mood=mood,
-            tempo=tempo,
-            instruments_yes=instruments_yes,
-            instruments_no=instruments_no,
-            sources=sources,
-            excluded_bands=excluded_bands,
-            genres=genres,
-            trending_now=trending_now,
-            discover_new=discover_new,
-            interest=interest,
-            user_id=user_id,
-            discovery_level=discovery_level,
-            user_set_genres=user_set_genres
-        )
+        # Serve from the user's candidate pool, else call ChatGPT (or reuse a cached result).
+        # A cold pool gets a batch-sized call: only the swipe flow pays for a pool refill.
+        cache_info = {}
+        recommendations = _take_pooled_batch(args)
+        cache_info['pool'] = bool(recommendations)
+        if not recommendations:
+            recommendations = list(stream_music_recommendations(**args, cache_info=cache_info))
 
         # Fetch artist images from Spotify (using current user's auth if available)
         band_names = [rec['band_name'] for rec in recommendations]
@@ -501,28 +666,10 @@ def recommend():
         # Get bands already in playlists for this user
         bands_in_playlists = get_bands_in_playlists(user_id)
 
-        # Save each recommendation to database
-        saved_recommendations = []
-        for rec in recommendations:
-            suggestion_id = save_suggestion(
-                band_name=rec['band_name'],
-                genre=rec.get('genre', ''),
-                description=rec.get('description', ''),
-                match_reason=rec.get('match_reason', ''),
-                sources_used=source_names,
-                user_id=user_id
-            )
-
-            # Save the preferences that generated this suggestion
-            save_user_preferences(
-                suggestion_id=suggestion_id,
-                time_of_day=time_of_day,
-                mood=mood,
-                tempo=tempo,
-                instruments_yes=instruments_yes,
-                instruments_no=instruments_no
-            )
+        suggestion_ids = _save_recommendations(recommendations, args, source_ids)
 
+        saved_recommendations = []
+        for rec, suggestion_id in zip(recommendations, suggestion_ids):
             # Add the ID to the recommendation for frontend use
             rec['id'] = suggestion_id
 
@@ -533,7 +680,8 @@ def recommend():
 
         return jsonify({
             'success': True,
-            'recommendations': saved_recommendations
+            'recommendations': saved_recommendations,
+            'cache': cache_info
         })
     
     except Exception as e:
@@ -543,6 +691,159 @@ def recommend():
             'error': str(e)
         }), 500
 
+# Prefetch of the next swipe batch into a short-lived per-session slot
+PREFETCH_TTL_SECONDS = int(os.getenv('PREFETCH_TTL_SECONDS', 600))
+PREFETCH_MAX_WAIT_SECONDS = float(os.getenv('PREFETCH_MAX_WAIT_SECONDS', 20))
+
+
+def _prefetch_next_batch(session_key, args, on_screen):
+    """
+    Start generating the session's next batch (with images) in the background.
+
+    The batch excludes the artists currently on screen and is parked in the
+    session's prefetch slot for the next request with the same context.
+    """
+    args = dict(args, excluded_bands=list(args['excluded_bands']) + list(on_screen))
+    context_key = _candidate_pool_key(args)
+    start_prefetched_batch(session_key, context_key, PREFETCH_TTL_SECONDS)
+
+    def run():
+        try:
+            batch = _take_pooled_batch(args) or list(_stream_refill_batch(args))
+            with request_priority('background'):
+                images = get_artist_images([rec['band_name'] for rec in batch], user_id=args['user_id'])
+            for rec in batch:
+                rec['image_url'] = images.get(rec['band_name'])
+                rec['in_playlist'] = False
+            save_prefetched_batch(session_key, context_key, batch)
+        except Exception as e:
+            print(f"Error prefetching next batch: {str(e)}")
+            save_prefetched_batch(session_key, context_key, None)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _take_prefetched_batch(session_key, args):
+    """
+    Take the session's prefetched batch if it was generated for this request context.
+
+    Waits up to PREFETCH_MAX_WAIT_SECONDS if the prefetch is still running,
+    since it started earlier than a new call would. Bands the user has
+    excluded since are dropped.
+
+    Returns:
+        List of recommendations (empty if nothing usable was prefetched)
+    """
+    context_key = _candidate_pool_key(args)
+    deadline = time.time() + PREFETCH_MAX_WAIT_SECONDS
+    while True:
+        status, batch = take_prefetched_batch(session_key, context_key, PREFETCH_TTL_SECONDS)
+        if status != 'pending' or time.time() >= deadline:
+            break
+        time.sleep(0.1)
+
+    if status != 'ready':
+        return []
+    is_excluded = exclusion_filter(args['excluded_bands'], args['user_id'])
+    return [rec for rec in batch if not is_excluded(rec['band_name'])]
+
+
+def _read_ahead(iterable):
+    """
+    Consume an iterable on a background thread while the caller handles its items.
+
+    Lets the ChatGPT stream keep generating while earlier cards are being
+    enriched and sent. Exceptions are re-raised in the caller.
+    """
+    items = queue.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+            items.put(done)
+        except Exception as e:
+            items.put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+@app.route('/api/recommend/stream', methods=['POST'])
+@require_auth
+def recommend_stream():
+    """
+    Stream music recommendations as Server-Sent Events.
+
+    Emits a 'card' event for each recommendation as soon as ChatGPT has
+    finished writing it and its image is resolved, then a 'saved' event
+    with the suggestion IDs once the batch is persisted, then 'done'.
+    Failures are reported as an 'error' event.
+
+    After a batch is served, the next one is prefetched for this session
+    when the candidate pool is below one batch, so the following "Generate
+    More" can be answered immediately.
+    """
+    # Read the session and request before the response starts streaming
+    user_id = get_current_user_id()
+    data = request.json
+    session_key = session.setdefault('prefetch_key', uuid.uuid4().hex)
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def generate():
+        recommendations = []
+        try:
+            args, source_ids = _recommendation_request_args(data, user_id)
+
+            cache_info = {}
+            prefetched = _take_prefetched_batch(session_key, args)
+            pooled = [] if prefetched else _take_pooled_batch(args)
+            cache_info['prefetched'] = bool(prefetched)
+            cache_info['pool'] = bool(pooled)
+            if prefetched or pooled:
+                cards = iter(prefetched or pooled)
+            else:
+                cards = _read_ahead(_stream_refill_batch(args, cache_info))
+
+            for rec in cards:
+                # Fetch the artist image from Spotify before showing the card
+                if 'image_url' not in rec:
+                    rec['image_url'] = get_artist_images([rec['band_name']], user_id=user_id).get(rec['band_name'])
+                rec['in_playlist'] = False
+                recommendations.append(rec)
+                yield sse('card', {'index': len(recommendations) - 1, 'recommendation': rec})
+
+            if not recommendations:
+                yield sse('error', {'error': 'No recommendations returned'})
+                return
+
+            suggestion_ids = _save_recommendations(recommendations, args, source_ids)
+            yield sse('saved', {'ids': suggestion_ids})
+
+            # Prefetch only what the pool can't serve at once: a refill this request
+            # started, or a pool holding a batch, already covers the next request
+            if not cache_info.get('pool_refill') and count_pool_candidates(
+                    user_id, _candidate_pool_key(args), CANDIDATE_POOL_TTL_SECONDS) < RECOMMENDATION_BATCH_SIZE:
+                _prefetch_next_batch(session_key, args, [rec['band_name'] for rec in recommendations])
+            yield sse('done', {'count': len(recommendations), 'cache': cache_info})
+        except Exception as e:
+            print(f"Error in /api/recommend/stream: {str(e)}")
+            yield sse('error', {'error': str(e)})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let a proxy buffer the stream
+    })
+
 @app.route('/api/feedback', methods=['POST'])
 @require_auth
 def feedback():
@@ -606,14 +907,45 @@ def history_page():
 @app.route('/api/history', methods=['GET'])
 @require_auth
 def get_history():
-    """Get user's feedback history."""
+    """
+    Get one page of the user's feedback history.
+
+    Query params: limit, cursor (from the previous page's next_cursor), and
+    optional filters feedback_type, genre, time_of_day, mood, tempo, q (band name).
+    Stats are included on the first page only.
+    """
     try:
         user_id = get_current_user_id()
-        history = get_full_feedback_history(user_id)
-        return jsonify({
+        args = request.args
+        cursor = args.get('cursor') or None
+
+        page = get_feedback_history_page(
+            user_id,
+            limit=args.get('limit', HISTORY_PAGE_SIZE, type=int),
+            cursor=cursor,
+            feedback_type=args.get('feedback_type') or None,
+            genre=args.get('genre', '').strip() or None,
+            time_of_day=args.get('time_of_day') or None,
+            mood=args.get('mood', '').strip() or None,
+            tempo=args.get('tempo', type=int),
+            search=args.get('q', '').strip() or None
+        )
+
+        response = {
             'success': True,
-            'history': history
-        })
+            'history': page['history'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more']
+        }
+        if not cursor:
+            response['stats'] = get_feedback_stats(user_id)
+
+        return jsonify(response)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         print(f"Error in /api/history: {str(e)}")
         return jsonify({
@@ -860,8 +1192,7 @@ def spotify_callback():
         print(f"[Spotify OAuth] Token received, access_token starts with: {token_info.get('access_token', 'NONE')[:20]}...", flush=True)
 
         # Get Spotify user info
-        import spotipy
-        sp = spotipy.Spotify(auth=token_info['access_token'])
+        sp = get_spotify_client(token_info=token_info)
         spotify_user = sp.me()
         print(f"[Spotify OAuth] Raw Spotify user response: id={spotify_user.get('id')}, display_name={spotify_user.get('display_name')}, email={spotify_user.get('email', 'N/A')}", flush=True)
 
@@ -884,6 +1215,7 @@ def spotify_callback():
         # Save to database for the user who initiated OAuth
         print(f"[Spotify OAuth] Saving tokens for user_id={oauth_user_id}, spotify_user={spotify_user_info['id']}", flush=True)
         save_spotify_auth(oauth_user_id, token_info, spotify_user_info)
+        forget_spotify_client(oauth_user_id)
         print(f"[Spotify OAuth] save_spotify_auth completed", flush=True)
 
         # Make sure the session reflects the correct current user AND is authenticated
@@ -936,6 +1268,29 @@ def spotify_status():
             'error': str(e)
         }), 500
 
+@app.route('/api/recommend/stats')
+@require_auth
+def recommend_stats():
+    """Get this worker's recommendation counters (LLM call sharing, exclusion filter)."""
+    return jsonify({
+        'success': True,
+        'single_flight': get_llm_single_flight_stats(),
+        'exclusion_filter': get_exclusion_filter_stats()
+    })
+
+@app.route('/api/spotify/stats')
+@require_auth
+def spotify_stats():
+    """Get this worker's Spotify cache, outbound HTTP connection and rate limiter counters."""
+    return jsonify({
+        'success': True,
+        'artist_cache': get_artist_cache_stats(),
+        'top_tracks_cache': get_top_tracks_cache_stats(),
+        'client_cache': get_spotify_client_cache_stats(),
+        'http': get_http_stats(),
+        'rate_limit': get_rate_limit_stats()
+    })
+
 @app.route('/api/spotify/disconnect', methods=['POST'])
 @require_auth
 def spotify_disconnect():
@@ -943,6 +1298,7 @@ def spotify_disconnect():
     try:
         user_id = get_current_user_id()
         clear_spotify_auth(user_id)
+        forget_spotify_client(user_id)
 
         return jsonify({
             'success': True,
@@ -956,10 +1312,47 @@ def spotify_disconnect():
         }), 500
 
 
+# Background taste sync jobs (one active per user, shared across workers via SQLite)
+TASTE_SYNC_JOB_STALE_SECONDS = int(os.getenv('TASTE_SYNC_JOB_STALE_SECONDS', 600))
+TASTE_SYNC_PHASES = ['top_artists_short', 'top_artists_medium', 'top_artists_long',
+                     'followed_artists', 'saved_track_artists', 'save']
+
+
+def _run_taste_sync_job(job_id, user_id, full):
+    """Run a queued taste sync job, recording per-phase progress on the job."""
+    phases = {phase: {'status': 'pending'} for phase in TASTE_SYNC_PHASES}
+    phases_lock = threading.Lock()
+
+    def progress(phase, status, ms):
+        with phases_lock:
+            phases[phase] = {'status': status} if ms is None else {'status': status, 'ms': ms}
+            update_taste_sync_job(job_id, phases=phases)
+
+    try:
+        update_taste_sync_job(job_id, status='running', phases=phases)
+        with request_priority('background'):
+            result = sync_all_taste_data(user_id, full=full, progress=progress)
+        if result['success']:
+            # Derive the taste context once here rather than on every recommend request
+            refresh_user_taste_context(user_id)
+            update_taste_sync_job(job_id, status='done', result=result)
+        else:
+            update_taste_sync_job(job_id, status='failed', error=result.get('error', 'Failed to sync taste data'))
+    except Exception as e:
+        print(f"Error in taste sync job {job_id}: {str(e)}")
+        update_taste_sync_job(job_id, status='failed', error=str(e))
+
+
 @app.route('/api/spotify/sync', methods=['POST'])
 @require_auth
 def spotify_sync_taste():
-    """Sync current user's Spotify taste data (top artists, followed artists, saved tracks)."""
+    """
+    Start syncing current user's Spotify taste data (top artists, followed artists, saved tracks).
+
+    The sync runs in the background; poll /api/spotify/sync/<job_id> for
+    progress. If a sync is already running for the user, its job is
+    returned instead of starting another.
+    """
     try:
         user_id = get_current_user_id()
 
@@ -971,20 +1364,17 @@ def spotify_sync_taste():
                 'error': 'Not connected to Spotify'
             }), 401
 
-        # Sync all taste data
-        result = sync_all_taste_data(user_id)
+        # Incremental unless a full re-read is requested
+        full = (request.get_json(silent=True) or {}).get('full', False)
+        job_id, created = start_taste_sync_job(uuid.uuid4().hex, user_id, full, TASTE_SYNC_JOB_STALE_SECONDS)
+        if created:
+            threading.Thread(target=_run_taste_sync_job, args=(job_id, user_id, full), daemon=True).start()
 
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'message': 'Taste data synced successfully',
-                'synced': result['synced']
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Failed to sync taste data')
-            }), 500
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'already_running': not created
+        }), 202
 
     except Exception as e:
         print(f"Error in /api/spotify/sync: {str(e)}")
@@ -994,6 +1384,23 @@ def spotify_sync_taste():
         }), 500
 
 
+@app.route('/api/spotify/sync/<job_id>', methods=['GET'])
+@require_auth
+def spotify_sync_status(job_id):
+    """Get the status and per-phase progress of a taste sync job."""
+    job = get_taste_sync_job(job_id, get_current_user_id())
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Sync job not found'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+
 @app.route('/api/spotify/taste', methods=['GET'])
 @require_auth
 def get_spotify_taste():
@@ -1005,7 +1412,8 @@ def get_spotify_taste():
         if taste_data:
             return jsonify({
                 'success': True,
-                'taste_data': taste_data
+                'taste_data': taste_data,
+                'genres': [{'genre': genre, 'artist_count': count} for genre, count in get_taste_genres(user_id)]
             })
         else:
             return jsonify({
@@ -1103,18 +1511,17 @@ def get_tracks():
                 'error': 'Not authenticated with Spotify. Please connect your Spotify account.'
             }), 401
 
-        # Get tracks for each artist
+        # Get tracks for all artists in one batch
+        track_counts = {config['band_name']: config.get('track_count', 3) for config in artist_configs}
+        result = get_tracks_for_artists(list(track_counts), tracks_per_artist=track_counts, randomize=False, sp=sp)
+
         artists_data = {}
         for config in artist_configs:
             band_name = config['band_name']
-            track_count = config.get('track_count', 3)
-
-            result = get_tracks_for_artists([band_name], tracks_per_artist=track_count, randomize=False, sp=sp)
-
             if band_name in result['artists']:
                 artists_data[band_name] = result['artists'][band_name]
                 artists_data[band_name]['suggestion_id'] = config['suggestion_id']
-                artists_data[band_name]['track_count'] = track_count
+                artists_data[band_name]['track_count'] = track_counts[band_name]
 
         return jsonify({
             'success': True,
@@ -1127,6 +1534,17 @@ def get_tracks():
             'error': str(e)
         }), 500
 
+def _playlist_write_failed(write, **extra):
+    """Error response for a playlist write that stopped partway (resumable via its write_id)."""
+    return jsonify(dict(
+        extra,
+        success=False,
+        error=f"Failed to add tracks to playlist ({write['tracks_added']} added): {write['error']}",
+        write_id=write['write_id'],
+        tracks_added=write['tracks_added'],
+        resumable=write['write_id'] is not None
+    )), 500
+
 @app.route('/api/spotify/create-playlist', methods=['POST'])
 @require_auth
 def create_spotify_playlist():
@@ -1178,20 +1596,14 @@ def create_spotify_playlist():
 
         # Create or update playlist on Spotify
         if existing_playlist_id:
-            # Add to existing playlist
-            success = add_tracks_to_playlist(existing_playlist_id, all_track_uris, sp)
-
-            if not success:
-                return jsonify({
-                    'success': False,
-                    'error': 'Failed to add tracks to playlist'
-                }), 500
+            # Add to existing playlist (in chunks, resumable if it fails partway). The
+            # DailyJams playlist's count and links are updated as the tracks land
+            write = write_playlist_tracks(user_id, existing_playlist_id, all_track_uris, sp,
+                                          db_playlist_id=data.get('db_playlist_id'),
+                                          suggestion_tracks=suggestion_track_counts)
 
-            # Update database
-            db_playlist_id = data.get('db_playlist_id')
-            if db_playlist_id:
-                link_playlist_to_suggestions(db_playlist_id, suggestion_track_counts)
-                update_playlist_track_count(db_playlist_id, len(all_track_uris))
+            if not write['success']:
+                return _playlist_write_failed(write)
 
             # Get playlist details for response
             from spotify_handler import get_user_playlists as get_spotify_user_playlists
@@ -1214,7 +1626,7 @@ def create_spotify_playlist():
             spotify_playlist = create_playlist(
                 user_id=user['id'],
                 playlist_name=playlist_name,
-                track_uris=all_track_uris,
+                track_uris=[],
                 is_public=True,
                 description=f'Created by DailyJams - {len(selected_tracks)} artists, {len(all_track_uris)} tracks',
                 sp=sp
@@ -1226,18 +1638,24 @@ def create_spotify_playlist():
                     'error': 'Failed to create playlist on Spotify'
                 }), 500
 
-            # Save to database
+            # Save to database; tracks are counted (and suggestions linked) as they land
             db_playlist_id = save_playlist(
                 playlist_name=playlist_name,
                 spotify_playlist_id=spotify_playlist['id'],
                 spotify_url=spotify_playlist['url'],
                 band_count=len(selected_tracks),
-                track_count=len(all_track_uris),
+                track_count=0,
                 user_id=get_current_user_id()
             )
 
-            # Link suggestions to playlist
-            link_playlist_to_suggestions(db_playlist_id, suggestion_track_counts)
+            # Add the tracks in chunks; the playlist is already recorded, so a
+            # write that fails partway can be finished with its write_id
+            write = write_playlist_tracks(user_id, spotify_playlist['id'], all_track_uris, sp,
+                                          db_playlist_id=db_playlist_id,
+                                          suggestion_tracks=suggestion_track_counts)
+            if not write['success']:
+                return _playlist_write_failed(write, db_playlist_id=db_playlist_id)
+            spotify_playlist['track_count'] = len(all_track_uris)
 
             return jsonify({
                 'success': True,
@@ -1253,6 +1671,46 @@ def create_spotify_playlist():
             'error': str(e)
         }), 500
 
+@app.route('/api/spotify/playlist-writes/<write_id>/resume', methods=['POST'])
+@require_auth
+def resume_playlist_write(write_id):
+    """Finish a playlist write that failed partway, from its last completed chunk."""
+    try:
+        user_id = get_current_user_id()
+        sp = get_spotify_client(user_id=user_id)
+        if not sp:
+            return jsonify({
+                'success': False,
+                'error': 'Not authenticated with Spotify. Please connect your Spotify account.'
+            }), 401
+
+        write = write_playlist_tracks(user_id, None, None, sp, write_id=write_id)
+        if not write['success']:
+            if write['error'] == 'Playlist write not found':
+                return jsonify({'success': False, 'error': write['error']}), 404
+            return _playlist_write_failed(write)
+
+        playlist = sp.playlist(write['playlist_id'], fields='id,name,uri,external_urls,tracks.total')
+        return jsonify({
+            'success': True,
+            'message': f"Added {write['tracks_added']} tracks to playlist",
+            'write_id': write_id,
+            'snapshot_id': write['snapshot_id'],
+            'playlist': {
+                'id': playlist['id'],
+                'name': playlist['name'],
+                'url': playlist['external_urls']['spotify'],
+                'uri': playlist['uri'],
+                'track_count': playlist['tracks']['total']
+            }
+        })
+    except Exception as e:
+        print(f"Error in /api/spotify/playlist-writes/{write_id}/resume: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/playlists', methods=['GET'])
 @require_auth
 def get_playlists():
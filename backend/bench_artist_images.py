@@ -0,0 +1,59 @@
+"""
+Benchmark: artist image lookups (spotify_handler.get_artist_images) against the local Spotify stub.
+
+Looks up a batch of uncached artists one at a time (the sequential loop this
+replaced) and with the concurrent lookup pool, then the same batch again from
+the artist cache. The rate limiter is raised out of the way so only the
+stub's latency counts.
+
+    python bench_artist_images.py [--artists 20] [--latency 0.15]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from spotify_stub import SpotifyStub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--artists', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.15, help='seconds per stub request')
+    args = parser.parse_args()
+
+    with SpotifyStub(latency=args.latency) as stub:
+        # Read by http_client at import time
+        os.environ['SPOTIFY_API_URL'] = stub.url
+        os.environ.setdefault('SPOTIFY_RATE_LIMIT_PER_SECOND', '1000')
+        os.environ.setdefault('SPOTIFY_RATE_LIMIT_BURST', '1000')
+        import database
+        import spotify_handler
+
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.run_migrations()
+            database.ensure_default_user()
+            database.save_spotify_auth(1, {'access_token': 'bench', 'refresh_token': 'bench',
+                                           'expires_at': time.time() + 3600}, {'id': 'stubuser'})
+
+        def timed(label, names):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                images = spotify_handler.get_artist_images(names, user_id=1)
+            assert all(images[name] for name in names)
+            print(f"{label:<24} {(time.perf_counter() - started) * 1000:7.0f} ms")
+
+        for concurrency in (1, spotify_handler.SPOTIFY_LOOKUP_CONCURRENCY):
+            spotify_handler.SPOTIFY_LOOKUP_CONCURRENCY = concurrency
+            spotify_handler._lookup_executors.clear()
+            names = [f'Bench Artist {concurrency}-{i}' for i in range(args.artists)]
+            timed(f'{args.artists} uncached, {concurrency} at once', names)
+        timed(f'{args.artists} cached', names)
+        print(f"Stub calls: {dict(stub.calls)}")
+
+
+if __name__ == '__main__':
+    main()
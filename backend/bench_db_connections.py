@@ -0,0 +1,60 @@
+"""
+Benchmark: per-thread SQLite connection reuse (database.get_db_connection).
+
+Runs the database work of one /api/recommend request (sources, exclusions,
+taste data, playlists, saving a batch of 5) against a temporary database,
+first opening a new connection for every call - as before connections were
+kept per thread - and then on the reused connection.
+
+    python bench_db_connections.py [--requests 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import database
+
+
+def _request_calls(user_id):
+    recommendations = [{'band_name': f'Band {i}', 'genre': 'indie', 'description': 'd', 'match_reason': 'm'}
+                       for i in range(5)]
+    return [
+        lambda: database.get_enabled_sources(user_id),
+        lambda: database.get_excluded_bands(user_id),
+        lambda: database.get_taste_data(user_id),
+        lambda: database.get_bands_in_playlists(user_id),
+        lambda: database.save_recommendation_batch(recommendations, 'evening', 'calm', 3, ['guitar'], [],
+                                                   [1], user_id),
+    ]
+
+
+def _time_requests(calls, requests, new_connection):
+    started = time.perf_counter()
+    for _ in range(requests):
+        for call in calls:
+            if new_connection:
+                database.close_db_connection()
+            call()
+    return (time.perf_counter() - started) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    database.run_migrations()
+    database.ensure_default_user()
+    user_id = 1
+    calls = _request_calls(user_id)
+
+    new_ms = _time_requests(calls, args.requests, new_connection=True)
+    reused_ms = _time_requests(calls, args.requests, new_connection=False)
+    print(f"New connection per call: {new_ms:.2f} ms/request")
+    print(f"Reused connection:       {reused_ms:.2f} ms/request ({new_ms / reused_ms:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: boot-time migration cost (database.run_migrations).
+
+Measures, on a temporary database:
+  - migrating a fresh database through every step
+  - a boot on an up-to-date database (new connection + version check)
+  - replaying every migration step on each boot, as startup did before the
+    schema_version registry
+
+    python bench_migrations.py [--boots 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import database
+
+
+def _timed_ms(run, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        database.close_db_connection()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def _replay_all_steps():
+    for version, name, migrate in database.MIGRATIONS:
+        migrate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--boots', type=int, default=20)
+    args = parser.parse_args()
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    fresh_ms = _timed_ms(database.run_migrations)
+    boot_ms = _timed_ms(database.run_migrations, args.boots)
+    replay_ms = _timed_ms(_replay_all_steps, args.boots)
+
+    print(f"Fresh database, {len(database.MIGRATIONS)} steps: {fresh_ms:.1f} ms")
+    print(f"Boot, up to date:                {boot_ms:.2f} ms")
+    print(f"Boot replaying every step:       {replay_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
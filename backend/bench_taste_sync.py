@@ -0,0 +1,59 @@
+"""
+Benchmark: Spotify taste sync (spotify_handler.sync_all_taste_data) of a 5,000-track library against the local Spotify stub.
+
+Runs a full sync with saved-track pages fetched one at a time and with
+TASTE_SYNC_PAGE_CONCURRENCY at once, then an incremental sync with nothing
+new. The rate limiter is raised out of the way so only the stub's latency
+counts.
+
+    python bench_taste_sync.py [--tracks 5000] [--followed 800] [--latency 0.06]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from spotify_stub import SpotifyStub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=5000)
+    parser.add_argument('--followed', type=int, default=800)
+    parser.add_argument('--latency', type=float, default=0.06, help='seconds per stub request')
+    args = parser.parse_args()
+
+    with SpotifyStub(latency=args.latency, saved_tracks=args.tracks, followed_artists=args.followed) as stub:
+        # Read by http_client at import time
+        os.environ['SPOTIFY_API_URL'] = stub.url
+        os.environ.setdefault('SPOTIFY_RATE_LIMIT_PER_SECOND', '1000')
+        os.environ.setdefault('SPOTIFY_RATE_LIMIT_BURST', '1000')
+        import database
+        import spotify_handler
+
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.run_migrations()
+            database.ensure_default_user()
+            database.save_spotify_auth(1, {'access_token': 'bench', 'refresh_token': 'bench',
+                                           'expires_at': time.time() + 3600}, {'id': 'stubuser'})
+
+        def timed(label, full):
+            stub.calls.clear()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = spotify_handler.sync_all_taste_data(1, full=full)
+            assert result['success'], result
+            print(f"{label:<36} {(time.perf_counter() - started) * 1000:6.0f} ms, "
+                  f"{sum(stub.calls.values())} API calls, synced {result['synced']}")
+
+        for concurrency in (1, spotify_handler.TASTE_SYNC_PAGE_CONCURRENCY):
+            spotify_handler.TASTE_SYNC_PAGE_CONCURRENCY = concurrency
+            timed(f'Full sync, {concurrency} page(s) at once', full=True)
+        timed('Incremental sync, nothing new', full=False)
+
+
+if __name__ == '__main__':
+    main()
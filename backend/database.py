@@ -1,1152 +1,3023 @@
 import sqlite3
+import base64
+import json
+import math
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(__file__), '../data/dailyjams.db')
 
-def get_db_connection():
-    """Create a database connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
+# Connection tuning, applied once when a connection is opened
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))       # page cache per connection
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 128 * 1024 * 1024))    # bytes of the file to memory-map
+
+# One long-lived connection per thread (sqlite3 connections can't be shared across threads)
+_local = threading.local()
+_stats_lock = threading.Lock()
+_connection_stats = {'opened': 0, 'reused': 0}
+
+
+def _open_connection():
+    """Open a new SQLite connection and apply the connection pragmas."""
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
     conn.row_factory = sqlite3.Row  # This allows us to access columns by name
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+def get_db_connection():
+    """
+    Get this thread's connection to the SQLite database.
+
+    The connection is opened on first use and then reused for the life of the
+    thread. It is reopened if DB_PATH changes (the old one is closed) or the
+    process has forked (e.g. gunicorn workers), since SQLite handles can't
+    cross a fork. Callers must not close it - use db_transaction() for
+    commit/rollback.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == DB_PATH:
+        with _stats_lock:
+            _connection_stats['reused'] += 1
+        return conn
+
+    # Close a connection to the previous DB_PATH; one inherited from the parent is
+    # only dropped, as closing it in the child could release the parent's locks
+    close_db_connection()
+    conn = _open_connection()
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.path = DB_PATH
+    with _stats_lock:
+        _connection_stats['opened'] += 1
     return conn
 
+
+@contextmanager
+def db_transaction():
+    """
+    Run a unit of work on this thread's connection.
+
+    Commits when the block exits normally and rolls back if it raises,
+    so a failed call never leaves a half-open transaction on the shared
+    connection. Nested blocks join the outermost transaction, which is the
+    only one that commits or rolls back.
+    """
+    conn = get_db_connection()
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    try:
+        yield conn
+        if depth == 0:
+            conn.commit()
+    except Exception:
+        if depth == 0:
+            conn.rollback()
+        raise
+    finally:
+        _local.depth = depth
+
+
+def close_db_connection():
+    """Close this thread's connection (it will be reopened on next use)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        if _local.pid == os.getpid():
+            conn.close()
+
+
+def get_connection_stats():
+    """Get counts of connections opened vs. reused, for benchmarking."""
+    with _stats_lock:
+        return dict(_connection_stats)
+
 def initialize_database():
     """Create all necessary tables if they don't exist."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Table 0: Users (profiles for separating history)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            avatar_color TEXT DEFAULT '#2980b9',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        # Table 0: Users (profiles for separating history)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                avatar_color TEXT DEFAULT '#2980b9',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
 
-    # Table 1: Music Suggestions
-    # Stores each band/artist suggestion from ChatGPT
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS music_suggestions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            band_name TEXT NOT NULL,
-            genre TEXT,
-            description TEXT,
-            match_reason TEXT,
-            sources_used TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        # Table 1: Music Suggestions
+        # Stores each band/artist suggestion from ChatGPT
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS music_suggestions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                band_name TEXT NOT NULL,
+                genre TEXT,
+                description TEXT,
+                match_reason TEXT,
+                sources_used TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
     
-    # Table 2: User Preferences
-    # Stores the preferences used for each suggestion request
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            suggestion_id INTEGER,
-            time_of_day TEXT,
-            mood TEXT,
-            tempo INTEGER,
-            instruments_yes TEXT,
-            instruments_no TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (suggestion_id) REFERENCES music_suggestions (id)
-        )
-    ''')
+        # Table 2: User Preferences
+        # Stores the preferences used for each suggestion request
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_preferences (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                suggestion_id INTEGER,
+                time_of_day TEXT,
+                mood TEXT,
+                tempo INTEGER,
+                instruments_yes TEXT,
+                instruments_no TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (suggestion_id) REFERENCES music_suggestions (id)
+            )
+        ''')
     
-    # Table 3: User Feedback
-    # Stores thumbs up/down feedback on suggestions
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            suggestion_id INTEGER NOT NULL,
-            feedback_type TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (suggestion_id) REFERENCES music_suggestions (id)
-        )
-    ''')
+        # Table 3: User Feedback
+        # Stores thumbs up/down feedback on suggestions
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                suggestion_id INTEGER NOT NULL,
+                feedback_type TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (suggestion_id) REFERENCES music_suggestions (id)
+            )
+        ''')
     
-    # Table 4: Source Preferences
-    # Stores which sources are enabled/disabled
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS source_preferences (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source_name TEXT NOT NULL UNIQUE,
-            source_url TEXT,
-            is_enabled INTEGER DEFAULT 1,
-            description TEXT
-        )
-    ''')
+        # Table 4: Source Preferences
+        # Stores which sources are enabled/disabled
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS source_preferences (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_name TEXT NOT NULL UNIQUE,
+                source_url TEXT,
+                is_enabled INTEGER DEFAULT 1,
+                description TEXT
+            )
+        ''')
 
-    # Table 5: User Playlists
-    # Stores playlists created in Spotify
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_playlists (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            playlist_name TEXT NOT NULL,
-            spotify_playlist_id TEXT,
-            spotify_url TEXT,
-            band_count INTEGER DEFAULT 0,
-            track_count INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        # Table 5: User Playlists
+        # Stores playlists created in Spotify
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_playlists (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                playlist_name TEXT NOT NULL,
+                spotify_playlist_id TEXT,
+                spotify_url TEXT,
+                band_count INTEGER DEFAULT 0,
+                track_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
 
-    # Table 6: Playlist Suggestions
-    # Junction table linking playlists to music suggestions
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS playlist_suggestions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            playlist_id INTEGER NOT NULL,
-            suggestion_id INTEGER NOT NULL,
-            track_count INTEGER DEFAULT 3,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (playlist_id) REFERENCES user_playlists (id),
-            FOREIGN KEY (suggestion_id) REFERENCES music_suggestions (id)
-        )
-    ''')
+        # Table 6: Playlist Suggestions
+        # Junction table linking playlists to music suggestions
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS playlist_suggestions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                playlist_id INTEGER NOT NULL,
+                suggestion_id INTEGER NOT NULL,
+                track_count INTEGER DEFAULT 3,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (playlist_id) REFERENCES user_playlists (id),
+                FOREIGN KEY (suggestion_id) REFERENCES music_suggestions (id)
+            )
+        ''')
 
-    conn.commit()
-    conn.close()
     print("✅ Database initialized successfully!")
 
 def insert_default_sources():
     """Insert default music discovery sources."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
     
-    default_sources = [
-        ('Reddit - r/ifyoulikeblank', 'https://www.reddit.com/r/ifyoulikeblank/', 1, 'Music recommendations based on similar artists'),
-        ('Reddit - r/Music', 'https://www.reddit.com/r/Music/', 1, 'General music discussions and discoveries'),
-        ('RateYourMusic', 'https://rateyourmusic.com/', 1, 'Comprehensive music database and ratings'),
-        ('AllMusic', 'https://www.allmusic.com/', 1, 'Professional music reviews and artist info'),
-        ('Pitchfork', 'https://pitchfork.com/', 1, 'Music reviews and features'),
-    ]
+        default_sources = [
+            ('Reddit - r/ifyoulikeblank', 'https://www.reddit.com/r/ifyoulikeblank/', 1, 'Music recommendations based on similar artists'),
+            ('Reddit - r/Music', 'https://www.reddit.com/r/Music/', 1, 'General music discussions and discoveries'),
+            ('RateYourMusic', 'https://rateyourmusic.com/', 1, 'Comprehensive music database and ratings'),
+            ('AllMusic', 'https://www.allmusic.com/', 1, 'Professional music reviews and artist info'),
+            ('Pitchfork', 'https://pitchfork.com/', 1, 'Music reviews and features'),
+        ]
     
-    for source in default_sources:
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO source_preferences (source_name, source_url, is_enabled, description)
-                VALUES (?, ?, ?, ?)
-            ''', source)
-        except sqlite3.IntegrityError:
-            pass  # Source already exists
+        for source in default_sources:
+            try:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO source_preferences (source_name, source_url, is_enabled, description)
+                    VALUES (?, ?, ?, ?)
+                ''', source)
+            except sqlite3.IntegrityError:
+                pass  # Source already exists
     
-    conn.commit()
-    conn.close()
     print("✅ Default sources added!")
 
 def migrate_add_spotify_support():
     """Migration: Add Spotify auth columns to users table and create taste_data table."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Check if migration is needed
-    cursor.execute("PRAGMA table_info(users)")
-    columns = [col[1] for col in cursor.fetchall()]
+        # Check if migration is needed
+        cursor.execute("PRAGMA table_info(users)")
+        columns = [col[1] for col in cursor.fetchall()]
 
-    if 'spotify_user_id' not in columns:
-        print("🔄 Running Spotify support migration...")
+        if 'spotify_user_id' not in columns:
+            print("🔄 Running Spotify support migration...")
 
-        # Add Spotify auth columns to users table
-        cursor.execute('ALTER TABLE users ADD COLUMN spotify_user_id TEXT')
-        cursor.execute('ALTER TABLE users ADD COLUMN spotify_display_name TEXT')
-        cursor.execute('ALTER TABLE users ADD COLUMN spotify_access_token TEXT')
-        cursor.execute('ALTER TABLE users ADD COLUMN spotify_refresh_token TEXT')
-        cursor.execute('ALTER TABLE users ADD COLUMN spotify_token_expires_at INTEGER')
-        cursor.execute('ALTER TABLE users ADD COLUMN spotify_connected_at TIMESTAMP')
+            # Add Spotify auth columns to users table
+            cursor.execute('ALTER TABLE users ADD COLUMN spotify_user_id TEXT')
+            cursor.execute('ALTER TABLE users ADD COLUMN spotify_display_name TEXT')
+            cursor.execute('ALTER TABLE users ADD COLUMN spotify_access_token TEXT')
+            cursor.execute('ALTER TABLE users ADD COLUMN spotify_refresh_token TEXT')
+            cursor.execute('ALTER TABLE users ADD COLUMN spotify_token_expires_at INTEGER')
+            cursor.execute('ALTER TABLE users ADD COLUMN spotify_connected_at TIMESTAMP')
 
-        print("✅ Added Spotify auth columns to users table")
+            print("✅ Added Spotify auth columns to users table")
 
-    # Create taste data table if it doesn't exist
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS spotify_taste_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            data_type TEXT NOT NULL,
-            time_range TEXT,
-            data TEXT NOT NULL,
-            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
+        # Create taste data table if it doesn't exist
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS spotify_taste_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                data_type TEXT NOT NULL,
+                time_range TEXT,
+                data TEXT NOT NULL,
+                synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
 
-    # Create index for faster lookups
-    cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_taste_data_user
-        ON spotify_taste_data (user_id, data_type)
-    ''')
+        # Create index for faster lookups
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_taste_data_user
+            ON spotify_taste_data (user_id, data_type)
+        ''')
 
-    conn.commit()
-    conn.close()
     print("✅ Spotify support migration complete!")
 
 
 def migrate_add_user_source_preferences():
     """Migration: Add per-user source preferences table."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Check if table already exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_source_preferences'")
-    if cursor.fetchone():
-        conn.close()
-        return  # Already migrated
+        # Check if table already exists
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='user_source_preferences'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-    print("🔄 Running per-user source preferences migration...")
+        print("🔄 Running per-user source preferences migration...")
 
-    # Create user_source_preferences table
-    # This stores per-user overrides of the global source_preferences
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_source_preferences (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            source_id INTEGER NOT NULL,
-            is_enabled INTEGER DEFAULT 1,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (source_id) REFERENCES source_preferences (id),
-            UNIQUE(user_id, source_id)
-        )
-    ''')
+        # Create user_source_preferences table
+        # This stores per-user overrides of the global source_preferences
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_source_preferences (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                source_id INTEGER NOT NULL,
+                is_enabled INTEGER DEFAULT 1,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (source_id) REFERENCES source_preferences (id),
+                UNIQUE(user_id, source_id)
+            )
+        ''')
 
-    # Create index for faster lookups
-    cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_user_source_prefs
-        ON user_source_preferences (user_id)
-    ''')
+        # Create index for faster lookups
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_user_source_prefs
+            ON user_source_preferences (user_id)
+        ''')
 
-    conn.commit()
-    conn.close()
     print("✅ Per-user source preferences migration complete!")
 
 
 def migrate_add_pin_support():
     """Migration: Add PIN hash column to users table for authentication."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Check if migration is needed
-    cursor.execute("PRAGMA table_info(users)")
-    columns = [col[1] for col in cursor.fetchall()]
+        # Check if migration is needed
+        cursor.execute("PRAGMA table_info(users)")
+        columns = [col[1] for col in cursor.fetchall()]
 
-    if 'pin_hash' in columns:
-        conn.close()
-        return  # Already migrated
+        if 'pin_hash' in columns:
+            return  # Already migrated
 
-    print("🔄 Running PIN support migration...")
+        print("🔄 Running PIN support migration...")
 
-    # Add pin_hash column to users table
-    cursor.execute('ALTER TABLE users ADD COLUMN pin_hash TEXT')
+        # Add pin_hash column to users table
+        cursor.execute('ALTER TABLE users ADD COLUMN pin_hash TEXT')
 
-    conn.commit()
-    conn.close()
     print("✅ PIN support migration complete!")
 
 def migrate_add_user_support():
     """Migration: Add user_id columns and create default user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Check if migration is needed by seeing if user_id column exists
+        cursor.execute("PRAGMA table_info(music_suggestions)")
+        columns = [col[1] for col in cursor.fetchall()]
 
-    # Check if migration is needed by seeing if user_id column exists
-    cursor.execute("PRAGMA table_info(music_suggestions)")
-    columns = [col[1] for col in cursor.fetchall()]
+        if 'user_id' in columns:
+            return  # Already migrated
 
-    if 'user_id' in columns:
-        conn.close()
-        return  # Already migrated
+        print("🔄 Running user support migration...")
 
-    print("🔄 Running user support migration...")
+        # Create default user if none exists
+        cursor.execute("SELECT id FROM users LIMIT 1")
+        if not cursor.fetchone():
+            cursor.execute('''
+                INSERT INTO users (name, avatar_color) VALUES ('Default', '#2980b9')
+            ''')
+            print("✅ Created default user")
+
+        # Get default user ID
+        cursor.execute("SELECT id FROM users WHERE name = 'Default'")
+        row = cursor.fetchone()
+        default_user_id = row[0] if row else 1
 
-    # Create default user if none exists
-    cursor.execute("SELECT id FROM users LIMIT 1")
-    if not cursor.fetchone():
+        # Add user_id to music_suggestions
         cursor.execute('''
-            INSERT INTO users (name, avatar_color) VALUES ('Default', '#2980b9')
+            ALTER TABLE music_suggestions ADD COLUMN user_id INTEGER DEFAULT 1
         ''')
-        print("✅ Created default user")
+        cursor.execute('''
+            UPDATE music_suggestions SET user_id = ? WHERE user_id IS NULL OR user_id = 1
+        ''', (default_user_id,))
 
-    # Get default user ID
-    cursor.execute("SELECT id FROM users WHERE name = 'Default'")
-    row = cursor.fetchone()
-    default_user_id = row[0] if row else 1
+        # Add user_id to user_feedback
+        cursor.execute('''
+            ALTER TABLE user_feedback ADD COLUMN user_id INTEGER DEFAULT 1
+        ''')
+        cursor.execute('''
+            UPDATE user_feedback SET user_id = ? WHERE user_id IS NULL OR user_id = 1
+        ''', (default_user_id,))
 
-    # Add user_id to music_suggestions
-    cursor.execute('''
-        ALTER TABLE music_suggestions ADD COLUMN user_id INTEGER DEFAULT 1
-    ''')
-    cursor.execute('''
-        UPDATE music_suggestions SET user_id = ? WHERE user_id IS NULL OR user_id = 1
-    ''', (default_user_id,))
+        # Add user_id to user_playlists
+        cursor.execute('''
+            ALTER TABLE user_playlists ADD COLUMN user_id INTEGER DEFAULT 1
+        ''')
+        cursor.execute('''
+            UPDATE user_playlists SET user_id = ? WHERE user_id IS NULL OR user_id = 1
+        ''', (default_user_id,))
 
-    # Add user_id to user_feedback
-    cursor.execute('''
-        ALTER TABLE user_feedback ADD COLUMN user_id INTEGER DEFAULT 1
-    ''')
-    cursor.execute('''
-        UPDATE user_feedback SET user_id = ? WHERE user_id IS NULL OR user_id = 1
-    ''', (default_user_id,))
+    print("✅ User support migration complete!")
 
-    # Add user_id to user_playlists
-    cursor.execute('''
-        ALTER TABLE user_playlists ADD COLUMN user_id INTEGER DEFAULT 1
-    ''')
-    cursor.execute('''
-        UPDATE user_playlists SET user_id = ? WHERE user_id IS NULL OR user_id = 1
-    ''', (default_user_id,))
 
-    conn.commit()
-    conn.close()
-    print("✅ User support migration complete!")
+# Indexes for the feedback/history/playlist access paths (see explain_hot_queries)
+QUERY_INDEXES = {
+    # Cooldown lookup: WHERE user_id = ? AND feedback_type = 'skipped' AND created_at >= ?
+    'idx_feedback_user_type_created': 'user_feedback (user_id, feedback_type, created_at, suggestion_id)',
+    # History / rated bands: WHERE user_id = ? ORDER BY created_at DESC (covers the join key)
+    'idx_feedback_user_created': 'user_feedback (user_id, created_at, suggestion_id)',
+    # Keyset-paginated history: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    'idx_feedback_user_created_id': 'user_feedback (user_id, created_at, id)',
+    # save_feedback upsert lookup
+    'idx_feedback_suggestion_user': 'user_feedback (suggestion_id, user_id)',
+    'idx_suggestions_user': 'music_suggestions (user_id)',
+    'idx_playlists_user_created': 'user_playlists (user_id, created_at)',
+    'idx_playlist_suggestions_playlist': 'playlist_suggestions (playlist_id, suggestion_id)',
+    'idx_playlist_suggestions_suggestion': 'playlist_suggestions (suggestion_id)',
+}
 
-# User CRUD Functions
 
-def create_user(name, avatar_color='#2980b9', pin=None):
-    """Create a new user profile with optional PIN."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrate_add_query_indexes():
+    """Migration: Add indexes for the feedback, history and playlist queries."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # Hash the PIN if provided
-        pin_hash = generate_password_hash(pin) if pin else None
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        existing = {row['name'] for row in cursor.fetchall()}
+        missing = [name for name in QUERY_INDEXES if name not in existing]
+        if not missing:
+            return  # Already migrated
 
-        cursor.execute('''
-            INSERT INTO users (name, avatar_color, pin_hash) VALUES (?, ?, ?)
-        ''', (name, avatar_color, pin_hash))
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return user_id
-    except sqlite3.IntegrityError:
-        conn.close()
-        return None  # Name already exists
+        print("🔄 Running query index migration...")
 
-def get_all_users():
-    """Get all user profiles with PIN status."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        for name in missing:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {QUERY_INDEXES[name]}')
 
-    cursor.execute('''
-        SELECT id, name, avatar_color, created_at, pin_hash IS NOT NULL as has_pin
-        FROM users ORDER BY created_at
-    ''')
+        # Refresh planner statistics for the new indexes
+        cursor.execute('ANALYZE')
 
-    users = []
-    for row in cursor.fetchall():
-        user = dict(row)
-        user['has_pin'] = bool(user['has_pin'])
-        users.append(user)
-    conn.close()
-    return users
+    print(f"✅ Query index migration complete! ({len(missing)} indexes added)")
+
+
+def explain_hot_queries(user_id=1):
+    """
+    Run the hot read paths and capture EXPLAIN QUERY PLAN for every SELECT they issue.
+
+    Returns:
+        Dict mapping function name to a list of (sql, [plan detail strings])
+    """
+    hot_paths = {
+        'get_full_feedback_history': lambda: get_full_feedback_history(user_id),
+        'get_user_feedback_history': lambda: get_user_feedback_history(user_id),
+        'get_recently_skipped_bands': lambda: get_recently_skipped_bands(user_id),
+        'get_all_rated_bands': lambda: get_all_rated_bands(user_id),
+        'get_bands_in_playlists': lambda: get_bands_in_playlists(user_id),
+        'get_all_playlists': lambda: get_all_playlists(user_id),
+        'get_feedback_history_page': lambda: get_feedback_history_page(user_id),
+        'get_feedback_stats': lambda: get_feedback_stats(user_id),
+    }
 
-def get_user_by_id(user_id):
-    """Get a specific user by ID."""
     conn = get_db_connection()
-    cursor = conn.cursor()
+    plans = {}
+    for name, run in hot_paths.items():
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            run()
+        finally:
+            conn.set_trace_callback(None)
 
-    cursor.execute('''
-        SELECT id, name, avatar_color, created_at FROM users WHERE id = ?
-    ''', (user_id,))
+        plans[name] = []
+        for sql in statements:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+            plans[name].append((sql, [row['detail'] for row in rows]))
+    return plans
 
-    row = cursor.fetchone()
-    conn.close()
-    return dict(row) if row else None
 
+def find_full_table_scans(plans):
+    """
+    Find plan steps that scan a whole table instead of using an index.
 
-def get_user_with_pin_status(user_id):
-    """Get a user by ID including whether they have a PIN set."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    Args:
+        plans: Output of explain_hot_queries()
 
-    cursor.execute('''
-        SELECT id, name, avatar_color, created_at, pin_hash IS NOT NULL as has_pin
-        FROM users WHERE id = ?
-    ''', (user_id,))
+    Returns:
+        List of (function name, plan detail) tuples; empty if every query is indexed
+    """
+    scans = []
+    for name, queries in plans.items():
+        for sql, details in queries:
+            for detail in details:
+                # SQLite reports "SCAN <table>" (or "SCAN TABLE <table>" on older
+                # versions) for full scans and "... USING [COVERING] INDEX" otherwise
+                if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+                    scans.append((name, detail))
+    return scans
 
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        user = dict(row)
-        user['has_pin'] = bool(user['has_pin'])
-        return user
-    return None
 
+# Suggestions saved within this many seconds of each other with identical
+# preferences and sources are treated as one request when backfilling
+REQUEST_BACKFILL_WINDOW_SECONDS = 60
 
-def verify_user_pin(user_id, pin):
-    """Verify a user's PIN. Returns True if correct, False otherwise."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute('SELECT pin_hash FROM users WHERE id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+def migrate_add_recommendation_requests():
+    """
+    Migration: Store request preferences once per recommendation request.
 
-    if not row or not row['pin_hash']:
-        return False
+    Creates recommendation_requests, links music_suggestions to it via
+    request_id, backfills requests from the old per-suggestion user_preferences
+    rows and sources_used names, then drops user_preferences.
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    return check_password_hash(row['pin_hash'], pin)
+        cursor.execute("PRAGMA table_info(music_suggestions)")
+        columns = [col['name'] for col in cursor.fetchall()]
+        if 'request_id' in columns:
+            return  # Already migrated
 
+        print("🔄 Running recommendation request migration...")
 
-def set_user_pin(user_id, pin):
-    """Set or update a user's PIN."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recommendation_requests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                time_of_day TEXT,
+                mood TEXT,
+                tempo INTEGER,
+                instruments_yes TEXT,
+                instruments_no TEXT,
+                source_ids TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            ALTER TABLE music_suggestions
+            ADD COLUMN request_id INTEGER REFERENCES recommendation_requests(id)
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_user ON recommendation_requests (user_id)')
 
-    pin_hash = generate_password_hash(pin)
-    cursor.execute('UPDATE users SET pin_hash = ? WHERE id = ?', (pin_hash, user_id))
+        # Backfill: group consecutive suggestions that share user, preferences
+        # and sources into one request
+        cursor.execute('SELECT id, source_name FROM source_preferences')
+        source_ids_by_name = {row['source_name']: row['id'] for row in cursor.fetchall()}
 
-    conn.commit()
-    conn.close()
-    return True
+        cursor.execute('''
+            SELECT ms.id, ms.user_id, ms.sources_used, ms.created_at,
+                   up.time_of_day, up.mood, up.tempo, up.instruments_yes, up.instruments_no
+            FROM music_suggestions ms
+            LEFT JOIN user_preferences up ON ms.id = up.suggestion_id
+            ORDER BY ms.id
+        ''')
 
+        links = []
+        seen = set()
+        group_key = group_start = request_id = None
+        for row in cursor.fetchall():
+            if row['id'] in seen:
+                continue  # Duplicate preference rows for one suggestion
+            seen.add(row['id'])
+
+            names = [n for n in (row['sources_used'] or '').split(',') if n]
+            resolved_ids = [source_ids_by_name[n] for n in names if n in source_ids_by_name]
+            source_ids = _join_ids(resolved_ids)
+            key = (row['user_id'] or 1, row['time_of_day'], row['mood'], row['tempo'],
+                   row['instruments_yes'], row['instruments_no'], source_ids)
+            try:
+                created = datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                created = None
+
+            same_request = (
+                key == group_key and created and group_start
+                and (created - group_start).total_seconds() <= REQUEST_BACKFILL_WINDOW_SECONDS
+            )
+            if not same_request:
+                cursor.execute('''
+                    INSERT INTO recommendation_requests
+                        (user_id, time_of_day, mood, tempo, instruments_yes, instruments_no, source_ids, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                ''', key + (row['created_at'],))
+                request_id = cursor.lastrowid
+                group_key, group_start = key, created
+            # Keep the legacy names only if some no longer match a source
+            resolved = len(resolved_ids) == len(names)
+            links.append((request_id, None if resolved else row['sources_used'], row['id']))
 
-def user_has_pin(user_id):
-    """Check if a user has a PIN set."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        cursor.executemany('UPDATE music_suggestions SET request_id = ?, sources_used = ? WHERE id = ?', links)
+        cursor.execute('DROP TABLE IF EXISTS user_preferences')
 
-    cursor.execute('SELECT pin_hash FROM users WHERE id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    print(f"✅ Recommendation request migration complete! ({len(links)} suggestions linked)")
 
-    return row is not None and row['pin_hash'] is not None
 
-def delete_user(user_id):
-    """Delete a user and all their data."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrate_add_artists():
+    """
+    Migration: Add a canonical artists table and link music_suggestions to it.
 
-    # Check if this is the last user
-    cursor.execute("SELECT COUNT(*) FROM users")
-    count = cursor.fetchone()[0]
-    if count <= 1:
-        conn.close()
-        return False  # Can't delete last user
+    Each distinct (normalized) band name becomes one artist row that also
+    caches the artist's Spotify metadata.
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Delete user's feedback
-    cursor.execute('DELETE FROM user_feedback WHERE user_id = ?', (user_id,))
+        cursor.execute("PRAGMA table_info(music_suggestions)")
+        columns = [col['name'] for col in cursor.fetchall()]
+        if 'artist_id' in columns:
+            return  # Already migrated
 
-    # Delete user's playlist links first (junction table)
-    cursor.execute('''
-        DELETE FROM playlist_suggestions
-        WHERE playlist_id IN (SELECT id FROM user_playlists WHERE user_id = ?)
-    ''', (user_id,))
+        print("🔄 Running artists migration...")
 
-    # Delete user's playlists
-    cursor.execute('DELETE FROM user_playlists WHERE user_id = ?', (user_id,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS artists (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                normalized_name TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                spotify_id TEXT,
+                uri TEXT,
+                spotify_url TEXT,
+                image_url TEXT,
+                genres TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_artists_spotify_id ON artists (spotify_id)')
+        cursor.execute('''
+            ALTER TABLE music_suggestions
+            ADD COLUMN artist_id INTEGER REFERENCES artists(id)
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_suggestions_artist ON music_suggestions (artist_id)')
+
+        # Backfill: one artist per normalized name, named after its first suggestion
+        cursor.execute('SELECT id, band_name FROM music_suggestions ORDER BY id')
+        suggestions = cursor.fetchall()
+        artist_ids = _upsert_artists(cursor, [row['band_name'] for row in suggestions])
+        cursor.executemany(
+            'UPDATE music_suggestions SET artist_id = ? WHERE id = ?',
+            [(artist_ids[normalize_artist_name(row['band_name'])], row['id']) for row in suggestions]
+        )
 
-    # Delete user's suggestions
-    cursor.execute('DELETE FROM music_suggestions WHERE user_id = ?', (user_id,))
+    print(f"✅ Artists migration complete! ({len(set(artist_ids.values()))} artists "
+          f"for {len(suggestions)} suggestions)")
 
-    # Delete the user
-    cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
 
-    conn.commit()
-    conn.close()
-    return True
+def migrate_add_artist_search_cache():
+    """Migration: Track when each artist was last searched on Spotify, for cache expiry."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-def get_user_count():
-    """Get total number of users."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+        cursor.execute("PRAGMA table_info(artists)")
+        columns = [col['name'] for col in cursor.fetchall()]
+        if 'spotify_checked_at' in columns:
+            return  # Already migrated
 
-def ensure_default_user():
-    """Ensure at least one user exists, create Default if not."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        print("🔄 Running artist search cache migration...")
 
-    cursor.execute("SELECT id FROM users LIMIT 1")
-    if not cursor.fetchone():
+        cursor.execute('ALTER TABLE artists ADD COLUMN spotify_checked_at TIMESTAMP')
+        # Artists resolved before this migration count as found at their last update
         cursor.execute('''
-            INSERT INTO users (name, avatar_color) VALUES ('Default', '#2980b9')
+            UPDATE artists SET spotify_checked_at = updated_at
+            WHERE spotify_id IS NOT NULL
         ''')
-        conn.commit()
 
-    conn.close()
+    print("✅ Artist search cache migration complete!")
 
-# CRUD Functions for Music Suggestions
 
-def save_suggestion(band_name, genre=None, description=None, match_reason=None, sources_used=None, user_id=1):
-    """Save a music suggestion to the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrate_add_recommendation_cache():
+    """Migration: Add a cache of LLM recommendation results shared by all workers."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Convert sources list to comma-separated string
-    sources_str = ','.join(sources_used) if sources_used else ''
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'recommendation_cache'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-    cursor.execute('''
-        INSERT INTO music_suggestions (band_name, genre, description, match_reason, sources_used, user_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (band_name, genre, description, match_reason, sources_str, user_id))
+        print("🔄 Running recommendation cache migration...")
 
-    suggestion_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS recommendation_cache (
+                cache_key TEXT PRIMARY KEY,
+                recommendations TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_recommendation_cache_last_used
+            ON recommendation_cache (last_used_at)
+        ''')
 
-    return suggestion_id
+    print("✅ Recommendation cache migration complete!")
 
-def save_user_preferences(suggestion_id, time_of_day, mood, tempo, instruments_yes, instruments_no):
-    """Save the user preferences that generated a suggestion."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Convert lists to comma-separated strings
-    instruments_yes_str = ','.join(instruments_yes) if instruments_yes else ''
-    instruments_no_str = ','.join(instruments_no) if instruments_no else ''
-    
-    cursor.execute('''
-        INSERT INTO user_preferences (suggestion_id, time_of_day, mood, tempo, instruments_yes, instruments_no)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (suggestion_id, time_of_day, mood, tempo, instruments_yes_str, instruments_no_str))
-    
-    conn.commit()
-    conn.close()
 
-def save_feedback(suggestion_id, feedback_type, user_id=1):
-    """Save or update user feedback (positive/negative/skipped) for a suggestion."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrate_add_llm_call_locks():
+    """Migration: Add the lock table that coalesces identical in-flight LLM calls across workers."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Check if feedback already exists for this suggestion and user
-    cursor.execute('''
-        SELECT id FROM user_feedback
-        WHERE suggestion_id = ? AND user_id = ?
-    ''', (suggestion_id, user_id))
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'llm_calls'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-    existing = cursor.fetchone()
+        print("🔄 Running LLM call lock migration...")
 
-    if existing:
-        # Update existing feedback
-        cursor.execute('''
-            UPDATE user_feedback
-            SET feedback_type = ?, created_at = CURRENT_TIMESTAMP
-            WHERE suggestion_id = ? AND user_id = ?
-        ''', (feedback_type, suggestion_id, user_id))
-    else:
-        # Insert new feedback
         cursor.execute('''
-            INSERT INTO user_feedback (suggestion_id, feedback_type, user_id)
-            VALUES (?, ?, ?)
-        ''', (suggestion_id, feedback_type, user_id))
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                call_key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                response_text TEXT,
+                finished_at REAL
+            )
+        ''')
 
-    conn.commit()
-    conn.close()
-def get_enabled_sources(user_id=1):
-    """Get all enabled music discovery sources for a user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    print("✅ LLM call lock migration complete!")
 
-    # Get sources with per-user enabled status
-    # If user has a preference, use it; otherwise use global default
-    cursor.execute('''
-        SELECT sp.source_name, sp.source_url, sp.description
-        FROM source_preferences sp
-        LEFT JOIN user_source_preferences usp
-            ON sp.id = usp.source_id AND usp.user_id = ?
-        WHERE COALESCE(usp.is_enabled, sp.is_enabled) = 1
-    ''', (user_id,))
 
-    sources = cursor.fetchall()
-    conn.close()
+def migrate_add_candidate_pools():
+    """Migration: Add per-user pools of pre-generated recommendation candidates."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    return [dict(source) for source in sources]
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'candidate_pools'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-def get_all_sources(user_id=1):
-    """Get all music sources with per-user enabled/disabled status."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        print("🔄 Running candidate pool migration...")
 
-    # Get all sources with per-user enabled status
-    # If user has a preference, use it; otherwise use global default
-    cursor.execute('''
-        SELECT sp.id, sp.source_name, sp.source_url,
-               COALESCE(usp.is_enabled, sp.is_enabled) as is_enabled,
-               sp.description
-        FROM source_preferences sp
-        LEFT JOIN user_source_preferences usp
-            ON sp.id = usp.source_id AND usp.user_id = ?
-        ORDER BY sp.source_name
-    ''', (user_id,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS candidate_pools (
+                user_id INTEGER NOT NULL,
+                context_key TEXT NOT NULL,
+                candidates TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, context_key),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
 
-    sources = cursor.fetchall()
-    conn.close()
+    print("✅ Candidate pool migration complete!")
 
-    return [dict(source) for source in sources]
 
-def update_source_preference(source_id, is_enabled, user_id=1):
-    """Enable or disable a music source for a specific user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrate_add_prefetched_batches():
+    """Migration: Add per-session slots for the prefetched next swipe batch."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Insert or update user-specific preference
-    cursor.execute('''
-        INSERT INTO user_source_preferences (user_id, source_id, is_enabled)
-        VALUES (?, ?, ?)
-        ON CONFLICT(user_id, source_id)
-        DO UPDATE SET is_enabled = excluded.is_enabled
-    ''', (user_id, source_id, is_enabled))
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'prefetched_batches'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-    conn.commit()
-    conn.close()
+        print("🔄 Running prefetched batch migration...")
 
-def get_user_feedback_history(user_id=1):
-    """Get all feedback with associated preferences for learning."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prefetched_batches (
+                session_key TEXT PRIMARY KEY,
+                context_key TEXT NOT NULL,
+                recommendations TEXT,
+                created_at REAL NOT NULL
+            )
+        ''')
 
-    cursor.execute('''
-        SELECT
-            ms.band_name,
-            up.mood,
-            up.tempo,
-            up.instruments_yes,
-            up.instruments_no,
-            uf.feedback_type,
-            uf.created_at
-        FROM user_feedback uf
-        JOIN music_suggestions ms ON uf.suggestion_id = ms.id
-        JOIN user_preferences up ON ms.id = up.suggestion_id
-        WHERE uf.user_id = ?
-        ORDER BY uf.created_at DESC
-    ''', (user_id,))
+    print("✅ Prefetched batch migration complete!")
 
-    history = cursor.fetchall()
-    conn.close()
 
-    return [dict(row) for row in history]
+def migrate_add_taste_contexts():
+    """Migration: Add the derived taste context (known artists, ranked genres) computed at sync time."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-def get_recently_skipped_bands(user_id=1, days=5):
-    """Get bands that were skipped in the last X days for a user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'taste_contexts'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-    cursor.execute('''
-        SELECT DISTINCT ms.band_name
-        FROM user_feedback uf
-        JOIN music_suggestions ms ON uf.suggestion_id = ms.id
-        WHERE uf.feedback_type = 'skipped'
-        AND uf.user_id = ?
-        AND uf.created_at >= datetime('now', '-' || ? || ' days')
-    ''', (user_id, days))
+        print("🔄 Running taste context migration...")
 
-    skipped = cursor.fetchall()
-    conn.close()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS taste_contexts (
+                user_id INTEGER PRIMARY KEY,
+                synced_at TIMESTAMP NOT NULL,
+                context TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
 
-    return [row['band_name'] for row in skipped]
+    print("✅ Taste context migration complete!")
 
-def get_excluded_bands(user_id=1):
-    """Get all bands to exclude from recommendations (recently skipped)."""
-    return get_recently_skipped_bands(user_id=user_id, days=5)
 
-def get_full_feedback_history(user_id=1):
-    """Get complete feedback history with all details for the history page."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def migrate_add_taste_artists():
+    """
+    Migration: Store synced Spotify taste data as one row per artist.
 
-    cursor.execute('''
-        SELECT
-            ms.id,
-            ms.band_name,
-            ms.genre,
-            ms.description,
-            ms.match_reason,
-            ms.sources_used,
-            up.time_of_day,
-            up.mood,
-            up.tempo,
-            up.instruments_yes,
-            up.instruments_no,
-            uf.feedback_type,
-            uf.created_at
-        FROM user_feedback uf
-        JOIN music_suggestions ms ON uf.suggestion_id = ms.id
-        LEFT JOIN user_preferences up ON ms.id = up.suggestion_id
-        WHERE uf.user_id = ?
-        ORDER BY uf.created_at DESC
-    ''', (user_id,))
+    Creates taste_sources (one row per synced list), taste_artists and the
+    per-user genre counts in taste_genres, moves the spotify_taste_data
+    blobs (which were JSON-encoded twice) into them, then drops
+    spotify_taste_data.
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    history = cursor.fetchall()
-    conn.close()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'taste_artists'")
+        if cursor.fetchone():
+            return  # Already migrated
 
-    return [dict(row) for row in history]
+        print("🔄 Running taste artists migration...")
 
-def add_new_source(source_name, source_url, description, is_enabled=1):
-    """Add a new custom music source."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS taste_sources (
+                user_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                time_range TEXT NOT NULL DEFAULT '',
+                artist_count INTEGER NOT NULL,
+                synced_at TIMESTAMP NOT NULL,
+                sync_cursor TEXT,
+                PRIMARY KEY (user_id, source, time_range),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS taste_artists (
+                user_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                time_range TEXT NOT NULL DEFAULT '',
+                position INTEGER NOT NULL,
+                spotify_id TEXT,
+                name TEXT NOT NULL,
+                genres TEXT NOT NULL DEFAULT '[]',
+                PRIMARY KEY (user_id, source, time_range, position),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS taste_genres (
+                user_id INTEGER NOT NULL,
+                genre TEXT NOT NULL,
+                artist_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, genre),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_taste_genres_count
+            ON taste_genres (user_id, artist_count DESC)
+        ''')
+
+        users = set()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'spotify_taste_data'")
+        if cursor.fetchone():
+            cursor.execute('''
+                SELECT user_id, data_type, time_range, data, synced_at
+                FROM spotify_taste_data
+                ORDER BY id
+            ''')
+            for row in cursor.fetchall():
+                data = json.loads(row['data'])
+                if isinstance(data, str):
+                    data = json.loads(data)  # Double-encoded by the old sync
+                _replace_taste_artists(cursor, row['user_id'], row['data_type'], row['time_range'],
+                                       data, row['synced_at'])
+                users.add(row['user_id'])
+            cursor.execute('DROP TABLE spotify_taste_data')
+
+        for user_id in users:
+            _refresh_taste_genres(cursor, user_id)
+
+    print(f"✅ Taste artists migration complete! ({len(users)} users moved)")
+
+
+def migrate_add_taste_sync_cursor():
+    """
+    Migration: Remember where each taste list's last sync stopped, for incremental syncs.
+
+    taste_sources is created with the column now; this adds it to databases
+    that ran the taste artists migration before it existed.
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(taste_sources)")
+        columns = [col['name'] for col in cursor.fetchall()]
+        if 'sync_cursor' in columns:
+            return  # Already migrated
+
+        print("🔄 Running taste sync cursor migration...")
+
+        cursor.execute('ALTER TABLE taste_sources ADD COLUMN sync_cursor TEXT')
+
+    print("✅ Taste sync cursor migration complete!")
+
+
+def migrate_add_taste_sync_jobs():
+    """Migration: Add background taste sync jobs (at most one active per user)."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'taste_sync_jobs'")
+        if cursor.fetchone():
+            return  # Already migrated
+
+        print("🔄 Running taste sync job migration...")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS taste_sync_jobs (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                full_sync BOOLEAN NOT NULL DEFAULT 0,
+                phases TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_taste_sync_jobs_active
+            ON taste_sync_jobs (user_id) WHERE status IN ('queued', 'running')
+        ''')
+
+    print("✅ Taste sync job migration complete!")
+
+
+def migrate_add_token_refresh_locks():
+    """Migration: Add the cross-process lock that keeps Spotify token refreshes to one per user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'token_refresh_locks'")
+        if cursor.fetchone():
+            return  # Already migrated
+
+        print("🔄 Running token refresh lock migration...")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS token_refresh_locks (
+                user_id INTEGER PRIMARY KEY,
+                owner TEXT NOT NULL,
+                started_at REAL NOT NULL
+            )
+        ''')
+
+    print("✅ Token refresh lock migration complete!")
+
+
+def migrate_add_rate_limit_buckets():
+    """Migration: Add the token buckets that rate-limit outbound API calls across workers."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'rate_limit_buckets'")
+        if cursor.fetchone():
+            return  # Already migrated
+
+        print("🔄 Running rate limit bucket migration...")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0
+            )
+        ''')
+
+    print("✅ Rate limit bucket migration complete!")
+
+
+def migrate_add_artist_top_tracks():
+    """Migration: Add the cache of Spotify top tracks per artist and market."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'artist_top_tracks'")
+        if cursor.fetchone():
+            return  # Already migrated
+
+        print("🔄 Running artist top tracks migration...")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS artist_top_tracks (
+                spotify_id TEXT NOT NULL,
+                market TEXT NOT NULL,
+                tracks TEXT NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (spotify_id, market)
+            )
+        ''')
+
+    print("✅ Artist top tracks migration complete!")
+
+
+def migrate_add_playlist_writes():
+    """Migration: Add progress tracking for chunked Spotify playlist writes."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'playlist_writes'")
+        if cursor.fetchone():
+            return  # Already migrated
+
+        print("🔄 Running playlist write migration...")
+
+        # base_total: tracks the playlist had before the write, so the expected
+        # size after each chunk is known when verifying a retry or a resume
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS playlist_writes (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                spotify_playlist_id TEXT NOT NULL,
+                track_uris TEXT NOT NULL,
+                base_total INTEGER NOT NULL DEFAULT 0,
+                chunks_done INTEGER NOT NULL DEFAULT 0,
+                snapshot_id TEXT,
+                status TEXT NOT NULL DEFAULT 'running',
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_playlist_writes_user
+            ON playlist_writes(user_id, status)
+        ''')
+
+    print("✅ Playlist write migration complete!")
+
+
+def migrate_add_request_source_names():
+    """
+    Migration: Store the names of a request's sources on the request itself.
+
+    History resolved source_ids against source_preferences, so deleting a
+    custom source erased its name from every past request. Existing requests
+    are backfilled from the sources that still exist.
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(recommendation_requests)")
+        columns = [col['name'] for col in cursor.fetchall()]
+        if 'source_names' in columns:
+            return  # Already migrated
+
+        print("🔄 Running request source names migration...")
+
+        cursor.execute('ALTER TABLE recommendation_requests ADD COLUMN source_names TEXT')
+
+        cursor.execute('SELECT id, source_name FROM source_preferences')
+        names = {str(row['id']): row['source_name'] for row in cursor.fetchall()}
+        cursor.execute("SELECT id, source_ids FROM recommendation_requests WHERE source_ids != ''")
+        updates = [
+            (','.join(names[i] for i in row['source_ids'].split(',') if i in names), row['id'])
+            for row in cursor.fetchall()
+        ]
+        cursor.executemany('UPDATE recommendation_requests SET source_names = ? WHERE id = ?', updates)
+
+    print(f"✅ Request source names migration complete! ({len(updates)} requests backfilled)")
+
+
+def migrate_add_playlist_write_bookkeeping():
+    """Migration: Link playlist writes to the DailyJams playlist whose counts and suggestion links they update."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(playlist_writes)")
+        columns = [col['name'] for col in cursor.fetchall()]
+        if 'db_playlist_id' in columns:
+            return  # Already migrated
+
+        print("🔄 Running playlist write bookkeeping migration...")
+
+        # tracks_recorded: tracks of the write already counted in user_playlists.track_count
+        cursor.execute('ALTER TABLE playlist_writes ADD COLUMN db_playlist_id INTEGER REFERENCES user_playlists(id)')
+        cursor.execute('ALTER TABLE playlist_writes ADD COLUMN suggestion_tracks TEXT')
+        cursor.execute('ALTER TABLE playlist_writes ADD COLUMN tracks_recorded INTEGER NOT NULL DEFAULT 0')
+
+    print("✅ Playlist write bookkeeping migration complete!")
+
+
+# Schema Migrations
+#
+# Ordered registry of (version, name, function). Append new steps at the end
+# with the next version number - never renumber or reorder applied steps.
+# Each step must be safe to re-run, since databases created before the
+# schema_version table existed replay every step once.
+MIGRATIONS = [
+    (1, 'initial schema', initialize_database),
+    (2, 'default sources', insert_default_sources),
+    (3, 'user support', migrate_add_user_support),
+    (4, 'spotify support', migrate_add_spotify_support),
+    (5, 'per-user source preferences', migrate_add_user_source_preferences),
+    (6, 'pin support', migrate_add_pin_support),
+    (7, 'query indexes', migrate_add_query_indexes),
+    (8, 'history keyset index', migrate_add_query_indexes),
+    (9, 'recommendation requests', migrate_add_recommendation_requests),
+    (10, 'artists', migrate_add_artists),
+    (11, 'artist search cache', migrate_add_artist_search_cache),
+    (12, 'recommendation cache', migrate_add_recommendation_cache),
+    (13, 'llm call locks', migrate_add_llm_call_locks),
+    (14, 'candidate pools', migrate_add_candidate_pools),
+    (15, 'prefetched batches', migrate_add_prefetched_batches),
+    (16, 'taste contexts', migrate_add_taste_contexts),
+    (17, 'taste artists', migrate_add_taste_artists),
+    (18, 'taste sync cursor', migrate_add_taste_sync_cursor),
+    (19, 'taste sync jobs', migrate_add_taste_sync_jobs),
+    (20, 'token refresh locks', migrate_add_token_refresh_locks),
+    (21, 'rate limit buckets', migrate_add_rate_limit_buckets),
+    (22, 'artist top tracks', migrate_add_artist_top_tracks),
+    (23, 'playlist writes', migrate_add_playlist_writes),
+    (24, 'request source names', migrate_add_request_source_names),
+    (25, 'playlist write bookkeeping', migrate_add_playlist_write_bookkeeping),
+]
+
+
+def get_schema_version():
+    """Get the highest applied migration version (0 for a fresh database)."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0  # schema_version table doesn't exist yet
+    return row[0] or 0
+
+
+@contextmanager
+def _migration_lock():
+    """Hold an exclusive file lock next to the database while migrating."""
+    try:
+        import fcntl
+    except ImportError:
+        yield  # No flock (Windows) - BEGIN IMMEDIATE still serializes writers
+        return
+
+    with open(DB_PATH + '.migrate.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_migrations():
+    """
+    Apply any pending schema migrations.
+
+    When the schema is current this is a single indexed read. Otherwise it
+    takes a file lock (so several workers booting together don't race),
+    re-checks the version, and applies the pending steps in one transaction.
+
+    Returns:
+        List of migration versions that were applied
+    """
+    latest = MIGRATIONS[-1][0]
+    if get_schema_version() >= latest:
+        return []
+
+    with _migration_lock():
+        start = time.perf_counter()
+        conn = get_db_connection()
+        with db_transaction():
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Another worker may have finished while we waited for the lock
+            current = get_schema_version()
+            pending = [m for m in MIGRATIONS if m[0] > current]
+            for version, name, migrate in pending:
+                migrate()
+                conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+
+    if pending:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"✅ Schema migrated to version {latest} ({len(pending)} steps, {elapsed_ms:.0f} ms)")
+    return [m[0] for m in pending]
+
+# User CRUD Functions
+
+def create_user(name, avatar_color='#2980b9', pin=None):
+    """Create a new user profile with optional PIN."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        try:
+            # Hash the PIN if provided
+            pin_hash = generate_password_hash(pin) if pin else None
+
+            cursor.execute('''
+                INSERT INTO users (name, avatar_color, pin_hash) VALUES (?, ?, ?)
+            ''', (name, avatar_color, pin_hash))
+            user_id = cursor.lastrowid
+            return user_id
+        except sqlite3.IntegrityError:
+            return None  # Name already exists
+
+def get_all_users():
+    """Get all user profiles with PIN status."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, name, avatar_color, created_at, pin_hash IS NOT NULL as has_pin
+            FROM users ORDER BY created_at
+        ''')
+
+        users = []
+        for row in cursor.fetchall():
+            user = dict(row)
+            user['has_pin'] = bool(user['has_pin'])
+            users.append(user)
+    return users
+
+def get_user_by_id(user_id):
+    """Get a specific user by ID."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, name, avatar_color, created_at FROM users WHERE id = ?
+        ''', (user_id,))
+
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def get_user_with_pin_status(user_id):
+    """Get a user by ID including whether they have a PIN set."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, name, avatar_color, created_at, pin_hash IS NOT NULL as has_pin
+            FROM users WHERE id = ?
+        ''', (user_id,))
+
+        row = cursor.fetchone()
+    if row:
+        user = dict(row)
+        user['has_pin'] = bool(user['has_pin'])
+        return user
+    return None
+
+
+def verify_user_pin(user_id, pin):
+    """Verify a user's PIN. Returns True if correct, False otherwise."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT pin_hash FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+
+    if not row or not row['pin_hash']:
+        return False
+
+    return check_password_hash(row['pin_hash'], pin)
+
+
+def set_user_pin(user_id, pin):
+    """Set or update a user's PIN."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        pin_hash = generate_password_hash(pin)
+        cursor.execute('UPDATE users SET pin_hash = ? WHERE id = ?', (pin_hash, user_id))
+
+    return True
+
+
+def user_has_pin(user_id):
+    """Check if a user has a PIN set."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT pin_hash FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+
+    return row is not None and row['pin_hash'] is not None
+
+def delete_user(user_id):
+    """Delete a user and all their data."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Check if this is the last user
+        cursor.execute("SELECT COUNT(*) FROM users")
+        count = cursor.fetchone()[0]
+        if count <= 1:
+            return False  # Can't delete last user
+
+        # Delete user's feedback
+        cursor.execute('DELETE FROM user_feedback WHERE user_id = ?', (user_id,))
+
+        # Delete user's playlist links first (junction table)
+        cursor.execute('''
+            DELETE FROM playlist_suggestions
+            WHERE playlist_id IN (SELECT id FROM user_playlists WHERE user_id = ?)
+        ''', (user_id,))
+
+        # Delete user's playlists
+        cursor.execute('DELETE FROM user_playlists WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM playlist_writes WHERE user_id = ?', (user_id,))
+
+        # Delete user's suggestions and the requests that generated them
+        cursor.execute('DELETE FROM music_suggestions WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM recommendation_requests WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM candidate_pools WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM taste_contexts WHERE user_id = ?', (user_id,))
+        for table in ('taste_sources', 'taste_artists', 'taste_genres', 'taste_sync_jobs'):
+            cursor.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+
+        # Delete the user
+        cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+
+    return True
+
+def get_user_count():
+    """Get total number of users."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users")
+        count = cursor.fetchone()[0]
+    return count
+
+def ensure_default_user():
+    """Ensure at least one user exists, create Default if not."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT id FROM users LIMIT 1")
+        if not cursor.fetchone():
+            cursor.execute('''
+                INSERT INTO users (name, avatar_color) VALUES ('Default', '#2980b9')
+            ''')
+
+
+# Artist Functions
+
+# How long Spotify artist search results stay cached in the artists table
+ARTIST_CACHE_TTL_SECONDS = int(os.getenv('ARTIST_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+ARTIST_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv('ARTIST_NEGATIVE_CACHE_TTL_SECONDS', 24 * 3600))
+
+# How long an artist's Spotify top tracks stay cached (per market)
+TOP_TRACKS_CACHE_TTL_SECONDS = int(os.getenv('TOP_TRACKS_CACHE_TTL_SECONDS', 24 * 3600))
+
+def normalize_artist_name(name):
+    """Normalize an artist name for matching: casefolded with whitespace collapsed."""
+    return ' '.join((name or '').casefold().split())
+
+
+def _upsert_artists(cursor, names):
+    """
+    Make sure an artist row exists for each name.
+
+    Args:
+        cursor: Cursor inside an open transaction
+        names: Artist names (any casing/spacing)
+
+    Returns:
+        Dict mapping normalized name to artist ID
+    """
+    by_key = {}
+    for name in names:
+        key = normalize_artist_name(name)
+        if key and key not in by_key:
+            by_key[key] = name.strip()
+    if not by_key:
+        return {}
+
+    cursor.executemany(
+        'INSERT OR IGNORE INTO artists (normalized_name, name) VALUES (?, ?)',
+        list(by_key.items())
+    )
+    keys = list(by_key)
+    artist_ids = {}
+    # Stay under SQLite's bound-parameter limit
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        cursor.execute(
+            f"SELECT id, normalized_name FROM artists WHERE normalized_name IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        artist_ids.update({row['normalized_name']: row['id'] for row in cursor.fetchall()})
+    return artist_ids
+
+
+def _artist_from_row(row):
+    """Convert an artists row to the dict shape returned by spotify_handler.search_artist."""
+    return {
+        'artist_id': row['id'],
+        'id': row['spotify_id'],
+        'name': row['name'],
+        'uri': row['uri'],
+        'spotify_url': row['spotify_url'],
+        'image_url': row['image_url'],
+        'genres': json.loads(row['genres']) if row['genres'] else []
+    }
+
+
+def get_artists_by_names(names):
+    """
+    Look up cached Spotify search results for artists.
+
+    Found artists are cached for ARTIST_CACHE_TTL_SECONDS. Names Spotify had
+    no match for are cached for the shorter ARTIST_NEGATIVE_CACHE_TTL_SECONDS,
+    so misspelled or made-up names don't cost a search on every request.
+
+    Args:
+        names: Artist names (any casing/spacing)
+
+    Returns:
+        Dict mapping each given name with a fresh cache entry to its artist
+        dict (see _artist_from_row), or to None if Spotify had no match.
+        Names without a fresh entry are left out.
+    """
+    keys = {name: normalize_artist_name(name) for name in names}
+    unique_keys = list(set(keys.values()))
+    if not unique_keys:
+        return {}
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        rows = {}
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            cursor.execute(f'''
+                SELECT * FROM artists
+                WHERE normalized_name IN ({','.join('?' * len(chunk))})
+                AND spotify_checked_at >= datetime('now', '-' || (
+                    CASE WHEN spotify_id IS NULL THEN ? ELSE ? END
+                ) || ' seconds')
+            ''', chunk + [ARTIST_NEGATIVE_CACHE_TTL_SECONDS, ARTIST_CACHE_TTL_SECONDS])
+            rows.update({row['normalized_name']: row for row in cursor.fetchall()})
+
+    return {
+        name: _artist_from_row(rows[key]) if rows[key]['spotify_id'] else None
+        for name, key in keys.items() if key in rows
+    }
+
+
+def save_artist_spotify_data(artist_name, spotify_artist):
+    """
+    Store a Spotify search result on the canonical artist row for a name (creating it if needed).
+
+    Args:
+        artist_name: Name the artist was looked up by
+        spotify_artist: Dict with id, name, uri, spotify_url, image_url and optional
+            genres, or None to record that Spotify had no match
+
+    Returns:
+        The artist ID
+    """
+    spotify_artist = spotify_artist or {}
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        key = normalize_artist_name(artist_name)
+        artist_id = _upsert_artists(cursor, [artist_name])[key]
+        cursor.execute('''
+            UPDATE artists
+            SET spotify_id = ?, uri = ?, spotify_url = ?, image_url = ?, genres = ?,
+                spotify_checked_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (
+            spotify_artist.get('id'),
+            spotify_artist.get('uri'),
+            spotify_artist.get('spotify_url'),
+            spotify_artist.get('image_url'),
+            json.dumps(spotify_artist.get('genres') or []),
+            artist_id
+        ))
+
+    return artist_id
+
+
+def get_cached_top_tracks(spotify_ids, market):
+    """
+    Look up cached Spotify top tracks for artists.
+
+    Entries are fresh for TOP_TRACKS_CACHE_TTL_SECONDS.
+
+    Args:
+        spotify_ids: Spotify artist IDs
+        market: Market/country code the tracks were fetched for
+
+    Returns:
+        Dict mapping each Spotify ID with a fresh entry to its track list
+    """
+    unique_ids = list(set(spotify_ids))
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cached = {}
+        for start in range(0, len(unique_ids), 500):
+            chunk = unique_ids[start:start + 500]
+            cursor.execute(f'''
+                SELECT spotify_id, tracks FROM artist_top_tracks
+                WHERE spotify_id IN ({','.join('?' * len(chunk))}) AND market = ?
+                AND fetched_at >= datetime('now', '-' || ? || ' seconds')
+            ''', chunk + [market, TOP_TRACKS_CACHE_TTL_SECONDS])
+            cached.update({row['spotify_id']: json.loads(row['tracks']) for row in cursor.fetchall()})
+
+    return cached
+
+
+def save_top_tracks(market, tracks_by_id):
+    """
+    Cache Spotify top tracks for artists.
+
+    Args:
+        market: Market/country code the tracks were fetched for
+        tracks_by_id: Dict mapping Spotify artist IDs to their track lists
+    """
+    if not tracks_by_id:
+        return
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT OR REPLACE INTO artist_top_tracks (spotify_id, market, tracks, fetched_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [(spotify_id, market, json.dumps(tracks)) for spotify_id, tracks in tracks_by_id.items()])
+
+
+# CRUD Functions for Music Suggestions
+
+def _join_ids(ids):
+    """Store a list of ids compactly as '1,4,7'."""
+    return ','.join(str(i) for i in ids) if ids else ''
+
+
+def save_recommendation_batch(recommendations, time_of_day, mood, tempo, instruments_yes, instruments_no,
+                              source_ids=None, user_id=1):
+    """
+    Save a batch of suggestions and the request that generated them in one transaction.
+
+    The request context (preferences and sources) is stored once in
+    recommendation_requests and every suggestion in the batch references it.
+    Source names are stored along with their IDs, so history keeps them
+    after a source is deleted.
+
+    Args:
+        recommendations: List of recommendation dicts (band_name, genre, description, match_reason)
+        time_of_day, mood, tempo, instruments_yes, instruments_no: Request preferences
+        source_ids: List of source_preferences IDs used for the request
+        user_id: ID of the user the suggestions belong to
+
+    Returns:
+        List of new suggestion IDs, in the same order as recommendations
+    """
+    if not recommendations:
+        return []
+
+    instruments_yes_str = ','.join(instruments_yes) if instruments_yes else ''
+    instruments_no_str = ','.join(instruments_no) if instruments_no else ''
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        source_ids = list(source_ids or [])
+        names = {}
+        if source_ids:
+            cursor.execute(f'''
+                SELECT id, source_name FROM source_preferences
+                WHERE id IN ({','.join('?' * len(source_ids))})
+            ''', source_ids)
+            names = {row['id']: row['source_name'] for row in cursor.fetchall()}
+        source_names = ','.join(names[i] for i in source_ids if i in names)
+
+        cursor.execute('''
+            INSERT INTO recommendation_requests
+                (user_id, time_of_day, mood, tempo, instruments_yes, instruments_no, source_ids, source_names)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, time_of_day, mood, tempo, instruments_yes_str, instruments_no_str, _join_ids(source_ids),
+              source_names))
+        request_id = cursor.lastrowid
+
+        artist_ids = _upsert_artists(cursor, [rec['band_name'] for rec in recommendations])
+
+        suggestion_ids = []
+        for rec in recommendations:
+            cursor.execute('''
+                INSERT INTO music_suggestions
+                    (band_name, genre, description, match_reason, request_id, artist_id, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (rec['band_name'], rec.get('genre', ''), rec.get('description', ''),
+                  rec.get('match_reason', ''), request_id,
+                  artist_ids.get(normalize_artist_name(rec['band_name'])), user_id))
+            suggestion_ids.append(cursor.lastrowid)
+
+    return suggestion_ids
+
+
+def save_feedback(suggestion_id, feedback_type, user_id=1):
+    """Save or update user feedback (positive/negative/skipped) for a suggestion."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Check if feedback already exists for this suggestion and user
+        cursor.execute('''
+            SELECT id FROM user_feedback
+            WHERE suggestion_id = ? AND user_id = ?
+        ''', (suggestion_id, user_id))
+
+        existing = cursor.fetchone()
+
+        if existing:
+            # Update existing feedback
+            cursor.execute('''
+                UPDATE user_feedback
+                SET feedback_type = ?, created_at = CURRENT_TIMESTAMP
+                WHERE suggestion_id = ? AND user_id = ?
+            ''', (feedback_type, suggestion_id, user_id))
+        else:
+            # Insert new feedback
+            cursor.execute('''
+                INSERT INTO user_feedback (suggestion_id, feedback_type, user_id)
+                VALUES (?, ?, ?)
+            ''', (suggestion_id, feedback_type, user_id))
+
+def get_enabled_sources(user_id=1):
+    """Get all enabled music discovery sources for a user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Get sources with per-user enabled status
+        # If user has a preference, use it; otherwise use global default
+        cursor.execute('''
+            SELECT sp.id, sp.source_name, sp.source_url, sp.description
+            FROM source_preferences sp
+            LEFT JOIN user_source_preferences usp
+                ON sp.id = usp.source_id AND usp.user_id = ?
+            WHERE COALESCE(usp.is_enabled, sp.is_enabled) = 1
+        ''', (user_id,))
+
+        sources = cursor.fetchall()
+
+    return [dict(source) for source in sources]
+
+def get_all_sources(user_id=1):
+    """Get all music sources with per-user enabled/disabled status."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Get all sources with per-user enabled status
+        # If user has a preference, use it; otherwise use global default
+        cursor.execute('''
+            SELECT sp.id, sp.source_name, sp.source_url,
+                   COALESCE(usp.is_enabled, sp.is_enabled) as is_enabled,
+                   sp.description
+            FROM source_preferences sp
+            LEFT JOIN user_source_preferences usp
+                ON sp.id = usp.source_id AND usp.user_id = ?
+            ORDER BY sp.source_name
+        ''', (user_id,))
+
+        sources = cursor.fetchall()
+
+    return [dict(source) for source in sources]
+
+def update_source_preference(source_id, is_enabled, user_id=1):
+    """Enable or disable a music source for a specific user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Insert or update user-specific preference
+        cursor.execute('''
+            INSERT INTO user_source_preferences (user_id, source_id, is_enabled)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id, source_id)
+            DO UPDATE SET is_enabled = excluded.is_enabled
+        ''', (user_id, source_id, is_enabled))
+
+
+def get_user_feedback_history(user_id=1):
+    """Get all feedback with associated preferences for learning."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT
+                ms.band_name,
+                rr.mood,
+                rr.tempo,
+                rr.instruments_yes,
+                rr.instruments_no,
+                uf.feedback_type,
+                uf.created_at
+            FROM user_feedback uf
+            JOIN music_suggestions ms ON uf.suggestion_id = ms.id
+            JOIN recommendation_requests rr ON ms.request_id = rr.id
+            WHERE uf.user_id = ?
+            ORDER BY uf.created_at DESC
+        ''', (user_id,))
+
+        history = cursor.fetchall()
+
+    return [dict(row) for row in history]
+
+def get_recently_skipped_bands(user_id=1, days=5):
+    """Get bands that were skipped in the last X days for a user, most recent first."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT COALESCE(a.name, ms.band_name) AS band_name
+            FROM user_feedback uf
+            JOIN music_suggestions ms ON uf.suggestion_id = ms.id
+            LEFT JOIN artists a ON ms.artist_id = a.id
+            WHERE uf.feedback_type = 'skipped'
+            AND uf.user_id = ?
+            AND uf.created_at >= datetime('now', '-' || ? || ' days')
+            GROUP BY 1
+            ORDER BY MAX(uf.created_at) DESC
+        ''', (user_id, days))
+
+        skipped = cursor.fetchall()
+
+    return [row['band_name'] for row in skipped]
+
+def get_excluded_bands(user_id=1):
+    """Get all bands to exclude from recommendations (recently skipped)."""
+    return get_recently_skipped_bands(user_id=user_id, days=5)
+
+def get_full_feedback_history(user_id=1):
+    """Get complete feedback history with all details for the history page."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Legacy names (unmatched to a source when requests were migrated) win over the request's
+        cursor.execute('''
+            SELECT
+                ms.id,
+                ms.band_name,
+                ms.genre,
+                ms.description,
+                ms.match_reason,
+                COALESCE(NULLIF(ms.sources_used, ''), rr.source_names, '') AS sources_used,
+                rr.time_of_day,
+                rr.mood,
+                rr.tempo,
+                rr.instruments_yes,
+                rr.instruments_no,
+                uf.feedback_type,
+                uf.created_at
+            FROM user_feedback uf
+            JOIN music_suggestions ms ON uf.suggestion_id = ms.id
+            LEFT JOIN recommendation_requests rr ON ms.request_id = rr.id
+            WHERE uf.user_id = ?
+            ORDER BY uf.created_at DESC
+        ''', (user_id,))
+
+        history = [dict(row) for row in cursor.fetchall()]
+
+    return history
+
+HISTORY_PAGE_SIZE = 30
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+def _encode_history_cursor(created_at, feedback_id):
+    """Encode a (created_at, feedback id) keyset position as an opaque cursor string."""
+    raw = json.dumps([created_at, feedback_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_history_cursor(cursor_str):
+    """Decode a cursor from _encode_history_cursor. Raises ValueError if malformed."""
     try:
+        created_at, feedback_id = json.loads(base64.urlsafe_b64decode(cursor_str.encode()))
+        return str(created_at), int(feedback_id)
+    except Exception:
+        raise ValueError('Invalid history cursor')
+
+
+def _like_pattern(text):
+    """Build a case-insensitive 'contains' LIKE pattern with wildcards escaped."""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def get_feedback_history_page(user_id=1, limit=HISTORY_PAGE_SIZE, cursor=None, feedback_type=None,
+                              genre=None, time_of_day=None, mood=None, tempo=None, search=None):
+    """
+    Get one page of feedback history, newest first, using keyset pagination.
+
+    Args:
+        user_id: ID of the user
+        limit: Page size (capped at HISTORY_MAX_PAGE_SIZE)
+        cursor: Opaque cursor from a previous page's next_cursor, or None for the first page
+        feedback_type: Only include this feedback type (positive, negative, skipped, save_later)
+        genre: Only include suggestions whose genre contains this text
+        time_of_day: Only include suggestions generated for this time of day
+        mood: Only include suggestions whose requested mood contains this text
+        tempo: Only include suggestions generated with this tempo
+        search: Only include bands whose name contains this text
+
+    Returns:
+        Dict with 'history' (list of rows), 'next_cursor' and 'has_more'
+    """
+    limit = max(1, min(int(limit), HISTORY_MAX_PAGE_SIZE))
+
+    conditions = ['uf.user_id = ?']
+    params = [user_id]
+
+    if cursor:
+        created_at, feedback_id = _decode_history_cursor(cursor)
+        conditions.append('(uf.created_at, uf.id) < (?, ?)')
+        params.extend([created_at, feedback_id])
+    if feedback_type:
+        conditions.append('uf.feedback_type = ?')
+        params.append(feedback_type)
+    if time_of_day:
+        conditions.append('rr.time_of_day = ?')
+        params.append(time_of_day)
+    if tempo not in (None, ''):
+        conditions.append('rr.tempo = ?')
+        params.append(int(tempo))
+    if genre:
+        conditions.append("ms.genre LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(genre))
+    if mood:
+        conditions.append("rr.mood LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(mood))
+    if search:
+        conditions.append("ms.band_name LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(search))
+
+    with db_transaction() as conn:
+        db_cursor = conn.cursor()
+
+        # Fetch one extra row to know whether another page exists. Legacy names
+        # (unmatched to a source when requests were migrated) win over the request's
+        db_cursor.execute(f'''
+            SELECT
+                ms.id,
+                ms.band_name,
+                ms.genre,
+                ms.description,
+                ms.match_reason,
+                COALESCE(NULLIF(ms.sources_used, ''), rr.source_names, '') AS sources_used,
+                rr.time_of_day,
+                rr.mood,
+                rr.tempo,
+                rr.instruments_yes,
+                rr.instruments_no,
+                uf.feedback_type,
+                uf.created_at,
+                uf.id AS feedback_id
+            FROM user_feedback uf
+            JOIN music_suggestions ms ON uf.suggestion_id = ms.id
+            LEFT JOIN recommendation_requests rr ON ms.request_id = rr.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY uf.created_at DESC, uf.id DESC
+            LIMIT ?
+        ''', params + [limit + 1])
+
+        rows = [dict(row) for row in db_cursor.fetchall()]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        next_cursor = _encode_history_cursor(rows[-1]['created_at'], rows[-1]['feedback_id'])
+    for row in rows:
+        del row['feedback_id']
+
+    return {'history': rows, 'next_cursor': next_cursor, 'has_more': has_more}
+
+
+def get_feedback_stats(user_id=1):
+    """Get per-feedback-type counts for a user's history."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT feedback_type, COUNT(*) AS count
+            FROM user_feedback
+            WHERE user_id = ?
+            GROUP BY feedback_type
+        ''', (user_id,))
+
+        counts = {row['feedback_type']: row['count'] for row in cursor.fetchall()}
+
+    return {
+        'total': sum(counts.values()),
+        'positive': counts.get('positive', 0),
+        'save_later': counts.get('save_later', 0),
+        'skipped': counts.get('skipped', 0),
+        'negative': counts.get('negative', 0)
+    }
+
+def add_new_source(source_name, source_url, description, is_enabled=1):
+    """Add a new custom music source."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+    
+        try:
+            cursor.execute('''
+                INSERT INTO source_preferences (source_name, source_url, is_enabled, description)
+                VALUES (?, ?, ?, ?)
+            ''', (source_name, source_url, is_enabled, description))
+        
+            source_id = cursor.lastrowid
+            return source_id
+        except sqlite3.IntegrityError:
+            return None  # Source name already exists
+
+def delete_source(source_id):
+    """Delete a custom music source."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+    
+        cursor.execute('''
+            DELETE FROM source_preferences
+            WHERE id = ?
+        ''', (source_id,))
+    
+
+def get_all_rated_bands(user_id=1):
+    """Get all bands that the user has rated (positive, negative, or skipped), most recent first."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT COALESCE(a.name, ms.band_name) AS band_name
+            FROM user_feedback uf
+            JOIN music_suggestions ms ON uf.suggestion_id = ms.id
+            LEFT JOIN artists a ON ms.artist_id = a.id
+            WHERE uf.user_id = ?
+            GROUP BY 1
+            ORDER BY MAX(uf.created_at) DESC
+        ''', (user_id,))
+
+        rated = cursor.fetchall()
+
+    return [row['band_name'] for row in rated]
+
+def get_bands_in_playlists(user_id=1):
+    """Get all bands that have been added to playlists for a user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT DISTINCT ms.id, ms.band_name
+            FROM playlist_suggestions ps
+            JOIN music_suggestions ms ON ps.suggestion_id = ms.id
+            JOIN user_playlists up ON ps.playlist_id = up.id
+            WHERE up.user_id = ?
+        ''', (user_id,))
+
+        results = cursor.fetchall()
+
+    return {row['id']: row['band_name'] for row in results}
+
+def save_playlist(playlist_name, spotify_playlist_id, spotify_url, band_count, track_count, user_id=1):
+    """
+    Save a new playlist to the database.
+
+    Args:
+        playlist_name: Name of the playlist
+        spotify_playlist_id: Spotify's playlist ID
+        spotify_url: URL to the Spotify playlist
+        band_count: Number of artists in the playlist
+        track_count: Total number of tracks
+        user_id: ID of the user who created this playlist
+
+    Returns:
+        The ID of the newly created playlist
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT INTO user_playlists (playlist_name, spotify_playlist_id, spotify_url, band_count, track_count, user_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (playlist_name, spotify_playlist_id, spotify_url, band_count, track_count, user_id))
+
+        playlist_id = cursor.lastrowid
+
+    return playlist_id
+
+def link_playlist_to_suggestions(playlist_id, suggestion_ids_with_counts):
+    """
+    Link a playlist to its music suggestions.
+
+    Args:
+        playlist_id: ID of the playlist
+        suggestion_ids_with_counts: List of tuples (suggestion_id, track_count)
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        for suggestion_id, track_count in suggestion_ids_with_counts:
+            cursor.execute('''
+                INSERT INTO playlist_suggestions (playlist_id, suggestion_id, track_count)
+                VALUES (?, ?, ?)
+            ''', (playlist_id, suggestion_id, track_count))
+
+
+def get_all_playlists(user_id=1):
+    """
+    Get all playlists for a user.
+
+    Returns:
+        List of playlist dictionaries with details
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT
+                id,
+                playlist_name,
+                spotify_playlist_id,
+                spotify_url,
+                band_count,
+                track_count,
+                created_at
+            FROM user_playlists
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+        ''', (user_id,))
+
+        playlists = []
+        for row in cursor.fetchall():
+            playlists.append({
+                'id': row['id'],
+                'playlist_name': row['playlist_name'],
+                'spotify_playlist_id': row['spotify_playlist_id'],
+                'spotify_url': row['spotify_url'],
+                'band_count': row['band_count'],
+                'track_count': row['track_count'],
+                'created_at': row['created_at']
+            })
+
+    return playlists
+
+def get_playlist_with_details(playlist_id):
+    """
+    Get a playlist with all its associated bands.
+
+    Args:
+        playlist_id: ID of the playlist
+
+    Returns:
+        Dictionary with playlist info and list of bands
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # Get playlist info
+        cursor.execute('''
+            SELECT
+                id,
+                playlist_name,
+                spotify_playlist_id,
+                spotify_url,
+                band_count,
+                track_count,
+                created_at
+            FROM user_playlists
+            WHERE id = ?
+        ''', (playlist_id,))
+
+        playlist_row = cursor.fetchone()
+        if not playlist_row:
+            return None
+
+        playlist = {
+            'id': playlist_row['id'],
+            'playlist_name': playlist_row['playlist_name'],
+            'spotify_playlist_id': playlist_row['spotify_playlist_id'],
+            'spotify_url': playlist_row['spotify_url'],
+            'band_count': playlist_row['band_count'],
+            'track_count': playlist_row['track_count'],
+            'created_at': playlist_row['created_at']
+        }
+
+        # Get associated bands
+        cursor.execute('''
+            SELECT
+                ms.id,
+                ms.band_name,
+                ms.genre,
+                ps.track_count
+            FROM playlist_suggestions ps
+            JOIN music_suggestions ms ON ps.suggestion_id = ms.id
+            WHERE ps.playlist_id = ?
+            ORDER BY ps.created_at
+        ''', (playlist_id,))
+
+        bands = []
+        for row in cursor.fetchall():
+            bands.append({
+                'suggestion_id': row['id'],
+                'band_name': row['band_name'],
+                'genre': row['genre'],
+                'track_count': row['track_count']
+            })
+
+        playlist['bands'] = bands
+    return playlist
+
+def update_playlist_track_count(playlist_id, additional_tracks):
+    """
+    Update playlist track count when adding more tracks.
+
+    Args:
+        playlist_id: ID of the playlist
+        additional_tracks: Number of tracks to add to the count
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE user_playlists
+            SET track_count = track_count + ?,
+                band_count = (
+                    SELECT COUNT(DISTINCT suggestion_id)
+                    FROM playlist_suggestions
+                    WHERE playlist_id = ?
+                )
+            WHERE id = ?
+        ''', (additional_tracks, playlist_id, playlist_id))
+
+
+# Spotify Auth CRUD Functions
+
+def save_spotify_auth(user_id, token_info, spotify_user_info):
+    """Save Spotify authentication data for a user."""
+    print(f"[save_spotify_auth] Called with user_id={user_id}, spotify_user={spotify_user_info.get('id')}, display_name={spotify_user_info.get('display_name')}", flush=True)
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE users SET
+                spotify_user_id = ?,
+                spotify_display_name = ?,
+                spotify_access_token = ?,
+                spotify_refresh_token = ?,
+                spotify_token_expires_at = ?,
+                spotify_connected_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (
+            spotify_user_info.get('id'),
+            spotify_user_info.get('display_name'),
+            token_info.get('access_token'),
+            token_info.get('refresh_token'),
+            token_info.get('expires_at'),
+            user_id
+        ))
+
+        rows_affected = cursor.rowcount
+        print(f"[save_spotify_auth] UPDATE affected {rows_affected} rows", flush=True)
+
+
+def get_spotify_auth(user_id):
+    """Get Spotify authentication data for a user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT spotify_user_id, spotify_display_name, spotify_access_token,
+                   spotify_refresh_token, spotify_token_expires_at, spotify_connected_at
+            FROM users WHERE id = ?
+        ''', (user_id,))
+
+        row = cursor.fetchone()
+
+    if row and row['spotify_access_token']:
+        return {
+            'spotify_user_id': row['spotify_user_id'],
+            'spotify_display_name': row['spotify_display_name'],
+            'spotify_access_token': row['spotify_access_token'],
+            'spotify_refresh_token': row['spotify_refresh_token'],
+            'spotify_token_expires_at': row['spotify_token_expires_at'],
+            'spotify_connected_at': row['spotify_connected_at']
+        }
+    return None
+
+def get_spotify_access_token(user_id):
+    """Get the Spotify access token saved for a user (None if not connected), to check cached clients against."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT spotify_access_token FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+    return row['spotify_access_token'] if row else None
+
+
+def get_user_by_spotify_id(spotify_user_id):
+    """Check if a Spotify account is already connected to any user.
+
+    Returns the user dict if found, None otherwise.
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, name, spotify_user_id FROM users
+            WHERE spotify_user_id = ?
+        ''', (spotify_user_id,))
+
+        row = cursor.fetchone()
+
+    if row:
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'spotify_user_id': row['spotify_user_id']
+        }
+    return None
+
+
+def update_spotify_token(user_id, token_info):
+    """Update Spotify tokens after refresh."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE users SET
+                spotify_access_token = ?,
+                spotify_refresh_token = ?,
+                spotify_token_expires_at = ?
+            WHERE id = ?
+        ''', (
+            token_info.get('access_token'),
+            token_info.get('refresh_token'),
+            token_info.get('expires_at'),
+            user_id
+        ))
+
+
+def claim_token_refresh(user_id, owner, stale_seconds):
+    """
+    Try to become the worker that refreshes a user's Spotify token.
+
+    A claim older than stale_seconds (its owner presumably died) no longer
+    blocks a new one.
+
+    Returns:
+        True if this owner now holds the refresh, False if another is in progress
+    """
+    now = time.time()
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('DELETE FROM token_refresh_locks WHERE user_id = ? AND started_at < ?',
+                       (user_id, now - stale_seconds))
+        cursor.execute('''
+            INSERT OR IGNORE INTO token_refresh_locks (user_id, owner, started_at)
+            VALUES (?, ?, ?)
+        ''', (user_id, owner, now))
+
+        return cursor.rowcount == 1
+
+
+def release_token_refresh(user_id, owner):
+    """Release a token refresh claim held by owner."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM token_refresh_locks WHERE user_id = ? AND owner = ?', (user_id, owner))
+
+
+def clear_spotify_auth(user_id):
+    """Clear Spotify authentication data for a user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE users SET
+                spotify_user_id = NULL,
+                spotify_display_name = NULL,
+                spotify_access_token = NULL,
+                spotify_refresh_token = NULL,
+                spotify_token_expires_at = NULL,
+                spotify_connected_at = NULL
+            WHERE id = ?
+        ''', (user_id,))
+
+        # Also clear their taste data
+        for table in ('taste_sources', 'taste_artists', 'taste_genres'):
+            cursor.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM taste_contexts WHERE user_id = ?', (user_id,))
+
+
+# Spotify Taste Data CRUD Functions
+
+def _replace_taste_artists(cursor, user_id, source, time_range, artists, synced_at=None, sync_cursor=None):
+    """
+    Replace one taste list (source + time range) of a user with the given artists.
+
+    Artists are stored one row each, in list order, skipping repeats.
+    synced_at defaults to now (millisecond precision, so back-to-back syncs differ).
+    sync_cursor records where the next incremental sync of the list can stop.
+    """
+    time_range = time_range or ''
+    cursor.execute('''
+        DELETE FROM taste_artists WHERE user_id = ? AND source = ? AND time_range = ?
+    ''', (user_id, source, time_range))
+
+    rows = []
+    seen = set()
+    for artist in artists or []:
+        name = artist.get('name')
+        identity = artist.get('id') or normalize_artist_name(name)
+        if not name or identity in seen:
+            continue
+        seen.add(identity)
+        rows.append((user_id, source, time_range, len(rows), artist.get('id'), name,
+                     json.dumps(artist.get('genres') or [])))
+    cursor.executemany('''
+        INSERT INTO taste_artists (user_id, source, time_range, position, spotify_id, name, genres)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+    cursor.execute('''
+        INSERT OR REPLACE INTO taste_sources (user_id, source, time_range, artist_count, synced_at, sync_cursor)
+        VALUES (?, ?, ?, ?, COALESCE(?, strftime('%Y-%m-%d %H:%M:%f', 'now')), ?)
+    ''', (user_id, source, time_range, len(rows), synced_at, sync_cursor))
+
+
+def _refresh_taste_genres(cursor, user_id):
+    """Recount a user's genres: how many of their taste artist rows carry each genre."""
+    cursor.execute('DELETE FROM taste_genres WHERE user_id = ?', (user_id,))
+    cursor.execute('''
+        INSERT INTO taste_genres (user_id, genre, artist_count)
+        SELECT ta.user_id, g.value, COUNT(*)
+        FROM taste_artists ta, json_each(ta.genres) g
+        WHERE ta.user_id = ?
+        GROUP BY g.value
+    ''', (user_id,))
+
+
+def save_taste_data(user_id, data_type, time_range, data, sync_cursor=None):
+    """
+    Save or update one list of Spotify taste data for a user.
+
+    Args:
+        user_id: User ID
+        data_type: 'top_artists', 'followed_artists' or 'saved_tracks'
+        time_range: Spotify time range for top_artists, otherwise None
+        data: List of artist dicts with name, id and genres
+        sync_cursor: Position to resume an incremental sync from (e.g. newest added_at)
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+        _replace_taste_artists(cursor, user_id, data_type, time_range, data, sync_cursor=sync_cursor)
+        _refresh_taste_genres(cursor, user_id)
+
+
+def get_taste_data(user_id):
+    """Get all Spotify taste data for a user."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT source, time_range, synced_at FROM taste_sources
+            WHERE user_id = ?
+            ORDER BY source, time_range DESC
+        ''', (user_id,))
+        sources = cursor.fetchall()
+
+        cursor.execute('''
+            SELECT source, time_range, spotify_id, name, genres
+            FROM taste_artists
+            WHERE user_id = ?
+            ORDER BY source, time_range, position
+        ''', (user_id,))
+        rows = cursor.fetchall()
+
+    if not sources:
+        return None
+
+    result = {
+        'synced_at': max(row['synced_at'] for row in sources),
+        'top_artists': {},
+        'followed_artists': [],
+        'saved_tracks': []
+    }
+    for row in sources:
+        if row['source'] == 'top_artists':
+            result['top_artists'][row['time_range']] = []  # short_term first
+
+    # Decode all genre lists in one call (much cheaper than one json.loads per row)
+    genres = json.loads('[' + ','.join(row['genres'] for row in rows) + ']')
+    for row, artist_genres in zip(rows, genres):
+        artist = {'name': row['name'], 'genres': artist_genres, 'id': row['spotify_id']}
+        if row['source'] == 'top_artists':
+            result['top_artists'].setdefault(row['time_range'], []).append(artist)
+        elif row['source'] in ('followed_artists', 'saved_tracks'):
+            result[row['source']].append(artist)
+
+    return result
+
+def get_taste_sync_cursor(user_id, data_type, time_range=None):
+    """Get where the last sync of one taste list stopped (None if never synced incrementally)."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT sync_cursor FROM taste_sources
+            WHERE user_id = ? AND source = ? AND time_range = ?
+        ''', (user_id, data_type, time_range or ''))
+
+        row = cursor.fetchone()
+
+    return row['sync_cursor'] if row else None
+
+def get_taste_genres(user_id, limit=None):
+    """
+    Get a user's genre counts from their synced taste data, most common first.
+
+    Returns:
+        List of (genre, artist_count) tuples
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
         cursor.execute('''
-            INSERT INTO source_preferences (source_name, source_url, is_enabled, description)
-            VALUES (?, ?, ?, ?)
-        ''', (source_name, source_url, is_enabled, description))
-        
-        source_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return source_id
-    except sqlite3.IntegrityError:
-        conn.close()
-        return None  # Source name already exists
+            SELECT genre, artist_count FROM taste_genres
+            WHERE user_id = ?
+            ORDER BY artist_count DESC, genre
+            LIMIT ?
+        ''', (user_id, -1 if limit is None else limit))
 
-def delete_source(source_id):
-    """Delete a custom music source."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        DELETE FROM source_preferences
-        WHERE id = ?
-    ''', (source_id,))
-    
-    conn.commit()
-    conn.close()
+        return [(row['genre'], row['artist_count']) for row in cursor.fetchall()]
 
-def get_all_rated_bands(user_id=1):
-    """Get all bands that the user has rated (positive, negative, or skipped)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def get_taste_sync_status(user_id):
+    """Get sync status for a user's taste data."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT DISTINCT ms.band_name
-        FROM user_feedback uf
-        JOIN music_suggestions ms ON uf.suggestion_id = ms.id
-        WHERE uf.user_id = ?
-    ''', (user_id,))
+        cursor.execute('''
+            SELECT MAX(synced_at) as last_synced,
+                   COUNT(*) as data_count
+            FROM taste_sources
+            WHERE user_id = ?
+        ''', (user_id,))
 
-    rated = cursor.fetchall()
-    conn.close()
+        row = cursor.fetchone()
 
-    return [row['band_name'] for row in rated]
+    return {
+        'last_synced': row['last_synced'] if row else None,
+        'has_data': row['data_count'] > 0 if row else False
+    }
 
-def get_bands_in_playlists(user_id=1):
-    """Get all bands that have been added to playlists for a user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def save_taste_context(user_id, synced_at, context):
+    """Save the taste context derived from the taste data synced at synced_at."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT DISTINCT ms.id, ms.band_name
-        FROM playlist_suggestions ps
-        JOIN music_suggestions ms ON ps.suggestion_id = ms.id
-        JOIN user_playlists up ON ps.playlist_id = up.id
-        WHERE up.user_id = ?
-    ''', (user_id,))
+        cursor.execute('''
+            INSERT OR REPLACE INTO taste_contexts (user_id, synced_at, context)
+            VALUES (?, ?, ?)
+        ''', (user_id, synced_at, json.dumps(context)))
 
-    results = cursor.fetchall()
-    conn.close()
+def get_taste_context(user_id):
+    """
+    Get a user's saved taste context.
 
-    return {row['id']: row['band_name'] for row in results}
+    Returns:
+        Tuple of (synced_at of the taste data it was derived from, context dict), or None
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-def save_playlist(playlist_name, spotify_playlist_id, spotify_url, band_count, track_count, user_id=1):
+        cursor.execute('''
+            SELECT synced_at, context FROM taste_contexts WHERE user_id = ?
+        ''', (user_id,))
+
+        row = cursor.fetchone()
+
+    if not row:
+        return None
+    return row['synced_at'], json.loads(row['context'])
+
+# Recommendation Cache Functions
+
+def get_cached_recommendations(cache_key, ttl_seconds):
     """
-    Save a new playlist to the database.
+    Get a cached recommendation result and mark it as recently used.
 
     Args:
-        playlist_name: Name of the playlist
-        spotify_playlist_id: Spotify's playlist ID
-        spotify_url: URL to the Spotify playlist
-        band_count: Number of artists in the playlist
-        track_count: Total number of tracks
-        user_id: ID of the user who created this playlist
+        cache_key: Key from api_handler.recommendation_cache_key
+        ttl_seconds: Maximum age of an entry
 
     Returns:
-        The ID of the newly created playlist
+        Tuple of (recommendations list, age in seconds), or None on a miss
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    now = time.time()
 
-    cursor.execute('''
-        INSERT INTO user_playlists (playlist_name, spotify_playlist_id, spotify_url, band_count, track_count, user_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (playlist_name, spotify_playlist_id, spotify_url, band_count, track_count, user_id))
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT recommendations, created_at FROM recommendation_cache
+            WHERE cache_key = ? AND created_at >= ?
+        ''', (cache_key, now - ttl_seconds))
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        cursor.execute(
+            'UPDATE recommendation_cache SET last_used_at = ? WHERE cache_key = ?',
+            (now, cache_key)
+        )
 
-    playlist_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    return json.loads(row['recommendations']), now - row['created_at']
 
-    return playlist_id
 
-def link_playlist_to_suggestions(playlist_id, suggestion_ids_with_counts):
+def save_cached_recommendations(cache_key, recommendations, ttl_seconds, max_entries):
     """
-    Link a playlist to its music suggestions.
+    Cache a recommendation result, evicting expired and least recently used entries.
 
     Args:
-        playlist_id: ID of the playlist
-        suggestion_ids_with_counts: List of tuples (suggestion_id, track_count)
+        cache_key: Key from api_handler.recommendation_cache_key
+        recommendations: List of recommendation dicts
+        ttl_seconds: Entries older than this are removed
+        max_entries: Number of entries to keep
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    now = time.time()
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    for suggestion_id, track_count in suggestion_ids_with_counts:
         cursor.execute('''
-            INSERT INTO playlist_suggestions (playlist_id, suggestion_id, track_count)
-            VALUES (?, ?, ?)
-        ''', (playlist_id, suggestion_id, track_count))
+            INSERT OR REPLACE INTO recommendation_cache (cache_key, recommendations, created_at, last_used_at)
+            VALUES (?, ?, ?, ?)
+        ''', (cache_key, json.dumps(recommendations), now, now))
+
+        cursor.execute('DELETE FROM recommendation_cache WHERE created_at < ?', (now - ttl_seconds,))
+        cursor.execute('''
+            DELETE FROM recommendation_cache
+            WHERE cache_key IN (
+                SELECT cache_key FROM recommendation_cache
+                ORDER BY last_used_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
 
-    conn.commit()
-    conn.close()
 
-def get_all_playlists(user_id=1):
+# LLM Single-Flight Functions
+
+def claim_llm_call(call_key, owner, stale_seconds, result_seconds):
     """
-    Get all playlists for a user.
+    Try to become the worker that makes the LLM call for call_key.
+
+    Rows only expire by age: calls started more than stale_seconds ago and
+    still unfinished (their owner presumably died), and results finished
+    more than result_seconds ago. A newer finished result keeps blocking
+    the claim, so waiters read it rather than call again.
 
     Returns:
-        List of playlist dictionaries with details
+        True if this owner now holds the call, False if another is in flight or finished
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    now = time.time()
 
-    cursor.execute('''
-        SELECT
-            id,
-            playlist_name,
-            spotify_playlist_id,
-            spotify_url,
-            band_count,
-            track_count,
-            created_at
-        FROM user_playlists
-        WHERE user_id = ?
-        ORDER BY created_at DESC
-    ''', (user_id,))
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    playlists = []
-    for row in cursor.fetchall():
-        playlists.append({
-            'id': row['id'],
-            'playlist_name': row['playlist_name'],
-            'spotify_playlist_id': row['spotify_playlist_id'],
-            'spotify_url': row['spotify_url'],
-            'band_count': row['band_count'],
-            'track_count': row['track_count'],
-            'created_at': row['created_at']
-        })
-
-    conn.close()
-    return playlists
+        cursor.execute('''
+            DELETE FROM llm_calls
+            WHERE (finished_at IS NULL AND started_at < ?)
+            OR finished_at < ?
+        ''', (now - stale_seconds, now - result_seconds))
+        cursor.execute('''
+            INSERT OR IGNORE INTO llm_calls (call_key, owner, started_at)
+            VALUES (?, ?, ?)
+        ''', (call_key, owner, now))
 
-def get_playlist_with_details(playlist_id):
+        return cursor.rowcount == 1
+
+
+def get_llm_call_result(call_key):
+    """Get the response text of a finished LLM call, or None if it's not finished."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT response_text FROM llm_calls
+            WHERE call_key = ? AND finished_at IS NOT NULL
+        ''', (call_key,))
+        row = cursor.fetchone()
+
+    return row['response_text'] if row else None
+
+
+def finish_llm_call(call_key, owner, response_text):
+    """Publish the response of a claimed LLM call to waiting workers."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE llm_calls SET response_text = ?, finished_at = ?
+            WHERE call_key = ? AND owner = ?
+        ''', (response_text, time.time(), call_key, owner))
+
+
+def release_llm_call(call_key, owner):
+    """Give up a claimed LLM call without a result (e.g. the call failed)."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('DELETE FROM llm_calls WHERE call_key = ? AND owner = ?', (call_key, owner))
+
+
+# Rate Limit Functions
+
+def take_rate_limit_tokens(name, rate, capacity, reserve=0, count=1):
     """
-    Get a playlist with all its associated bands.
+    Try to take up to `count` tokens from a shared token bucket.
+
+    The bucket refills at `rate` tokens per second up to `capacity`. A take
+    only succeeds if it leaves at least `reserve` tokens, so low-priority
+    callers can keep headroom for others. While the bucket is blocked (the
+    API returned Retry-After) no tokens are handed out.
 
     Args:
-        playlist_id: ID of the playlist
+        name: Bucket name (e.g. 'spotify')
+        rate: Refill rate in tokens per second
+        capacity: Maximum tokens (burst size)
+        reserve: Tokens that must remain after this take
+        count: Most tokens to take (fewer if fewer are available)
 
     Returns:
-        Dictionary with playlist info and list of bands
+        Tuple of (tokens taken, seconds to wait before trying again if none were)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    now = time.time()
 
-    # Get playlist info
-    cursor.execute('''
-        SELECT
-            id,
-            playlist_name,
-            spotify_playlist_id,
-            spotify_url,
-            band_count,
-            track_count,
-            created_at
-        FROM user_playlists
-        WHERE id = ?
-    ''', (playlist_id,))
-
-    playlist_row = cursor.fetchone()
-    if not playlist_row:
-        conn.close()
-        return None
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    playlist = {
-        'id': playlist_row['id'],
-        'playlist_name': playlist_row['playlist_name'],
-        'spotify_playlist_id': playlist_row['spotify_playlist_id'],
-        'spotify_url': playlist_row['spotify_url'],
-        'band_count': playlist_row['band_count'],
-        'track_count': playlist_row['track_count'],
-        'created_at': playlist_row['created_at']
-    }
+        # Writing first takes the database write lock, so concurrent takes can't double-spend
+        cursor.execute('''
+            INSERT OR IGNORE INTO rate_limit_buckets (name, tokens, updated_at)
+            VALUES (?, ?, ?)
+        ''', (name, capacity, now))
+        cursor.execute('''
+            UPDATE rate_limit_buckets
+            SET tokens = MIN(?, tokens + MAX(? - updated_at, 0) * ?), updated_at = ?
+            WHERE name = ?
+        ''', (capacity, now, rate, now, name))
+        cursor.execute('SELECT tokens, blocked_until FROM rate_limit_buckets WHERE name = ?', (name,))
+        row = cursor.fetchone()
 
-    # Get associated bands
-    cursor.execute('''
-        SELECT
-            ms.id,
-            ms.band_name,
-            ms.genre,
-            ps.track_count
-        FROM playlist_suggestions ps
-        JOIN music_suggestions ms ON ps.suggestion_id = ms.id
-        WHERE ps.playlist_id = ?
-        ORDER BY ps.created_at
-    ''', (playlist_id,))
-
-    bands = []
-    for row in cursor.fetchall():
-        bands.append({
-            'suggestion_id': row['id'],
-            'band_name': row['band_name'],
-            'genre': row['genre'],
-            'track_count': row['track_count']
-        })
-
-    playlist['bands'] = bands
-    conn.close()
-    return playlist
+        if row['blocked_until'] > now:
+            return 0, row['blocked_until'] - now
+        taken = min(count, math.floor(row['tokens'] - reserve))
+        if taken < 1:
+            return 0, (reserve + 1 - row['tokens']) / rate
 
-def update_playlist_track_count(playlist_id, additional_tracks):
+        cursor.execute('UPDATE rate_limit_buckets SET tokens = tokens - ? WHERE name = ?', (taken, name))
+        return taken, 0
+
+
+def block_rate_limit(name, seconds):
+    """Stop handing out tokens from a bucket for `seconds` (e.g. from a Retry-After header)."""
+    now = time.time()
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE rate_limit_buckets
+            SET tokens = 0, updated_at = MAX(updated_at, ?), blocked_until = MAX(blocked_until, ?)
+            WHERE name = ?
+        ''', (now + seconds, now + seconds, name))
+
+
+# Candidate Pool Functions
+
+def take_pool_candidates(user_id, context_key, is_excluded, count, ttl_seconds):
     """
-    Update playlist track count when adding more tracks.
+    Take a batch of candidates from a user's pool, skipping excluded bands.
+
+    Excluded candidates are dropped from the pool. Nothing is taken unless a
+    full batch is available.
 
     Args:
-        playlist_id: ID of the playlist
-        additional_tracks: Number of tracks to add to the count
+        user_id: ID of the user
+        context_key: Request context the pool was generated for
+        is_excluded: Function taking a band name, True if the user now excludes it
+            (see api_handler.exclusion_filter)
+        count: Batch size
+        ttl_seconds: Pools not refilled for this long are discarded
+
+    Returns:
+        Tuple of (list of recommendation dicts, number of candidates left)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        UPDATE user_playlists
-        SET track_count = track_count + ?,
-            band_count = (
-                SELECT COUNT(DISTINCT suggestion_id)
-                FROM playlist_suggestions
-                WHERE playlist_id = ?
-            )
-        WHERE id = ?
-    ''', (additional_tracks, playlist_id, playlist_id))
+        cursor.execute('''
+            SELECT candidates FROM candidate_pools
+            WHERE user_id = ? AND context_key = ? AND updated_at >= ?
+        ''', (user_id, context_key, time.time() - ttl_seconds))
+        row = cursor.fetchone()
+        if not row:
+            return [], 0
 
-    conn.commit()
-    conn.close()
+        candidates = [c for c in json.loads(row['candidates']) if not is_excluded(c.get('band_name'))]
+        batch = candidates[:count] if len(candidates) >= count else []
+        remaining = candidates[len(batch):]
 
-# Spotify Auth CRUD Functions
+        cursor.execute('''
+            UPDATE candidate_pools SET candidates = ?
+            WHERE user_id = ? AND context_key = ?
+        ''', (json.dumps(remaining), user_id, context_key))
 
-def save_spotify_auth(user_id, token_info, spotify_user_info):
-    """Save Spotify authentication data for a user."""
-    print(f"[save_spotify_auth] Called with user_id={user_id}, spotify_user={spotify_user_info.get('id')}, display_name={spotify_user_info.get('display_name')}", flush=True)
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return batch, len(remaining)
 
-    cursor.execute('''
-        UPDATE users SET
-            spotify_user_id = ?,
-            spotify_display_name = ?,
-            spotify_access_token = ?,
-            spotify_refresh_token = ?,
-            spotify_token_expires_at = ?,
-            spotify_connected_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    ''', (
-        spotify_user_info.get('id'),
-        spotify_user_info.get('display_name'),
-        token_info.get('access_token'),
-        token_info.get('refresh_token'),
-        token_info.get('expires_at'),
-        user_id
-    ))
-
-    rows_affected = cursor.rowcount
-    print(f"[save_spotify_auth] UPDATE affected {rows_affected} rows", flush=True)
-
-    conn.commit()
-    conn.close()
 
-def get_spotify_auth(user_id):
-    """Get Spotify authentication data for a user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def count_pool_candidates(user_id, context_key, ttl_seconds):
+    """Get the number of candidates in a user's pool (0 if it has none or it expired)."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT spotify_user_id, spotify_display_name, spotify_access_token,
-               spotify_refresh_token, spotify_token_expires_at, spotify_connected_at
-        FROM users WHERE id = ?
-    ''', (user_id,))
+        cursor.execute('''
+            SELECT json_array_length(candidates) AS size FROM candidate_pools
+            WHERE user_id = ? AND context_key = ? AND updated_at >= ?
+        ''', (user_id, context_key, time.time() - ttl_seconds))
+        row = cursor.fetchone()
 
-    row = cursor.fetchone()
-    conn.close()
+    return row['size'] if row else 0
 
-    if row and row['spotify_access_token']:
-        return {
-            'spotify_user_id': row['spotify_user_id'],
-            'spotify_display_name': row['spotify_display_name'],
-            'spotify_access_token': row['spotify_access_token'],
-            'spotify_refresh_token': row['spotify_refresh_token'],
-            'spotify_token_expires_at': row['spotify_token_expires_at'],
-            'spotify_connected_at': row['spotify_connected_at']
-        }
-    return None
 
-def get_user_by_spotify_id(spotify_user_id):
-    """Check if a Spotify account is already connected to any user.
+def add_pool_candidates(user_id, context_key, candidates, ttl_seconds):
+    """
+    Append candidates to a user's pool (skipping names already in it).
 
-    Returns the user dict if found, None otherwise.
+    Args:
+        user_id: ID of the user
+        context_key: Request context the candidates were generated for
+        candidates: List of recommendation dicts
+        ttl_seconds: Expired pools of this user are removed
+
+    Returns:
+        Number of candidates in the pool afterwards
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    now = time.time()
 
-    cursor.execute('''
-        SELECT id, name, spotify_user_id FROM users
-        WHERE spotify_user_id = ?
-    ''', (spotify_user_id,))
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            DELETE FROM candidate_pools WHERE user_id = ? AND updated_at < ?
+        ''', (user_id, now - ttl_seconds))
+        cursor.execute('''
+            SELECT candidates FROM candidate_pools WHERE user_id = ? AND context_key = ?
+        ''', (user_id, context_key))
+        row = cursor.fetchone()
+        pool = json.loads(row['candidates']) if row else []
+
+        seen = {normalize_artist_name(c.get('band_name')) for c in pool}
+        for candidate in candidates:
+            key = normalize_artist_name(candidate.get('band_name'))
+            if key and key not in seen:
+                seen.add(key)
+                pool.append(candidate)
 
-    row = cursor.fetchone()
-    conn.close()
+        cursor.execute('''
+            INSERT OR REPLACE INTO candidate_pools (user_id, context_key, candidates, updated_at)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, context_key, json.dumps(pool), now))
 
-    if row:
-        return {
-            'id': row['id'],
-            'name': row['name'],
-            'spotify_user_id': row['spotify_user_id']
-        }
-    return None
+    return len(pool)
 
 
-def update_spotify_token(user_id, token_info):
-    """Update Spotify tokens after refresh."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Prefetched Batch Functions
 
-    cursor.execute('''
-        UPDATE users SET
-            spotify_access_token = ?,
-            spotify_refresh_token = ?,
-            spotify_token_expires_at = ?
-        WHERE id = ?
-    ''', (
-        token_info.get('access_token'),
-        token_info.get('refresh_token'),
-        token_info.get('expires_at'),
-        user_id
-    ))
-
-    conn.commit()
-    conn.close()
+def start_prefetched_batch(session_key, context_key, ttl_seconds):
+    """
+    Mark a session's prefetch slot as pending, replacing whatever it held.
 
-def clear_spotify_auth(user_id):
-    """Clear Spotify authentication data for a user."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    Args:
+        session_key: Key identifying the browser session
+        context_key: Request context the batch is generated for
+        ttl_seconds: Slots older than this (any session) are removed
+    """
+    now = time.time()
 
-    cursor.execute('''
-        UPDATE users SET
-            spotify_user_id = NULL,
-            spotify_display_name = NULL,
-            spotify_access_token = NULL,
-            spotify_refresh_token = NULL,
-            spotify_token_expires_at = NULL,
-            spotify_connected_at = NULL
-        WHERE id = ?
-    ''', (user_id,))
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    # Also clear their taste data
-    cursor.execute('DELETE FROM spotify_taste_data WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM prefetched_batches WHERE created_at < ?', (now - ttl_seconds,))
+        cursor.execute('''
+            INSERT OR REPLACE INTO prefetched_batches (session_key, context_key, recommendations, created_at)
+            VALUES (?, ?, NULL, ?)
+        ''', (session_key, context_key, now))
 
-    conn.commit()
-    conn.close()
 
-# Spotify Taste Data CRUD Functions
+def save_prefetched_batch(session_key, context_key, recommendations):
+    """Fill a pending prefetch slot (ignored if the slot was replaced meanwhile). Pass None to clear it."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-def save_taste_data(user_id, data_type, time_range, data):
-    """Save or update Spotify taste data for a user."""
-    import json
+        if recommendations is None:
+            cursor.execute('''
+                DELETE FROM prefetched_batches WHERE session_key = ? AND context_key = ?
+            ''', (session_key, context_key))
+        else:
+            cursor.execute('''
+                UPDATE prefetched_batches SET recommendations = ?
+                WHERE session_key = ? AND context_key = ?
+            ''', (json.dumps(recommendations), session_key, context_key))
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    # Delete existing data of this type for this user
-    if time_range:
+def take_prefetched_batch(session_key, context_key, ttl_seconds):
+    """
+    Take the prefetched batch from a session's slot.
+
+    Returns:
+        Tuple of (status, recommendations): ('ready', list) once taken,
+        ('pending', None) while it is still being generated, or (None, None)
+        if there is no usable slot for this context
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
         cursor.execute('''
-            DELETE FROM spotify_taste_data
-            WHERE user_id = ? AND data_type = ? AND time_range = ?
-        ''', (user_id, data_type, time_range))
-    else:
+            SELECT recommendations FROM prefetched_batches
+            WHERE session_key = ? AND context_key = ? AND created_at >= ?
+        ''', (session_key, context_key, time.time() - ttl_seconds))
+        row = cursor.fetchone()
+        if not row:
+            return None, None
+        if row['recommendations'] is None:
+            return 'pending', None
+
+        cursor.execute('DELETE FROM prefetched_batches WHERE session_key = ?', (session_key,))
+
+    return 'ready', json.loads(row['recommendations'])
+
+
+# Taste Sync Job Functions
+
+def start_taste_sync_job(job_id, user_id, full_sync, stale_seconds):
+    """
+    Queue a taste sync job for a user, unless one is already queued or running.
+
+    Active jobs not updated for stale_seconds (their worker presumably died)
+    are marked failed and no longer block a new one. Finished jobs older
+    than a day are removed.
+
+    Returns:
+        Tuple of (id of the user's active job, True if it is the new job_id)
+    """
+    now = time.time()
+
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
         cursor.execute('''
-            DELETE FROM spotify_taste_data
-            WHERE user_id = ? AND data_type = ? AND time_range IS NULL
-        ''', (user_id, data_type))
+            UPDATE taste_sync_jobs SET status = 'failed', error = 'Sync stopped responding', updated_at = ?
+            WHERE status IN ('queued', 'running') AND updated_at < ?
+        ''', (now, now - stale_seconds))
+        cursor.execute('''
+            DELETE FROM taste_sync_jobs
+            WHERE user_id = ? AND status IN ('done', 'failed') AND updated_at < ?
+        ''', (user_id, now - 86400))
 
-    # Insert new data
-    cursor.execute('''
-        INSERT INTO spotify_taste_data (user_id, data_type, time_range, data)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, data_type, time_range, json.dumps(data)))
+        cursor.execute('''
+            INSERT OR IGNORE INTO taste_sync_jobs (id, user_id, status, full_sync, created_at, updated_at)
+            VALUES (?, ?, 'queued', ?, ?, ?)
+        ''', (job_id, user_id, bool(full_sync), now, now))
+        if cursor.rowcount == 1:
+            return job_id, True
 
-    conn.commit()
-    conn.close()
+        cursor.execute('''
+            SELECT id FROM taste_sync_jobs
+            WHERE user_id = ? AND status IN ('queued', 'running')
+        ''', (user_id,))
+        return cursor.fetchone()['id'], False
 
-def get_taste_data(user_id):
-    """Get all Spotify taste data for a user."""
-    import json
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def update_taste_sync_job(job_id, status=None, phases=None, result=None, error=None):
+    """Update a taste sync job's status, per-phase progress, result or error (None leaves a field as is)."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT data_type, time_range, data, synced_at
-        FROM spotify_taste_data
-        WHERE user_id = ?
-    ''', (user_id,))
+        cursor.execute('''
+            UPDATE taste_sync_jobs SET
+                status = COALESCE(?, status),
+                phases = COALESCE(?, phases),
+                result = COALESCE(?, result),
+                error = COALESCE(?, error),
+                updated_at = ?
+            WHERE id = ?
+        ''', (status, None if phases is None else json.dumps(phases),
+              None if result is None else json.dumps(result), error, time.time(), job_id))
+
+
+def get_taste_sync_job(job_id, user_id):
+    """Get one of a user's taste sync jobs as a dict, or None."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    rows = cursor.fetchall()
-    conn.close()
+        cursor.execute('''
+            SELECT id, status, full_sync, phases, result, error, created_at, updated_at
+            FROM taste_sync_jobs
+            WHERE id = ? AND user_id = ?
+        ''', (job_id, user_id))
+        row = cursor.fetchone()
 
-    if not rows:
+    if not row:
         return None
+    job = dict(row)
+    job['full_sync'] = bool(job['full_sync'])
+    job['phases'] = json.loads(job['phases'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
 
-    result = {
-        'synced_at': None,
-        'top_artists': {},
-        'followed_artists': [],
-        'saved_tracks': []
-    }
 
-    for row in rows:
-        data_type = row['data_type']
-        time_range = row['time_range']
-        data = json.loads(row['data'])
+# Playlist Write Functions
 
-        if data_type == 'top_artists':
-            result['top_artists'][time_range] = data
-        elif data_type == 'followed_artists':
-            result['followed_artists'] = data
-        elif data_type == 'saved_tracks':
-            result['saved_tracks'] = data
+def start_playlist_write(write_id, user_id, spotify_playlist_id, track_uris, base_total,
+                         db_playlist_id=None, suggestion_tracks=None):
+    """
+    Record a chunked write of tracks to a Spotify playlist.
 
-        # Track most recent sync time
-        if result['synced_at'] is None or row['synced_at'] > result['synced_at']:
-            result['synced_at'] = row['synced_at']
+    Finished writes older than a day are removed.
 
-    return result
+    Args:
+        write_id: New write ID
+        user_id: DailyJams user ID
+        spotify_playlist_id: Playlist the tracks are added to
+        track_uris: All track URIs of the write, in order
+        base_total: Number of tracks the playlist had before the write
+        db_playlist_id: DailyJams playlist to keep in step (see record_playlist_write_tracks)
+        suggestion_tracks: List of (suggestion_id, track_count) to link once the write is done
+    """
+    now = time.time()
 
-def get_taste_sync_status(user_id):
-    """Get sync status for a user's taste data."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_transaction() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT MAX(synced_at) as last_synced,
-               COUNT(*) as data_count
-        FROM spotify_taste_data
-        WHERE user_id = ?
-    ''', (user_id,))
+        cursor.execute('''
+            DELETE FROM playlist_writes
+            WHERE user_id = ? AND status = 'done' AND updated_at < ?
+        ''', (user_id, now - 86400))
+        cursor.execute('''
+            INSERT INTO playlist_writes
+                (id, user_id, spotify_playlist_id, track_uris, base_total, db_playlist_id, suggestion_tracks,
+                 created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (write_id, user_id, spotify_playlist_id, json.dumps(track_uris), base_total, db_playlist_id,
+              json.dumps(suggestion_tracks or []), now, now))
 
-    row = cursor.fetchone()
-    conn.close()
 
-    return {
-        'last_synced': row['last_synced'] if row else None,
-        'has_data': row['data_count'] > 0 if row else False
-    }
+def update_playlist_write(write_id, chunks_done=None, snapshot_id=None, status=None, error=None):
+    """Record a playlist write's progress, snapshot_id, status or error (None leaves a field as is)."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE playlist_writes SET
+                chunks_done = COALESCE(?, chunks_done),
+                snapshot_id = COALESCE(?, snapshot_id),
+                status = COALESCE(?, status),
+                error = ?,
+                updated_at = ?
+            WHERE id = ?
+        ''', (chunks_done, snapshot_id, status, error, time.time(), write_id))
+
+
+def get_playlist_write(write_id, user_id):
+    """Get one of a user's playlist writes as a dict (track_uris decoded), or None."""
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, spotify_playlist_id, track_uris, base_total, chunks_done, snapshot_id,
+                   status, error, created_at, updated_at
+            FROM playlist_writes
+            WHERE id = ? AND user_id = ?
+        ''', (write_id, user_id))
+        row = cursor.fetchone()
+
+    if not row:
+        return None
+    write = dict(row)
+    write['track_uris'] = json.loads(write['track_uris'])
+    return write
+
+
+def record_playlist_write_tracks(write_id, tracks_added):
+    """
+    Bring a write's DailyJams playlist in line with the tracks that have landed on Spotify.
+
+    Adds the tracks not yet counted to user_playlists.track_count, and links
+    the write's suggestions once all its tracks are in. Safe to call after
+    every attempt (first try or resume, success or failure): each track is
+    counted once and the links are made once.
+
+    Args:
+        write_id: ID of the playlist write
+        tracks_added: Tracks of the write that are now in the playlist
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT db_playlist_id, suggestion_tracks, track_uris, tracks_recorded
+            FROM playlist_writes WHERE id = ?
+        ''', (write_id,))
+        row = cursor.fetchone()
+        if not row or row['db_playlist_id'] is None or tracks_added <= row['tracks_recorded']:
+            return
+
+        if tracks_added >= len(json.loads(row['track_uris'])):
+            link_playlist_to_suggestions(row['db_playlist_id'], json.loads(row['suggestion_tracks'] or '[]'))
+        update_playlist_track_count(row['db_playlist_id'], tracks_added - row['tracks_recorded'])
+        cursor.execute('UPDATE playlist_writes SET tracks_recorded = ? WHERE id = ?', (tracks_added, write_id))
+
 
 # Test function
 if __name__ == '__main__':
+    import sys
+
     print("Initializing database...")
-    initialize_database()
-    insert_default_sources()
-    print("\n✅ Database setup complete!")
+    run_migrations()
+    print(f"\n✅ Database setup complete! (schema version {get_schema_version()})")
     print(f"Database location: {DB_PATH}")
+
+    # python database.py --check-plans : fail if any hot query falls back to a full table scan
+    if '--check-plans' in sys.argv:
+        full_scans = find_full_table_scans(explain_hot_queries())
+        for name, detail in full_scans:
+            print(f"❌ {name}: {detail}")
+        if full_scans:
+            sys.exit(1)
+        print("✅ All hot queries use indexes")
@@ -0,0 +1,334 @@
+import os
+import threading
+import time
+import requests
+from contextlib import contextmanager
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# One keep-alive session per worker process for all outbound HTTP (Spotify, Reddit)
+HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 10))                 # hosts with a kept connection pool
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))                   # idle connections kept per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))   # seconds to open a connection
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))           # seconds to wait for a response
+
+# Retries on the Spotify Web API, as spotipy applies to the sessions it builds itself, except
+# 429s (handled by the rate limiter below) and POSTs (see spotify_handler._add_playlist_chunk)
+SPOTIFY_API_URL = os.getenv('SPOTIFY_API_URL', 'https://api.spotify.com/')   # override to test against a stub
+SPOTIFY_API_RETRIES = 3
+SPOTIFY_API_RETRY_STATUSES = (500, 502, 503, 504)
+
+# Spotify Web API calls of all workers share one token bucket (see take_rate_limit_tokens).
+# Background work (taste syncs, prefetch) leaves SPOTIFY_BACKGROUND_RESERVE tokens for
+# interactive requests, and each lane gives up after waiting RATE_LIMIT_MAX_WAIT seconds.
+# Each process takes tokens from the database SPOTIFY_RATE_LIMIT_LEASE at a time and spends
+# them locally, so most calls don't touch the database; unspent tokens lapse after
+# SPOTIFY_RATE_LIMIT_LEASE_SECONDS (and on a 429) rather than bursting past a block later.
+SPOTIFY_RATE_LIMIT_PER_SECOND = float(os.getenv('SPOTIFY_RATE_LIMIT_PER_SECOND', 10))
+SPOTIFY_RATE_LIMIT_BURST = float(os.getenv('SPOTIFY_RATE_LIMIT_BURST', 30))
+SPOTIFY_BACKGROUND_RESERVE = float(os.getenv('SPOTIFY_BACKGROUND_RESERVE', 10))
+SPOTIFY_RATE_LIMIT_LEASE = int(os.getenv('SPOTIFY_RATE_LIMIT_LEASE', 5))
+SPOTIFY_RATE_LIMIT_LEASE_SECONDS = 1
+RATE_LIMIT_MAX_WAIT = {
+    'interactive': float(os.getenv('RATE_LIMIT_INTERACTIVE_MAX_WAIT', 3)),
+    'background': float(os.getenv('RATE_LIMIT_BACKGROUND_MAX_WAIT', 120)),
+}
+RATE_LIMIT_DEFAULT_RETRY_AFTER = 1   # seconds, when a 429 has no Retry-After header
+_priority = threading.local()
+_rate_limit_lock = threading.Lock()
+_rate_limit_stats = {
+    lane: {'granted': 0, 'queued': 0, 'shed': 0, 'wait_ms': 0} for lane in RATE_LIMIT_MAX_WAIT
+}
+_rate_limit_stats.update(throttled=0, max_retry_after=0, leases=0)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+# Per-host counts of requests sent and connections opened (TCP/TLS handshakes)
+_http_stats_lock = threading.Lock()
+_http_stats = {}
+
+
+def _count_http(host, kind):
+    with _http_stats_lock:
+        host_stats = _http_stats.setdefault(host, {'requests': 0, 'handshakes': 0})
+        host_stats[kind] += 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count_http(self.host, 'handshakes')
+        super().connect()
+
+    def request(self, *args, **kwargs):
+        _count_http(self.host, 'requests')
+        return super().request(*args, **kwargs)
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count_http(self.host, 'handshakes')
+        super().connect()
+
+    def request(self, *args, **kwargs):
+        _count_http(self.host, 'requests')
+        return super().request(*args, **kwargs)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count requests and handshakes."""
+
+    def __init__(self, **kwargs):
+        super().__init__(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """A request was shed because the rate limiter couldn't admit it in time."""
+
+
+@contextmanager
+def request_priority(lane):
+    """
+    Run the block's rate-limited requests in a priority lane.
+
+    Args:
+        lane: 'interactive' (default for request threads) or 'background'
+    """
+    previous = getattr(_priority, 'lane', 'interactive')
+    _priority.lane = lane
+    try:
+        yield
+    finally:
+        _priority.lane = previous
+
+
+def get_request_priority():
+    """Get this thread's priority lane."""
+    return getattr(_priority, 'lane', 'interactive')
+
+
+def _count_rate_limit(lane, **counts):
+    with _rate_limit_lock:
+        for key, value in counts.items():
+            _rate_limit_stats[lane][key] += value
+
+
+def _parse_retry_after(response):
+    try:
+        return max(float(response.headers['Retry-After']), 0)
+    except (KeyError, ValueError):
+        return RATE_LIMIT_DEFAULT_RETRY_AFTER
+
+
+class _RateLimitedAdapter(_PooledAdapter):
+    """
+    _PooledAdapter that takes a token from a shared bucket before each request.
+
+    Tokens are leased from the bucket `lease` at a time per lane and spent
+    from this process's allowance. A 429 blocks the bucket for Retry-After
+    seconds (for all workers), drops the allowance, and the request is
+    retried once tokens flow again. A request that can't get a token within
+    its lane's RATE_LIMIT_MAX_WAIT raises RateLimited.
+    """
+
+    def __init__(self, bucket, rate, capacity, reserve, retries, lease, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = reserve
+        self.retries = retries
+        self.lease = lease
+        self._allowance = {}   # lane -> (tokens, lapses_at)
+        self._allowance_lock = threading.Lock()
+
+    def _take_leased(self, lane):
+        """Spend a token of this process's allowance for the lane, if it has one."""
+        with self._allowance_lock:
+            tokens, lapses_at = self._allowance.get(lane, (0, 0))
+            if tokens < 1 or lapses_at <= time.time():
+                return False
+            self._allowance[lane] = (tokens - 1, lapses_at)
+            return True
+
+    def _lease(self, lane):
+        """Lease tokens for the lane from the shared bucket, spending one; 0 or the seconds to wait."""
+        from database import take_rate_limit_tokens
+
+        try:
+            taken, wait_seconds = take_rate_limit_tokens(self.bucket, self.rate, self.capacity,
+                                                         self.reserve if lane == 'background' else 0, self.lease)
+        except Exception as e:
+            # The limiter must not take Spotify down with it: let the call through
+            print(f"Rate limiter unavailable for {self.bucket}: {str(e)}")
+            return 0
+        if not taken:
+            return wait_seconds
+
+        now = time.time()
+        with self._allowance_lock:
+            tokens, lapses_at = self._allowance.get(lane, (0, 0))
+            self._allowance[lane] = ((tokens if lapses_at > now else 0) + taken - 1,
+                                     now + SPOTIFY_RATE_LIMIT_LEASE_SECONDS)
+        with _rate_limit_lock:
+            _rate_limit_stats['leases'] += 1
+        return 0
+
+    def _acquire(self, lane, deadline):
+        started = time.time()
+        queued = False
+        while True:
+            wait_seconds = 0 if self._take_leased(lane) else self._lease(lane)
+
+            now = time.time()
+            if wait_seconds <= 0:
+                _count_rate_limit(lane, granted=1, queued=int(queued), wait_ms=round((now - started) * 1000))
+                return
+            if now + wait_seconds > deadline:
+                _count_rate_limit(lane, shed=1, queued=int(queued), wait_ms=round((now - started) * 1000))
+                raise RateLimited(f"{self.bucket} rate limit: no capacity for {wait_seconds:.1f}s ({lane})")
+            queued = True
+            time.sleep(wait_seconds)
+
+    def send(self, request, **kwargs):
+        from database import block_rate_limit
+
+        lane = get_request_priority()
+        deadline = time.time() + RATE_LIMIT_MAX_WAIT[lane]
+        for attempt in range(self.retries + 1):
+            self._acquire(lane, deadline)
+            response = super().send(request, **kwargs)
+            if response.status_code != 429:
+                return response
+
+            retry_after = _parse_retry_after(response)
+            with _rate_limit_lock:
+                _rate_limit_stats['throttled'] += 1
+                _rate_limit_stats['max_retry_after'] = max(_rate_limit_stats['max_retry_after'], retry_after)
+            print(f"⏳ {self.bucket} returned 429, pausing calls for {retry_after:g}s")
+            with self._allowance_lock:
+                self._allowance.clear()
+            try:
+                block_rate_limit(self.bucket, retry_after)
+            except Exception as e:
+                print(f"Could not record rate limit block for {self.bucket}: {str(e)}")
+                time.sleep(retry_after)
+            if attempt < self.retries:
+                response.close()
+        return response
+
+
+def get_rate_limit_stats():
+    """
+    Get this process's rate limiter counters.
+
+    Returns:
+        Dict with per-lane granted/queued/shed counts and total wait_ms, the
+        number of 429s received (throttled), the longest Retry-After seen and
+        the number of token leases taken from the database
+    """
+    with _rate_limit_lock:
+        return {key: dict(value) if isinstance(value, dict) else value
+                for key, value in _rate_limit_stats.items()}
+
+
+class _SharedSession(requests.Session):
+    """The process-wide session. spotipy closes its session when a client is
+    garbage collected, which would drop every pooled connection, so close()
+    is a no-op here."""
+
+    def close(self):
+        pass
+
+
+def _build_session():
+    session = _SharedSession()
+    session.mount('http://', _PooledAdapter())
+    session.mount('https://', _PooledAdapter())
+    spotify_retry = urllib3.Retry(
+        total=SPOTIFY_API_RETRIES,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),   # POSTs (playlist writes) aren't idempotent
+        status=SPOTIFY_API_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=SPOTIFY_API_RETRY_STATUSES,
+        respect_retry_after_header=False   # 429s are retried by _RateLimitedAdapter
+    )
+    session.mount(SPOTIFY_API_URL, _RateLimitedAdapter(
+        'spotify', SPOTIFY_RATE_LIMIT_PER_SECOND, SPOTIFY_RATE_LIMIT_BURST, SPOTIFY_BACKGROUND_RESERVE,
+        SPOTIFY_API_RETRIES, SPOTIFY_RATE_LIMIT_LEASE, max_retries=spotify_retry
+    ))
+    return session
+
+
+def get_http_session():
+    """
+    Get this process's shared requests.Session.
+
+    Connections are pooled and kept alive per host, so repeat calls to the
+    same host skip the TCP/TLS handshake. The session is thread-safe for
+    plain requests; don't set per-call state (headers, auth) on it.
+
+    Returns:
+        requests.Session
+    """
+    global _session, _session_pid
+
+    with _session_lock:
+        # Rebuild after a fork so processes never share sockets
+        if _session is None or _session_pid != os.getpid():
+            _session = _build_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def http_timeout(read_timeout=None):
+    """
+    Get a (connect, read) timeout for a request on the shared session.
+
+    Args:
+        read_timeout: Seconds to wait for a response (default HTTP_READ_TIMEOUT)
+
+    Returns:
+        Tuple usable as the requests timeout argument
+    """
+    return (HTTP_CONNECT_TIMEOUT, read_timeout or HTTP_READ_TIMEOUT)
+
+
+def http_get(url, read_timeout=None, **kwargs):
+    """GET a URL through the shared session."""
+    return get_http_session().get(url, timeout=http_timeout(read_timeout), **kwargs)
+
+
+def get_http_stats():
+    """
+    Get this process's outbound HTTP counters per host.
+
+    Returns:
+        Dict of host -> {requests, handshakes, reused}, where reused is the
+        number of requests sent on an already open connection
+    """
+    with _http_stats_lock:
+        return {
+            host: dict(counts, reused=max(counts['requests'] - counts['handshakes'], 0))
+            for host, counts in _http_stats.items()
+        }
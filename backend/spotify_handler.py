@@ -2,7 +2,15 @@ import os
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 from dotenv import load_dotenv
+import math
 import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+import http_client
+from http_client import get_http_session, http_timeout, request_priority, get_request_priority
 
 # Load environment variables from project root
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
@@ -16,6 +24,46 @@ SPOTIFY_REDIRECT_URI = os.getenv('SPOTIFY_REDIRECT_URI', 'http://localhost:5000/
 # OAuth scope for playlist management and taste data
 SCOPE = 'playlist-modify-public playlist-modify-private user-library-read user-top-read user-follow-read'
 
+# Fan-out of per-artist Spotify lookups (see _map_concurrently)
+SPOTIFY_LOOKUP_CONCURRENCY = int(os.getenv('SPOTIFY_LOOKUP_CONCURRENCY', 10))
+SPOTIFY_REQUEST_TIMEOUT = float(os.getenv('SPOTIFY_REQUEST_TIMEOUT', 5))      # seconds per HTTP call
+SPOTIFY_LOOKUP_TIMEOUT = float(os.getenv('SPOTIFY_LOOKUP_TIMEOUT', 15))       # seconds for a whole fan-out
+# Background lookups (prefetch, pool refills) get their own smaller pool: they may wait
+# on the rate limiter for minutes, which must not tie up the interactive pool's threads
+SPOTIFY_BACKGROUND_LOOKUP_CONCURRENCY = int(os.getenv('SPOTIFY_BACKGROUND_LOOKUP_CONCURRENCY', 3))
+_lookup_executors = {}
+_lookup_executor_pid = None
+_lookup_executor_lock = threading.Lock()
+
+# Taste sync: page size of the library endpoints, and the time limit for fetching all saved-track pages
+TASTE_SYNC_PAGE_SIZE = 50
+TASTE_SYNC_TIMEOUT = float(os.getenv('TASTE_SYNC_TIMEOUT', 300))
+# Saved-track pages are fetched on the sync's own threads, never on the shared lookup pool,
+# so a sync waiting on the rate limiter can't starve interactive lookups of workers
+TASTE_SYNC_PAGE_CONCURRENCY = int(os.getenv('TASTE_SYNC_PAGE_CONCURRENCY', 4))
+
+# Playlist writes: tracks per add-items call (Spotify's maximum) and retries per chunk
+PLAYLIST_CHUNK_SIZE = 100
+PLAYLIST_CHUNK_RETRIES = 3
+PLAYLIST_CHUNK_RETRY_DELAY = 0.5   # seconds, doubled per retry
+
+# Per-user Spotify clients, reused until shortly before their token expires or until
+# the token saved for the user changes (another worker refreshed, reconnected or disconnected)
+SPOTIFY_CLIENT_CACHE_SIZE = int(os.getenv('SPOTIFY_CLIENT_CACHE_SIZE', 100))
+SPOTIFY_TOKEN_REFRESH_MARGIN = 60                                              # seconds before expiry
+SPOTIFY_TOKEN_REFRESH_TIMEOUT = float(os.getenv('SPOTIFY_TOKEN_REFRESH_TIMEOUT', 30))
+SPOTIFY_TOKEN_REFRESH_POLL_SECONDS = 0.1
+_client_cache = OrderedDict()
+_client_cache_lock = threading.Lock()
+_client_user_locks = OrderedDict()   # refresh locks of the most recent users, also up to SPOTIFY_CLIENT_CACHE_SIZE
+_client_cache_stats = {'hits': 0, 'misses': 0, 'invalidated': 0, 'refreshes': 0, 'refresh_waits': 0,
+                       'refresh_failures': 0}
+
+# Process-wide counters for the artist search and top tracks caches (see search_artist)
+_artist_cache_lock = threading.Lock()
+_artist_cache_stats = {'hits': 0, 'negative_hits': 0, 'misses': 0}
+_top_tracks_cache_stats = {'hits': 0, 'misses': 0}
+
 def get_spotify_oauth(force_new_auth=False):
     """Create and return Spotify OAuth object.
 
@@ -30,8 +78,20 @@ def get_spotify_oauth(force_new_auth=False):
         redirect_uri=SPOTIFY_REDIRECT_URI,
         scope=SCOPE,
         cache_handler=MemoryCacheHandler(),  # No file cache - use memory only
-        show_dialog=force_new_auth  # Force login dialog for new connections
+        show_dialog=force_new_auth,  # Force login dialog for new connections
+        requests_session=get_http_session(),
+        requests_timeout=http_timeout()
+    )
+
+def _new_spotify_client(access_token):
+    """Create a spotipy client on the shared keep-alive (and rate-limited) HTTP session."""
+    client = spotipy.Spotify(
+        auth=access_token,
+        requests_session=get_http_session(),
+        requests_timeout=http_timeout(SPOTIFY_REQUEST_TIMEOUT)
     )
+    client.prefix = http_client.SPOTIFY_API_URL + 'v1/'   # read at call time, so tests can point it at a stub
+    return client
 
 def get_spotify_client(token_info=None, user_id=None):
     """
@@ -56,7 +116,7 @@ def get_spotify_client(token_info=None, user_id=None):
 
         # Priority 2: Use provided token info
         if token_info is not None:
-            return spotipy.Spotify(auth=token_info['access_token'])
+            return _new_spotify_client(token_info['access_token'])
 
         # No user_id or token_info provided - can't authenticate
         # Note: Removed legacy file cache fallback as it caused cross-user contamination
@@ -66,11 +126,87 @@ def get_spotify_client(token_info=None, user_id=None):
         return None
 
 
+def _count_client_cache(kind):
+    with _client_cache_lock:
+        _client_cache_stats[kind] += 1
+
+
+def get_spotify_client_cache_stats():
+    """Get this process's Spotify client cache hits/misses and token refresh counts."""
+    with _client_cache_lock:
+        return dict(_client_cache_stats, cached_clients=len(_client_cache))
+
+
+def forget_spotify_client(user_id):
+    """Drop a user's cached Spotify client (call when their Spotify auth changes)."""
+    with _client_cache_lock:
+        _client_cache.pop(user_id, None)
+
+
+def _token_is_fresh(expires_at):
+    return not expires_at or expires_at > time.time() + SPOTIFY_TOKEN_REFRESH_MARGIN
+
+
+def _refresh_token_single_flight(user_id):
+    """
+    Refresh a user's token unless another worker process is already doing it.
+
+    The token_refresh_locks table acts as the lock: the process that claims
+    it refreshes and saves the token; the others poll the users table until
+    the new token shows up.
+
+    Returns:
+        Dict with access_token and expires_at, or None if the refresh failed
+    """
+    from database import get_spotify_auth, claim_token_refresh, release_token_refresh
+
+    owner = f'{os.getpid()}:{threading.get_ident()}'
+    deadline = time.time() + SPOTIFY_TOKEN_REFRESH_TIMEOUT
+    while time.time() < deadline:
+        if claim_token_refresh(user_id, owner, SPOTIFY_TOKEN_REFRESH_TIMEOUT):
+            try:
+                # Another process may have refreshed just before we claimed
+                auth_data = get_spotify_auth(user_id)
+                if not auth_data:
+                    return None
+                if _token_is_fresh(auth_data['spotify_token_expires_at']):
+                    _count_client_cache('refresh_waits')
+                    return {'access_token': auth_data['spotify_access_token'],
+                            'expires_at': auth_data['spotify_token_expires_at']}
+
+                _count_client_cache('refreshes')
+                token_info = refresh_user_token(user_id, auth_data['spotify_refresh_token'])
+                if not token_info:
+                    _count_client_cache('refresh_failures')
+                return token_info
+            finally:
+                release_token_refresh(user_id, owner)
+
+        time.sleep(SPOTIFY_TOKEN_REFRESH_POLL_SECONDS)
+        auth_data = get_spotify_auth(user_id)
+        if not auth_data:
+            return None
+        if _token_is_fresh(auth_data['spotify_token_expires_at']):
+            _count_client_cache('refresh_waits')
+            return {'access_token': auth_data['spotify_access_token'],
+                    'expires_at': auth_data['spotify_token_expires_at']}
+
+    print(f"Timed out waiting for token refresh for user {user_id}")
+    _count_client_cache('refresh_failures')
+    return None
+
+
 def get_spotify_client_for_user(user_id):
     """
     Get authenticated Spotify client for a specific DailyJams user.
 
-    Loads token from database and refreshes if expired.
+    Clients are cached per user (up to SPOTIFY_CLIENT_CACHE_SIZE) until
+    SPOTIFY_TOKEN_REFRESH_MARGIN seconds before their token expires. Each
+    lookup compares the cached client's token with the one saved for the
+    user (a primary key read), so a reconnect, disconnect or refresh by any
+    worker drops it at once. An expiring token is refreshed once: threads of
+    this process wait on a per-user lock, other processes on the
+    token_refresh_locks table.
 
     Args:
         user_id: DailyJams user ID
@@ -78,25 +214,58 @@ def get_spotify_client_for_user(user_id):
     Returns:
         Spotipy client object or None if user not connected to Spotify
     """
-    from database import get_spotify_auth, update_spotify_token
-    import time
+    from database import get_spotify_auth, get_spotify_access_token
 
     try:
-        auth_data = get_spotify_auth(user_id)
-        if not auth_data:
-            return None
-
-        # Check if token is expired (with 60 second buffer)
-        if auth_data['spotify_token_expires_at'] and auth_data['spotify_token_expires_at'] < time.time() + 60:
-            # Token expired or about to expire, refresh it
-            refreshed_token = refresh_user_token(user_id, auth_data['spotify_refresh_token'])
-            if not refreshed_token:
+        saved_token = get_spotify_access_token(user_id)
+        with _client_cache_lock:
+            entry = _client_cache.get(user_id)
+            if entry and entry['access_token'] == saved_token and _token_is_fresh(entry['expires_at']):
+                _client_cache.move_to_end(user_id)
+                _client_cache_stats['hits'] += 1
+                return entry['client']
+            if entry and entry['access_token'] != saved_token:
+                _client_cache.pop(user_id)
+                _client_cache_stats['invalidated'] += 1
+            _client_cache_stats['misses'] += 1
+            user_lock = _client_user_locks.pop(user_id, None) or threading.Lock()
+            _client_user_locks[user_id] = user_lock
+            # Evict the least recently used locks nobody holds (a held one is still in use)
+            excess = len(_client_user_locks) - SPOTIFY_CLIENT_CACHE_SIZE
+            if excess > 0:
+                idle = [uid for uid, lock in _client_user_locks.items() if not lock.locked()]
+                for uid in idle[:excess]:
+                    del _client_user_locks[uid]
+
+        with user_lock:
+            auth_data = get_spotify_auth(user_id)
+            if not auth_data:
+                forget_spotify_client(user_id)
                 return None
-            access_token = refreshed_token['access_token']
-        else:
-            access_token = auth_data['spotify_access_token']
 
-        return spotipy.Spotify(auth=access_token)
+            # Another thread may have refreshed while we waited for the lock
+            access_token = auth_data['spotify_access_token']
+            with _client_cache_lock:
+                entry = _client_cache.get(user_id)
+                if entry and entry['access_token'] == access_token and _token_is_fresh(entry['expires_at']):
+                    return entry['client']
+
+            expires_at = auth_data['spotify_token_expires_at']
+            if not _token_is_fresh(expires_at):
+                # Token expired or about to expire, refresh it
+                refreshed_token = _refresh_token_single_flight(user_id)
+                if not refreshed_token:
+                    return None
+                access_token = refreshed_token['access_token']
+                expires_at = refreshed_token.get('expires_at')
+
+            client = _new_spotify_client(access_token)
+            with _client_cache_lock:
+                _client_cache[user_id] = {'client': client, 'access_token': access_token, 'expires_at': expires_at}
+                _client_cache.move_to_end(user_id)
+                while len(_client_cache) > SPOTIFY_CLIENT_CACHE_SIZE:
+                    _client_cache.popitem(last=False)
+            return client
     except Exception as e:
         print(f"Error getting Spotify client for user {user_id}: {str(e)}")
         return None
@@ -141,117 +310,327 @@ def get_user_top_artists(sp, time_range='medium_term', limit=50):
         limit: Number of artists to fetch (max 50)
 
     Returns:
-        List of artist dicts with name, genres, id
+        List of artist dicts with name, genres, id (raises on API errors)
     """
-    try:
-        results = sp.current_user_top_artists(limit=limit, time_range=time_range)
-        return [
-            {'name': a['name'], 'genres': a.get('genres', []), 'id': a['id']}
-            for a in results['items']
-        ]
-    except Exception as e:
-        print(f"Error fetching top artists ({time_range}): {str(e)}")
-        return []
+    results = sp.current_user_top_artists(limit=limit, time_range=time_range)
+    return [
+        {'name': a['name'], 'genres': a.get('genres', []), 'id': a['id']}
+        for a in results['items']
+    ]
 
 
-def get_user_followed_artists(sp, limit=50):
+def get_user_followed_artists(sp):
     """
-    Fetch artists the user follows on Spotify.
+    Fetch every artist the user follows on Spotify, paging by cursor.
 
     Args:
         sp: Authenticated Spotify client
-        limit: Number of artists to fetch (max 50)
 
     Returns:
-        List of artist dicts with name, genres, id
+        List of artist dicts with name, genres, id (raises on API errors)
     """
-    try:
-        results = sp.current_user_followed_artists(limit=limit)
-        return [
+    artists = []
+    after = None
+    while True:
+        page = sp.current_user_followed_artists(limit=TASTE_SYNC_PAGE_SIZE, after=after)['artists']
+        artists.extend(
             {'name': a['name'], 'genres': a.get('genres', []), 'id': a['id']}
-            for a in results['artists']['items']
-        ]
-    except Exception as e:
-        print(f"Error fetching followed artists: {str(e)}")
-        return []
+            for a in page['items']
+        )
+        after = (page.get('cursors') or {}).get('after')
+        if not page.get('next') or not after:
+            return artists
 
 
-def get_user_saved_tracks_artists(sp, limit=50):
+def get_user_saved_tracks_artists(sp, since=None):
     """
-    Fetch unique artists from user's saved/liked tracks.
+    Fetch the unique artists of the user's saved/liked tracks, newest first.
+
+    Without `since`, reads the whole library: the first page gives the total,
+    then the remaining pages are fetched concurrently on the sync's own
+    TASTE_SYNC_PAGE_CONCURRENCY threads. With `since` (the
+    added_at of the newest track seen by the last sync), pages are read in
+    order and paging stops at the first track that isn't newer.
 
     Args:
         sp: Authenticated Spotify client
-        limit: Number of saved tracks to scan (max 50)
+        since: added_at timestamp to stop at, or None for the full library
 
     Returns:
-        List of artist dicts with name, id (no genres available from tracks)
+        Tuple of (list of artist dicts with name, id (no genres available from
+        tracks), added_at of the newest saved track). Raises on API errors.
     """
-    try:
-        results = sp.current_user_saved_tracks(limit=limit)
-        artists = {}
-
-        for item in results['items']:
+    def fetch(offset):
+        return sp.current_user_saved_tracks(limit=TASTE_SYNC_PAGE_SIZE, offset=offset)
+
+    first = fetch(0)
+    pages = [first['items']]
+    if since is None:
+        offsets = list(range(TASTE_SYNC_PAGE_SIZE, first.get('total') or 0, TASTE_SYNC_PAGE_SIZE))
+        executor = ThreadPoolExecutor(max_workers=TASTE_SYNC_PAGE_CONCURRENCY, thread_name_prefix='taste-sync-pages')
+        try:
+            rest = _map_concurrently(fetch, offsets, timeout=TASTE_SYNC_TIMEOUT, executor=executor)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if any(page is None for page in rest):
+            raise RuntimeError('Could not fetch every page of saved tracks')
+        pages.extend(page['items'] for page in rest)
+    else:
+        page, offset = first, 0
+        while page['items'] and page['items'][-1]['added_at'] > since and page.get('next'):
+            offset += TASTE_SYNC_PAGE_SIZE
+            page = fetch(offset)
+            pages.append(page['items'])
+
+    artists = {}
+    for items in pages:
+        for item in items:
+            if since is not None and item['added_at'] <= since:
+                continue
             for artist in item['track']['artists']:
                 if artist['id'] not in artists:
                     artists[artist['id']] = {'name': artist['name'], 'id': artist['id'], 'genres': []}
 
-        return list(artists.values())
-    except Exception as e:
-        print(f"Error fetching saved tracks artists: {str(e)}")
-        return []
+    newest = first['items'][0]['added_at'] if first['items'] else since
+    return list(artists.values()), newest
 
 
-def sync_all_taste_data(user_id):
+def _timed(timings, phase, func, *args, progress=None):
+    """
+    Wrap func(*args) so its duration in ms is recorded in timings[phase].
+
+    progress, if given, is called as progress(phase, status, ms) when the
+    phase starts ('running', None) and ends ('done' or 'failed', duration).
+    """
+    lane = get_request_priority()
+
+    def run():
+        if progress:
+            progress(phase, 'running', None)
+        start = time.perf_counter()
+        status = 'failed'
+        try:
+            with request_priority(lane):
+                result = func(*args)
+            status = 'done'
+            return result
+        finally:
+            timings[phase] = round((time.perf_counter() - start) * 1000)
+            if progress:
+                progress(phase, status, timings[phase])
+    return run
+
+
+def sync_all_taste_data(user_id, full=False, progress=None):
     """
     Sync all Spotify taste data for a user.
 
+    Fetches the top artists (3 time ranges), every followed artist and the
+    artists of every saved track, running the five endpoints concurrently.
+    After the first sync, saved tracks are synced incrementally: only tracks
+    added since the last sync are fetched and merged into the stored list.
+    Followed artists have no stable order to stop at, so they are always
+    read in full. A list that fails to fetch keeps its stored data.
+
     Args:
         user_id: DailyJams user ID
+        full: Re-read the whole saved library (also drops unsaved tracks)
+        progress: Optional callback progress(phase, status, ms) for each
+            fetch phase and the final 'save' phase
 
     Returns:
-        Dict with sync results or error
+        Dict with sync results (counts and per-phase timings in ms) or error
     """
-    from database import save_taste_data
-    import json
+    from database import save_taste_data, get_taste_data, get_taste_sync_cursor, db_transaction
 
     sp = get_spotify_client_for_user(user_id)
     if not sp:
         return {'success': False, 'error': 'Not connected to Spotify'}
 
+    started = time.perf_counter()
+    since = None if full else get_taste_sync_cursor(user_id, 'saved_tracks')
+    timings = {}
+    phases = {
+        'top_artists_short': _timed(timings, 'top_artists_short', get_user_top_artists, sp, 'short_term',
+                                    progress=progress),
+        'top_artists_medium': _timed(timings, 'top_artists_medium', get_user_top_artists, sp, 'medium_term',
+                                     progress=progress),
+        'top_artists_long': _timed(timings, 'top_artists_long', get_user_top_artists, sp, 'long_term',
+                                   progress=progress),
+        'followed_artists': _timed(timings, 'followed_artists', get_user_followed_artists, sp,
+                                   progress=progress),
+        'saved_track_artists': _timed(timings, 'saved_track_artists', get_user_saved_tracks_artists, sp, since,
+                                      progress=progress),
+    }
+
+    # The phases get their own threads; saved tracks fans its pages out on a further
+    # TASTE_SYNC_PAGE_CONCURRENCY threads of its own, not on the shared lookup pool
+    with ThreadPoolExecutor(max_workers=len(phases), thread_name_prefix='taste-sync') as executor:
+        futures = {phase: executor.submit(run) for phase, run in phases.items()}
+
+    results = {}
+    for phase, future in futures.items():
+        if future.exception() is not None:
+            print(f"Error syncing {phase} for user {user_id}: {str(future.exception())}")
+        else:
+            results[phase] = future.result()
+
+    if not results:
+        return {'success': False, 'error': 'Could not fetch taste data from Spotify'}
+
+    saved = None
+    if 'saved_track_artists' in results:
+        saved, newest = results['saved_track_artists']
+
+    def save():
+        nonlocal saved
+        if saved is not None and since is not None:
+            # Incremental: new artists first, then the ones already stored
+            stored = (get_taste_data(user_id) or {}).get('saved_tracks', [])
+            new_ids = {artist['id'] for artist in saved}
+            saved = saved + [artist for artist in stored if artist['id'] not in new_ids]
+
+        # Save to database (in one transaction, so readers never see a half-synced taste)
+        with db_transaction():
+            for phase, time_range in (('top_artists_short', 'short_term'), ('top_artists_medium', 'medium_term'),
+                                      ('top_artists_long', 'long_term')):
+                if phase in results:
+                    save_taste_data(user_id, 'top_artists', time_range, results[phase])
+            if 'followed_artists' in results:
+                save_taste_data(user_id, 'followed_artists', None, results['followed_artists'])
+            if saved is not None:
+                save_taste_data(user_id, 'saved_tracks', None, saved, sync_cursor=newest)
+
     try:
-        # Fetch all taste data
-        top_short = get_user_top_artists(sp, 'short_term')
-        top_medium = get_user_top_artists(sp, 'medium_term')
-        top_long = get_user_top_artists(sp, 'long_term')
-        followed = get_user_followed_artists(sp)
-        saved = get_user_saved_tracks_artists(sp)
-
-        # Save to database
-        save_taste_data(user_id, 'top_artists', 'short_term', json.dumps(top_short))
-        save_taste_data(user_id, 'top_artists', 'medium_term', json.dumps(top_medium))
-        save_taste_data(user_id, 'top_artists', 'long_term', json.dumps(top_long))
-        save_taste_data(user_id, 'followed_artists', None, json.dumps(followed))
-        save_taste_data(user_id, 'saved_tracks', None, json.dumps(saved))
+        _timed(timings, 'save', save, progress=progress)()
+        timings['total'] = round((time.perf_counter() - started) * 1000)
+        print(f"⏱️  Taste sync for user {user_id} ({'incremental' if since else 'full'}): {timings}")
+
+        synced = {phase: len(result) for phase, result in results.items() if phase != 'saved_track_artists'}
+        if saved is not None:
+            synced['saved_track_artists'] = len(saved)
+            synced['new_saved_track_artists'] = len(results['saved_track_artists'][0])
 
         return {
             'success': True,
-            'synced': {
-                'top_artists_short': len(top_short),
-                'top_artists_medium': len(top_medium),
-                'top_artists_long': len(top_long),
-                'followed_artists': len(followed),
-                'saved_track_artists': len(saved)
-            }
+            'incremental': since is not None,
+            'synced': synced,
+            'failed': [phase for phase in phases if phase not in results],
+            'timings': timings
         }
     except Exception as e:
         print(f"Error syncing taste data for user {user_id}: {str(e)}")
         return {'success': False, 'error': str(e)}
 
+def _get_lookup_executor(lane='interactive'):
+    """Get the shared thread pool for Spotify lookups in a priority lane (recreated after a fork)."""
+    global _lookup_executor_pid
+    with _lookup_executor_lock:
+        if _lookup_executor_pid != os.getpid():
+            _lookup_executors.clear()
+            _lookup_executor_pid = os.getpid()
+        if lane not in _lookup_executors:
+            _lookup_executors[lane] = ThreadPoolExecutor(
+                max_workers=SPOTIFY_LOOKUP_CONCURRENCY if lane == 'interactive'
+                else SPOTIFY_BACKGROUND_LOOKUP_CONCURRENCY,
+                thread_name_prefix=f'spotify-lookup-{lane}'
+            )
+        return _lookup_executors[lane]
+
+
+def _map_concurrently(func, items, timeout=None, executor=None):
+    """
+    Call func(item) for every item on the shared lookup pool of the caller's
+    rate limit priority lane (or on `executor`).
+
+    At most SPOTIFY_LOOKUP_CONCURRENCY interactive calls (and
+    SPOTIFY_BACKGROUND_LOOKUP_CONCURRENCY background ones) run at once. A
+    call that raises or hasn't finished within `timeout` seconds (default
+    SPOTIFY_LOOKUP_TIMEOUT) yields None without affecting the others.
+
+    Returns:
+        List of results in the same order as items
+    """
+    if not items:
+        return []
+
+    lane = get_request_priority()
+
+    def call(item):
+        with request_priority(lane):
+            return func(item)
+
+    executor = executor or _get_lookup_executor(lane)
+    futures = [executor.submit(call, item) for item in items]
+    wait(futures, timeout=SPOTIFY_LOOKUP_TIMEOUT if timeout is None else timeout)
+
+    results = []
+    for item, future in zip(items, futures):
+        if not future.done():
+            future.cancel()
+            print(f"Spotify lookup timed out for '{item}'")
+            results.append(None)
+        elif future.exception() is not None:
+            print(f"Spotify lookup failed for '{item}': {str(future.exception())}")
+            results.append(None)
+        else:
+            results.append(future.result())
+    return results
+
+
+def _record_artist_cache_lookup(cached, requested):
+    """Update the artist cache counters for one lookup of `requested` names."""
+    with _artist_cache_lock:
+        _artist_cache_stats['hits'] += sum(1 for value in cached.values() if value)
+        _artist_cache_stats['negative_hits'] += sum(1 for value in cached.values() if value is None)
+        _artist_cache_stats['misses'] += requested - len(cached)
+
+
+def get_artist_cache_stats():
+    """Get this process's artist search cache counters (hits, negative_hits, misses)."""
+    with _artist_cache_lock:
+        return dict(_artist_cache_stats)
+
+
+def _search_spotify_artist(artist_name, sp):
+    """
+    Search Spotify for an artist and cache the result in the artists table.
+
+    A search with no match is cached as not found; a failed API call
+    raises and is not cached.
+    """
+    from database import save_artist_spotify_data
+
+    results = sp.search(q=f'artist:{artist_name}', type='artist', limit=1)
+
+    if not results['artists']['items']:
+        save_artist_spotify_data(artist_name, None)
+        return None
+
+    artist = results['artists']['items'][0]
+    # Get the best image (first one is usually largest)
+    image_url = None
+    if artist.get('images') and len(artist['images']) > 0:
+        image_url = artist['images'][0]['url']
+    found = {
+        'id': artist['id'],
+        'name': artist['name'],
+        'uri': artist['uri'],
+        'spotify_url': artist['external_urls']['spotify'],
+        'image_url': image_url,
+        'genres': artist.get('genres', [])
+    }
+    found['artist_id'] = save_artist_spotify_data(artist_name, found)
+    return found
+
+
 def search_artist(artist_name, sp=None):
     """
     Search for an artist on Spotify.
 
+    Results (including "not found") are read through the SQLite artist cache,
+    see database.get_artists_by_names for the expiry rules.
+
     Args:
         artist_name: Name of the artist to search for
         sp: Optional Spotify client (will create one if not provided)
@@ -259,28 +638,20 @@ def search_artist(artist_name, sp=None):
     Returns:
         Artist object with id, name, uri, or None if not found
     """
+    from database import get_artists_by_names
+
     try:
+        cached = get_artists_by_names([artist_name])
+        _record_artist_cache_lookup(cached, 1)
+        if artist_name in cached:
+            return cached[artist_name]
+
         if sp is None:
             sp = get_spotify_client()
             if sp is None:
                 return None
 
-        results = sp.search(q=f'artist:{artist_name}', type='artist', limit=1)
-
-        if results['artists']['items']:
-            artist = results['artists']['items'][0]
-            # Get the best image (first one is usually largest)
-            image_url = None
-            if artist.get('images') and len(artist['images']) > 0:
-                image_url = artist['images'][0]['url']
-            return {
-                'id': artist['id'],
-                'name': artist['name'],
-                'uri': artist['uri'],
-                'spotify_url': artist['external_urls']['spotify'],
-                'image_url': image_url
-            }
-        return None
+        return _search_spotify_artist(artist_name, sp)
     except Exception as e:
         print(f"Error searching for artist '{artist_name}': {str(e)}")
         return None
@@ -289,6 +660,8 @@ def get_artist_images(artist_names, user_id=None):
     """
     Get images for multiple artists.
 
+    Uncached artists are searched concurrently (see _map_concurrently).
+
     Args:
         artist_names: List of artist names
         user_id: Optional DailyJams user ID for per-user auth
@@ -296,29 +669,63 @@ def get_artist_images(artist_names, user_id=None):
     Returns:
         Dict mapping artist names to their image URLs
     """
+    from database import get_artists_by_names
+
     try:
+        # Resolve cached artists (found or not) without touching Spotify
+        cached = get_artists_by_names(artist_names)
+        _record_artist_cache_lookup(cached, len(set(artist_names)))
+        images = {name: (cached[name] or {}).get('image_url') for name in artist_names if name in cached}
+        missing = [name for name in artist_names if name not in cached]
+        if not missing:
+            return images
+
         sp = get_spotify_client(user_id=user_id)
         if sp is None:
             print("Spotify not authenticated - cannot fetch artist images")
-            return {}
+            return images
 
-        images = {}
-        for artist_name in artist_names:
-            artist = search_artist(artist_name, sp)
-            if artist and artist.get('image_url'):
-                images[artist_name] = artist['image_url']
-            else:
-                images[artist_name] = None
+        found = _map_concurrently(lambda artist_name: _search_spotify_artist(artist_name, sp), missing)
+        for artist_name, artist in zip(missing, found):
+            images[artist_name] = artist.get('image_url') if artist else None
 
         return images
     except Exception as e:
         print(f"Error getting artist images: {str(e)}")
         return {}
 
+def _fetch_artist_top_tracks(artist_id, market, sp):
+    """Fetch an artist's top tracks (all Spotify returns, up to 10) from the API."""
+    results = sp.artist_top_tracks(artist_id, country=market)
+    return [{
+        'id': track['id'],
+        'name': track['name'],
+        'uri': track['uri'],
+        'preview_url': track.get('preview_url'),
+        'spotify_url': track['external_urls']['spotify'],
+        'duration_ms': track['duration_ms'],
+        'album': track['album']['name']
+    } for track in results['tracks']]
+
+
+def _record_top_tracks_cache_lookup(hits, misses):
+    with _artist_cache_lock:
+        _top_tracks_cache_stats['hits'] += hits
+        _top_tracks_cache_stats['misses'] += misses
+
+
+def get_top_tracks_cache_stats():
+    """Get this process's top tracks cache counters (hits, misses)."""
+    with _artist_cache_lock:
+        return dict(_top_tracks_cache_stats)
+
+
 def get_artist_top_tracks(artist_id, market='US', limit=5, sp=None):
     """
     Get top tracks for an artist.
 
+    Read through the top tracks cache (see database.get_cached_top_tracks).
+
     Args:
         artist_id: Spotify artist ID
         market: Market/country code (default: US)
@@ -328,35 +735,166 @@ def get_artist_top_tracks(artist_id, market='US', limit=5, sp=None):
     Returns:
         List of track objects with id, name, uri, preview_url
     """
+    from database import get_cached_top_tracks, save_top_tracks
+
     try:
+        cached = get_cached_top_tracks([artist_id], market)
+        _record_top_tracks_cache_lookup(len(cached), 1 - len(cached))
+        if artist_id in cached:
+            return cached[artist_id][:limit]
+
         if sp is None:
             sp = get_spotify_client()
             if sp is None:
                 return []
 
-        results = sp.artist_top_tracks(artist_id, country=market)
-        tracks = []
-
-        for track in results['tracks'][:limit]:
-            tracks.append({
-                'id': track['id'],
-                'name': track['name'],
-                'uri': track['uri'],
-                'preview_url': track.get('preview_url'),
-                'spotify_url': track['external_urls']['spotify'],
-                'duration_ms': track['duration_ms'],
-                'album': track['album']['name']
-            })
-
-        return tracks
+        tracks = _fetch_artist_top_tracks(artist_id, market, sp)
+        save_top_tracks(market, {artist_id: tracks})
+        return tracks[:limit]
     except Exception as e:
         print(f"Error getting top tracks for artist {artist_id}: {str(e)}")
         return []
 
+def _get_playlist_total(sp, playlist_id):
+    """Get the number of tracks in a playlist."""
+    return sp.playlist_items(playlist_id, fields='total', limit=1)['total']
+
+
+def _add_playlist_chunk(sp, playlist_id, chunk, position, verify_first=False):
+    """
+    Add one chunk of tracks at `position` (the playlist's size before it).
+
+    The add isn't idempotent, so before a retry (and before the first try
+    when verify_first, i.e. resuming) the playlist size tells whether the
+    chunk already landed: size == position means retry, position + len(chunk)
+    means it's done. Any other size means the playlist was edited meanwhile.
+
+    Returns:
+        The new snapshot_id, or None if the chunk was already in the playlist
+    """
+    for attempt in range(PLAYLIST_CHUNK_RETRIES + 1):
+        if verify_first or attempt > 0:
+            total = _get_playlist_total(sp, playlist_id)
+            if total == position + len(chunk):
+                return None
+            if total != position:
+                raise RuntimeError(f'Playlist has {total} tracks, expected {position} - it was changed during the write')
+        try:
+            return sp.playlist_add_items(playlist_id, chunk, position=position)['snapshot_id']
+        except Exception as e:
+            if attempt == PLAYLIST_CHUNK_RETRIES:
+                raise
+            print(f"Adding tracks {position}-{position + len(chunk)} to playlist {playlist_id} failed "
+                  f"(attempt {attempt + 1}): {str(e)}")
+            time.sleep(PLAYLIST_CHUNK_RETRY_DELAY * 2 ** attempt)
+
+
+def _add_tracks_in_chunks(sp, playlist_id, track_uris, base_total, first_chunk=0, on_chunk=None, resume=False):
+    """
+    Add tracks to a playlist in chunks of PLAYLIST_CHUNK_SIZE (Spotify's limit per call).
+
+    Args:
+        base_total: Number of tracks the playlist had before any of track_uris
+        first_chunk: Index of the first chunk to write (when resuming)
+        on_chunk: Optional callback on_chunk(chunks_done, snapshot_id) after each chunk
+        resume: Check whether the first chunk already landed before adding it
+            (a timed-out add may have been applied, even for chunk 0)
+
+    Returns:
+        snapshot_id after the last chunk written (None if all had already landed)
+    """
+    snapshot_id = None
+    for index in range(first_chunk, math.ceil(len(track_uris) / PLAYLIST_CHUNK_SIZE)):
+        start = index * PLAYLIST_CHUNK_SIZE
+        chunk = track_uris[start:start + PLAYLIST_CHUNK_SIZE]
+        snapshot_id = _add_playlist_chunk(sp, playlist_id, chunk, base_total + start,
+                                          verify_first=resume and index == first_chunk) or snapshot_id
+        if on_chunk:
+            on_chunk(index + 1, snapshot_id)
+    return snapshot_id
+
+
+def write_playlist_tracks(user_id, playlist_id, track_uris, sp, write_id=None, db_playlist_id=None,
+                          suggestion_tracks=None):
+    """
+    Add tracks to a playlist with progress recorded in the database.
+
+    Tracks go in chunks of PLAYLIST_CHUNK_SIZE; each chunk is retried up to
+    PLAYLIST_CHUNK_RETRIES times without duplicating tracks (see
+    _add_playlist_chunk), and the snapshot_id after each chunk is stored.
+    A write that still fails can be resumed from its last finished chunk by
+    calling again with its write_id. After every attempt the DailyJams
+    playlist's track count is updated for the tracks that landed, and its
+    suggestions are linked once the write is done.
+
+    Args:
+        user_id: DailyJams user ID
+        playlist_id: Spotify playlist ID (ignored when resuming)
+        track_uris: Track URIs in order (ignored when resuming)
+        sp: Spotify client
+        write_id: ID of an unfinished write to resume
+        db_playlist_id: DailyJams playlist the tracks are recorded in (ignored when resuming)
+        suggestion_tracks: List of (suggestion_id, track_count) to link to it (ignored when resuming)
+
+    Returns:
+        Dict with write_id, playlist_id, success, tracks_added, snapshot_id and error (if failed)
+    """
+    from database import (start_playlist_write, update_playlist_write, get_playlist_write,
+                          record_playlist_write_tracks)
+
+    resuming = bool(write_id)
+    if resuming:
+        write = get_playlist_write(write_id, user_id)
+        if not write:
+            return {'write_id': write_id, 'playlist_id': None, 'success': False, 'tracks_added': 0,
+                    'error': 'Playlist write not found'}
+        if write['status'] == 'done':
+            record_playlist_write_tracks(write_id, len(write['track_uris']))
+            return {'write_id': write_id, 'playlist_id': write['spotify_playlist_id'], 'success': True,
+                    'tracks_added': len(write['track_uris']), 'snapshot_id': write['snapshot_id']}
+        playlist_id, track_uris = write['spotify_playlist_id'], write['track_uris']
+        base_total, first_chunk = write['base_total'], write['chunks_done']
+        update_playlist_write(write_id, status='running')
+    else:
+        write_id = str(uuid.uuid4())
+        first_chunk = 0
+        try:
+            base_total = _get_playlist_total(sp, playlist_id)
+        except Exception as e:
+            print(f"Error reading playlist {playlist_id}: {str(e)}")
+            return {'write_id': None, 'playlist_id': playlist_id, 'success': False, 'tracks_added': 0,
+                    'error': str(e)}
+        start_playlist_write(write_id, user_id, playlist_id, track_uris, base_total, db_playlist_id,
+                             suggestion_tracks)
+
+    progress = {'chunks_done': first_chunk}
+
+    def on_chunk(chunks_done, snapshot_id):
+        progress['chunks_done'] = chunks_done
+        update_playlist_write(write_id, chunks_done=chunks_done, snapshot_id=snapshot_id)
+
+    try:
+        snapshot_id = _add_tracks_in_chunks(sp, playlist_id, track_uris, base_total, first_chunk, on_chunk,
+                                            resume=resuming)
+        update_playlist_write(write_id, status='done')
+        record_playlist_write_tracks(write_id, len(track_uris))
+        return {'write_id': write_id, 'playlist_id': playlist_id, 'success': True,
+                'tracks_added': len(track_uris), 'snapshot_id': snapshot_id}
+    except Exception as e:
+        print(f"Error adding tracks to playlist {playlist_id}: {str(e)}")
+        update_playlist_write(write_id, status='failed', error=str(e))
+        tracks_added = min(progress['chunks_done'] * PLAYLIST_CHUNK_SIZE, len(track_uris))
+        record_playlist_write_tracks(write_id, tracks_added)
+        return {'write_id': write_id, 'playlist_id': playlist_id, 'success': False, 'error': str(e),
+                'tracks_added': tracks_added}
+
+
 def create_playlist(user_id, playlist_name, track_uris, is_public=True, description=None, sp=None):
     """
     Create a new Spotify playlist with tracks.
 
+    Tracks are added in chunks (see _add_tracks_in_chunks).
+
     Args:
         user_id: Spotify user ID
         playlist_name: Name for the new playlist
@@ -384,7 +922,7 @@ def create_playlist(user_id, playlist_name, track_uris, is_public=True, descript
 
         # Add tracks to the playlist
         if track_uris:
-            sp.playlist_add_items(playlist['id'], track_uris)
+            _add_tracks_in_chunks(sp, playlist['id'], track_uris, 0)
 
         return {
             'id': playlist['id'],
@@ -401,6 +939,8 @@ def add_tracks_to_playlist(playlist_id, track_uris, sp=None):
     """
     Add tracks to an existing playlist.
 
+    Tracks are added in chunks (see _add_tracks_in_chunks).
+
     Args:
         playlist_id: Spotify playlist ID
         track_uris: List of track URIs to add
@@ -415,7 +955,7 @@ def add_tracks_to_playlist(playlist_id, track_uris, sp=None):
             if sp is None:
                 return False
 
-        sp.playlist_add_items(playlist_id, track_uris)
+        _add_tracks_in_chunks(sp, playlist_id, track_uris, _get_playlist_total(sp, playlist_id))
         return True
     except Exception as e:
         print(f"Error adding tracks to playlist {playlist_id}: {str(e)}")
@@ -483,39 +1023,77 @@ def get_current_user(sp=None):
         print(f"Error getting current user: {str(e)}")
         return None
 
-def get_tracks_for_artists(artist_names, tracks_per_artist=3, randomize=True, user_id=None, sp=None):
+def get_tracks_for_artists(artist_names, tracks_per_artist=3, randomize=True, user_id=None, sp=None,
+                           market='US'):
     """
     Get top tracks for multiple artists.
 
+    Artists and their top tracks are read from the SQLite caches in two
+    batched queries. Each artist missing from either cache gets one task on
+    the lookup pool (search if needed, then top tracks), so a batch costs
+    about one Spotify round-trip per wave of SPOTIFY_LOOKUP_CONCURRENCY
+    artists. One artist failing or timing out only drops that artist.
+
     Args:
         artist_names: List of artist names
-        tracks_per_artist: Number of tracks per artist (1-5, default 3)
+        tracks_per_artist: Number of tracks per artist (1-10, default 3), or
+            a dict mapping artist names to their own count
         randomize: Whether to randomize track order (default True)
         user_id: Optional DailyJams user ID for per-user auth
         sp: Optional pre-authenticated Spotify client
+        market: Market/country code for top tracks (default: US)
 
     Returns:
         Dict mapping artist names to their track lists, plus list of all track URIs
     """
+    from database import get_artists_by_names, get_cached_top_tracks, save_top_tracks
+
     try:
         if sp is None:
             sp = get_spotify_client(user_id=user_id)
         if sp is None:
             return {'artists': {}, 'all_track_uris': [], 'error': 'Not authenticated'}
 
+        artist_names = list(dict.fromkeys(artist_names))
+        artists = get_artists_by_names(artist_names)
+        _record_artist_cache_lookup(artists, len(artist_names))
+        top_tracks = get_cached_top_tracks([artist['id'] for artist in artists.values() if artist], market)
+
+        def lookup(artist_name):
+            artist = artists[artist_name] if artist_name in artists else _search_spotify_artist(artist_name, sp)
+            if not artist:
+                return None, None
+            if artist['id'] in top_tracks:
+                return artist, None
+            return artist, _fetch_artist_top_tracks(artist['id'], market, sp)
+
+        pending = [name for name in artist_names
+                   if name not in artists or (artists[name] and artists[name]['id'] not in top_tracks)]
+        fetched = {}
+        for artist_name, result in zip(pending, _map_concurrently(lookup, pending)):
+            if result is None:
+                continue  # Lookup failed or timed out
+            artist, tracks = result
+            artists[artist_name] = artist
+            if tracks is not None:
+                fetched[artist['id']] = tracks
+        _record_top_tracks_cache_lookup(
+            sum(1 for artist in artists.values() if artist and artist['id'] in top_tracks), len(fetched)
+        )
+        save_top_tracks(market, fetched)
+        top_tracks.update(fetched)
+
         artists_tracks = {}
         all_track_uris = []
 
         for artist_name in artist_names:
-            # Search for artist
-            artist = search_artist(artist_name, sp)
-            if not artist:
+            artist = artists.get(artist_name)
+            if not artist or artist['id'] not in top_tracks:
                 print(f"Artist not found: {artist_name}")
                 continue
 
-            # Get top tracks
-            tracks = get_artist_top_tracks(artist['id'], limit=tracks_per_artist, sp=sp)
-
+            count = tracks_per_artist.get(artist_name, 3) if isinstance(tracks_per_artist, dict) else tracks_per_artist
+            tracks = top_tracks[artist['id']][:count]
             artists_tracks[artist_name] = {
                 'artist_info': artist,
                 'tracks': tracks
@@ -0,0 +1,219 @@
+"""
+Local stand-in for the Spotify Web API, for tests and benchmarks.
+
+Serves the endpoints DailyJams uses (search, top tracks, library, playlists)
+over HTTP on 127.0.0.1 with a configurable latency, and can answer 429 with
+Retry-After for a while. Point the app at it with SPOTIFY_API_URL:
+
+    with SpotifyStub(latency=0.05, saved_tracks=5000) as stub:
+        os.environ['SPOTIFY_API_URL'] = stub.url   # before importing http_client
+"""
+import json
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+def stub_id(kind, n):
+    """A Spotify-shaped (22 character base62) ID, e.g. stub_id('artist', 7)."""
+    return f'{kind}{n}'.ljust(22, '0')
+
+
+class SpotifyStub:
+    """
+    Fake Spotify Web API server.
+
+    Args:
+        latency: Seconds each request takes
+        saved_tracks: Size of the user's saved-track library (newest first)
+        library_artists: Distinct artists across the saved tracks
+        followed_artists: Number of followed artists
+
+    Attributes:
+        calls: Counter of requests per endpoint (e.g. calls['search'])
+        throttled: Number of 429s answered
+        playlists: Playlist ID -> {'name', 'tracks'} for created playlists
+    """
+
+    def __init__(self, latency=0.0, saved_tracks=0, library_artists=1500, followed_artists=0):
+        self.latency = latency
+        self.calls = Counter()
+        self.throttled = 0
+        self.playlists = {}
+        self.saved = [{
+            'added_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1767225600 - i * 60)),
+            'track': {'artists': [{'id': stub_id('artist', i % library_artists),
+                                   'name': f'Library Artist {i % library_artists}'}]}
+        } for i in range(saved_tracks)]
+        self.followed = [{'id': stub_id('followed', i), 'name': f'Followed Artist {i}', 'genres': ['indie']}
+                         for i in range(followed_artists)]
+        self._lock = threading.Lock()
+        self._throttle_until = 0
+        self._retry_after = 1
+        self._server = None
+
+    @property
+    def url(self):
+        """Base URL to use as SPOTIFY_API_URL."""
+        return f'http://127.0.0.1:{self._server.server_address[1]}/'
+
+    def throttle(self, seconds, retry_after=1):
+        """Answer every request with 429 and this Retry-After for the next `seconds`."""
+        with self._lock:
+            self._throttle_until = time.time() + seconds
+            self._retry_after = retry_after
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub._handle(self, 'GET')
+
+            def do_POST(self):
+                stub._handle(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---- Request handling ----
+
+    def _handle(self, handler, method):
+        time.sleep(self.latency)
+        url = urlsplit(handler.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length) or b'null') if length else None
+        path = url.path.rstrip('/')
+
+        with self._lock:
+            throttled = time.time() < self._throttle_until
+            if throttled:
+                self.throttled += 1
+            retry_after = self._retry_after
+        if throttled:
+            return self._reply(handler, 429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                               {'Retry-After': str(retry_after)})
+
+        for pattern, route_method, name in self._ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match and route_method == method:
+                with self._lock:
+                    self.calls[name] += 1
+                status, data = getattr(self, '_' + name)(query, body, *match.groups())
+                return self._reply(handler, status, data)
+        return self._reply(handler, 404, {'error': {'status': 404, 'message': 'Not found'}})
+
+    def _reply(self, handler, status, data, headers=None):
+        payload = json.dumps(data).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    _ROUTES = [
+        (r'/v1/search', 'GET', 'search'),
+        (r'/v1/artists/(\w+)/top-tracks', 'GET', 'top_tracks'),
+        (r'/v1/artists/(\w+)', 'GET', 'artist'),
+        (r'/v1/me', 'GET', 'me'),
+        (r'/v1/me/top/artists', 'GET', 'top_artists'),
+        (r'/v1/me/following', 'GET', 'following'),
+        (r'/v1/me/tracks', 'GET', 'saved_tracks'),
+        (r'/v1/users/(\w+)/playlists', 'POST', 'create_playlist'),
+        (r'/v1/playlists/(\w+)/tracks', 'GET', 'playlist_items'),
+        (r'/v1/playlists/(\w+)/tracks', 'POST', 'add_items'),
+        (r'/v1/playlists/(\w+)', 'GET', 'playlist'),
+    ]
+
+    def _artist_object(self, artist_id, name):
+        return {'id': artist_id, 'name': name, 'uri': f'spotify:artist:{artist_id}',
+                'external_urls': {'spotify': f'https://open.spotify.com/artist/{artist_id}'},
+                'images': [{'url': f'https://i.scdn.co/image/{artist_id}'}], 'genres': ['indie']}
+
+    def _search(self, query, body):
+        name = query.get('q', '').split(':', 1)[-1]
+        artist_id = stub_id('a', zlib.crc32(name.encode()))
+        return 200, {'artists': {'items': [self._artist_object(artist_id, name)]}}
+
+    def _artist(self, query, body, artist_id):
+        return 200, self._artist_object(artist_id, f'Artist {artist_id}')
+
+    def _top_tracks(self, query, body, artist_id):
+        return 200, {'tracks': [{
+            'id': stub_id(f't{i}', artist_id[:12]), 'name': f'Track {i}',
+            'uri': f'spotify:track:{stub_id(f"t{i}", artist_id[:12])}', 'preview_url': None,
+            'external_urls': {'spotify': 'https://open.spotify.com/track/x'},
+            'duration_ms': 180000, 'album': {'name': 'Album'}
+        } for i in range(10)]}
+
+    def _me(self, query, body):
+        return 200, {'id': 'stubuser', 'display_name': 'Stub User', 'external_urls': {'spotify': 'x'},
+                     'followers': {'total': 0}, 'images': []}
+
+    def _top_artists(self, query, body):
+        limit = int(query.get('limit', 20))
+        return 200, {'items': [{'id': stub_id('top', i), 'name': f'Top Artist {i}', 'genres': ['rock']}
+                               for i in range(limit)]}
+
+    def _following(self, query, body):
+        limit = int(query.get('limit', 20))
+        start = next((i + 1 for i, artist in enumerate(self.followed) if artist['id'] == query.get('after')), 0)
+        items = self.followed[start:start + limit]
+        more = start + limit < len(self.followed)
+        return 200, {'artists': {'items': items, 'next': 'more' if more else None,
+                                 'cursors': {'after': items[-1]['id'] if more else None}}}
+
+    def _saved_tracks(self, query, body):
+        limit, offset = int(query.get('limit', 20)), int(query.get('offset', 0))
+        return 200, {'items': self.saved[offset:offset + limit], 'total': len(self.saved), 'offset': offset,
+                     'next': 'more' if offset + limit < len(self.saved) else None}
+
+    def _create_playlist(self, query, body, user_id):
+        with self._lock:
+            playlist_id = stub_id('playlist', len(self.playlists))
+            self.playlists[playlist_id] = {'name': body['name'], 'tracks': []}
+        return 201, {'id': playlist_id, 'name': body['name'], 'uri': f'spotify:playlist:{playlist_id}',
+                     'external_urls': {'spotify': f'https://open.spotify.com/playlist/{playlist_id}'}}
+
+    def _playlist_items(self, query, body, playlist_id):
+        return 200, {'total': len(self.playlists[playlist_id]['tracks'])}
+
+    def _add_items(self, query, body, playlist_id):
+        uris = body if isinstance(body, list) else body['uris']
+        if len(uris) > 100:
+            return 400, {'error': {'status': 400, 'message': 'Too many ids requested'}}
+        with self._lock:
+            tracks = self.playlists[playlist_id]['tracks']
+            position = int(query.get('position', len(tracks)))
+            tracks[position:position] = uris
+            return 201, {'snapshot_id': f'snapshot{len(tracks)}'}
+
+    def _playlist(self, query, body, playlist_id):
+        playlist = self.playlists[playlist_id]
+        return 200, {'id': playlist_id, 'name': playlist['name'], 'uri': f'spotify:playlist:{playlist_id}',
+                     'external_urls': {'spotify': f'https://open.spotify.com/playlist/{playlist_id}'},
+                     'tracks': {'total': len(playlist['tracks'])}}
@@ -0,0 +1,61 @@
+"""Schema migrations (database.run_migrations) applied to a database from before the schema_version registry."""
+import pytest
+
+import database
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """A database migrated only up to per-suggestion user_preferences rows (before recommendation requests)."""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'legacy.db'))
+    for version, name, migrate in database.MIGRATIONS:
+        if name == 'recommendation requests':
+            break
+        migrate()
+    yield database.get_db_connection()
+    database.close_db_connection()
+
+
+def add_legacy_suggestion(conn, band_name, sources_used):
+    suggestion_id = conn.execute(
+        'INSERT INTO music_suggestions (band_name, sources_used, user_id) VALUES (?, ?, 1)',
+        (band_name, sources_used)
+    ).lastrowid
+    conn.execute('''
+        INSERT INTO user_preferences (suggestion_id, time_of_day, mood, tempo, instruments_yes, instruments_no)
+        VALUES (?, 'evening', 'calm', 3, '', '')
+    ''', (suggestion_id,))
+    conn.execute("INSERT INTO user_feedback (suggestion_id, feedback_type, user_id) VALUES (?, 'like', 1)",
+                 (suggestion_id,))
+    conn.commit()
+
+
+def sources_by_band(history):
+    return {row['band_name']: row['sources_used'] for row in history}
+
+
+def test_backfill_keeps_source_names_that_match_no_source(legacy_db):
+    known = legacy_db.execute('SELECT source_name FROM source_preferences ORDER BY id').fetchone()[0]
+    add_legacy_suggestion(legacy_db, 'Only Gone', 'Deleted Blog')
+    add_legacy_suggestion(legacy_db, 'Partly Gone', f'{known},Deleted Blog')
+    add_legacy_suggestion(legacy_db, 'All Known', known)
+
+    database.run_migrations()
+
+    assert sources_by_band(database.get_full_feedback_history(1)) == {
+        'Only Gone': 'Deleted Blog',
+        'Partly Gone': f'{known},Deleted Blog',
+        'All Known': known,
+    }
+
+
+def test_deleted_source_keeps_its_name_in_history(legacy_db):
+    database.run_migrations()
+    source_id = database.add_new_source('My Blog', 'https://example.com', 'A custom source')
+    suggestion_ids = database.save_recommendation_batch([{'band_name': 'Band'}], 'evening', 'calm', 3, [], [],
+                                                        [source_id], user_id=1)
+    database.save_feedback(suggestion_ids[0], 'like', 1)
+
+    database.delete_source(source_id)
+
+    assert sources_by_band(database.get_full_feedback_history(1)) == {'Band': 'My Blog'}
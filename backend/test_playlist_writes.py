@@ -0,0 +1,94 @@
+"""Chunked playlist writes (spotify_handler.write_playlist_tracks) against the local Spotify stub."""
+import pytest
+
+import database
+import http_client
+import spotify_handler
+from spotify_stub import SpotifyStub, stub_id
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """A Spotify stub with one empty playlist, a fresh DB with a DailyJams playlist and two suggestions."""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.run_migrations()
+    database.ensure_default_user()
+
+    with SpotifyStub() as stub:
+        monkeypatch.setattr(http_client, 'SPOTIFY_API_URL', stub.url)
+        monkeypatch.setattr(http_client, 'SPOTIFY_RATE_LIMIT_PER_SECOND', 1000)
+        monkeypatch.setattr(http_client, 'SPOTIFY_RATE_LIMIT_BURST', 1000)
+        monkeypatch.setattr(http_client, '_session', None)
+        monkeypatch.setattr(spotify_handler, 'PLAYLIST_CHUNK_RETRY_DELAY', 0)
+        stub.playlist_id = stub_id('playlist', 0)
+        stub.playlists[stub.playlist_id] = {'name': 'Mix', 'tracks': []}
+        stub.db_playlist_id = database.save_playlist('Mix', stub.playlist_id, 'url', 2, 0, user_id=1)
+        stub.suggestions = database.save_recommendation_batch(
+            [{'band_name': 'Band A'}, {'band_name': 'Band B'}], 'evening', 'calm', 3, [], [], user_id=1)
+        yield stub
+
+    database.close_db_connection()
+
+
+def fail_adds_after(stub, monkeypatch, chunks):
+    """Let `chunks` add-items calls through, then answer every further one with a 500."""
+    add_items = stub._add_items
+    calls = []
+
+    def failing(query, body, playlist_id):
+        calls.append(1)
+        if len(calls) > chunks:
+            return 500, {'error': {'status': 500, 'message': 'Server error'}}
+        return add_items(query, body, playlist_id)
+
+    monkeypatch.setattr(stub, '_add_items', failing)
+    return lambda: monkeypatch.setattr(stub, '_add_items', add_items)
+
+
+def write(stub, **kwargs):
+    sp = spotify_handler._new_spotify_client('token')
+    return spotify_handler.write_playlist_tracks(1, stub.playlist_id, kwargs.pop('tracks', None), sp, **kwargs)
+
+
+def recorded(stub):
+    playlist = database.get_playlist_with_details(stub.db_playlist_id)
+    return playlist['track_count'], set(database.get_bands_in_playlists(1))
+
+
+def test_resume_records_tracks_and_links_suggestions(stub, monkeypatch):
+    tracks = [f'spotify:track:{stub_id("t", i)}' for i in range(250)]
+    restore = fail_adds_after(stub, monkeypatch, chunks=1)
+
+    failed = write(stub, tracks=tracks, db_playlist_id=stub.db_playlist_id,
+                   suggestion_tracks=[(stub.suggestions[0], 150), (stub.suggestions[1], 100)])
+
+    assert not failed['success'] and failed['tracks_added'] == 100
+    assert recorded(stub) == (100, set())           # the chunk that landed, no links yet
+
+    restore()
+    resumed = write(stub, write_id=failed['write_id'])
+    assert resumed['success']
+    assert stub.playlists[stub.playlist_id]['tracks'] == tracks
+    assert recorded(stub) == (250, set(stub.suggestions))
+
+    # Resuming a finished write changes nothing
+    assert write(stub, write_id=failed['write_id'])['success']
+    assert recorded(stub) == (250, set(stub.suggestions))
+
+
+def test_resume_skips_a_first_chunk_that_landed_unanswered(stub, monkeypatch):
+    tracks = [f'spotify:track:{stub_id("t", i)}' for i in range(150)]
+    add_items = stub._add_items
+
+    def lost_response(query, body, playlist_id):
+        add_items(query, body, playlist_id)
+        return 500, {'error': {'status': 500, 'message': 'Server error'}}
+
+    monkeypatch.setattr(spotify_handler, 'PLAYLIST_CHUNK_RETRIES', 0)
+    monkeypatch.setattr(stub, '_add_items', lost_response)
+    failed = write(stub, tracks=tracks)
+    assert not failed['success'] and failed['tracks_added'] == 0
+
+    monkeypatch.setattr(stub, '_add_items', add_items)
+    assert write(stub, write_id=failed['write_id'])['success']
+    assert stub.playlists[stub.playlist_id]['tracks'] == tracks
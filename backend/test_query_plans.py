@@ -0,0 +1,31 @@
+"""Query plans of the hot read paths (database.explain_hot_queries) on a freshly migrated database."""
+import pytest
+
+import database
+
+
+@pytest.fixture
+def migrated_db(tmp_path, monkeypatch):
+    """A temporary database with every migration applied and the default user."""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.run_migrations()
+    database.ensure_default_user()
+    yield
+    database.close_db_connection()
+
+
+def test_hot_queries_use_indexes(migrated_db):
+    plans = database.explain_hot_queries()
+
+    assert all(plans.values())                  # every hot path issued a query
+    assert database.find_full_table_scans(plans) == []
+
+
+def test_full_table_scan_is_reported(migrated_db):
+    # match_reason isn't indexed, so this plan is a full scan
+    sql = 'SELECT id FROM music_suggestions WHERE match_reason = ?'
+    details = [row[3] for row in database.get_db_connection().execute(f'EXPLAIN QUERY PLAN {sql}', ('x',))]
+
+    scans = database.find_full_table_scans({'by_match_reason': [(sql, details)]})
+
+    assert [name for name, detail in scans] == ['by_match_reason']
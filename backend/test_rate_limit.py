@@ -0,0 +1,116 @@
+"""Spotify rate limiter (http_client._RateLimitedAdapter) against a local stub that returns 429s."""
+import time
+
+import pytest
+
+import database
+import http_client
+from spotify_stub import SpotifyStub, stub_id
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """A Spotify stub behind a fresh shared session with a fresh limiter DB and counters."""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.run_migrations()
+
+    with SpotifyStub() as stub:
+        monkeypatch.setattr(http_client, 'SPOTIFY_API_URL', stub.url)
+        monkeypatch.setattr(http_client, 'SPOTIFY_RATE_LIMIT_PER_SECOND', 100)
+        monkeypatch.setattr(http_client, 'SPOTIFY_RATE_LIMIT_BURST', 10)
+        monkeypatch.setattr(http_client, 'SPOTIFY_BACKGROUND_RESERVE', 5)
+        monkeypatch.setattr(http_client, 'SPOTIFY_RATE_LIMIT_LEASE', 5)
+        monkeypatch.setattr(http_client, '_session', None)
+        monkeypatch.setattr(http_client, '_rate_limit_stats', {
+            lane: {'granted': 0, 'queued': 0, 'shed': 0, 'wait_ms': 0} for lane in http_client.RATE_LIMIT_MAX_WAIT
+        } | {'throttled': 0, 'max_retry_after': 0, 'leases': 0})
+        yield stub
+
+    database.close_db_connection()
+
+
+def get_artist(stub, lane='interactive'):
+    with http_client.request_priority(lane):
+        return http_client.get_http_session().get(stub.url + 'v1/artists/x', timeout=5)
+
+
+def test_tokens_are_leased_in_batches(stub):
+    for _ in range(20):
+        assert get_artist(stub).status_code == 200
+
+    stats = http_client.get_rate_limit_stats()
+    assert stats['interactive']['granted'] == 20
+    assert stats['leases'] == 4                 # one database take per 5 calls
+
+
+def test_retry_after_blocks_bucket_then_retries(stub):
+    stub.throttle(0.2, retry_after=1)
+
+    started = time.time()
+    response = get_artist(stub)
+
+    assert response.status_code == 200
+    assert time.time() - started >= 1          # waited out Retry-After, not just the 0.2 s throttle
+    assert stub.throttled == 1                  # one 429, then no calls until the block ended
+    stats = http_client.get_rate_limit_stats()
+    assert stats['throttled'] == 1
+    assert stats['max_retry_after'] == 1
+    assert stats['interactive']['granted'] == 2
+    assert stats['interactive']['queued'] == 1
+
+
+def test_block_applies_to_other_callers(stub):
+    stub.throttle(0.1, retry_after=1)
+    assert get_artist(stub).status_code == 200
+
+    # Bucket was refilled only from the end of the block: a fresh caller isn't throttled again
+    assert get_artist(stub).status_code == 200
+    assert stub.throttled == 1
+
+
+def test_interactive_shed_when_retry_after_exceeds_max_wait(stub, monkeypatch):
+    monkeypatch.setitem(http_client.RATE_LIMIT_MAX_WAIT, 'interactive', 0.5)
+    stub.throttle(5, retry_after=10)
+
+    started = time.time()
+    with pytest.raises(http_client.RateLimited):
+        get_artist(stub)
+
+    assert time.time() - started < 1
+    stats = http_client.get_rate_limit_stats()
+    assert stats['interactive']['shed'] == 1
+    assert stats['throttled'] == 1
+    assert stats['max_retry_after'] == 10
+
+
+def test_background_leaves_reserve_for_interactive(stub, monkeypatch):
+    monkeypatch.setattr(http_client, 'SPOTIFY_RATE_LIMIT_PER_SECOND', 0.01)   # no refill during the test
+    monkeypatch.setitem(http_client.RATE_LIMIT_MAX_WAIT, 'background', 0.1)
+
+    # Burst of 10 with a reserve of 5: background gets 5, then is shed
+    for _ in range(5):
+        assert get_artist(stub, 'background').status_code == 200
+    with pytest.raises(http_client.RateLimited):
+        get_artist(stub, 'background')
+
+    # ...while interactive still gets the reserved tokens
+    for _ in range(5):
+        assert get_artist(stub).status_code == 200
+    with pytest.raises(http_client.RateLimited):
+        get_artist(stub)
+
+    stats = http_client.get_rate_limit_stats()
+    assert stats['background'] == {'granted': 5, 'queued': 0, 'shed': 1, 'wait_ms': 0}
+    assert stats['interactive']['granted'] == 5
+    assert stats['interactive']['shed'] == 1
+    assert stats['throttled'] == 0
+
+
+def test_spotify_client_follows_api_url_override(stub):
+    import spotify_handler
+
+    sp = spotify_handler._new_spotify_client('token')
+
+    assert sp.artist(stub_id('artist', 1))['id'] == stub_id('artist', 1)
+    assert stub.calls['artist'] == 1
+    assert http_client.get_rate_limit_stats()['interactive']['granted'] == 1
@@ -10,6 +10,8 @@ let swipePlaylistCandidates = [];
 let lastRequestData = null;
 let spotifyAuthenticated = false;
 let spotifyAuthChecked = false;  // Track if auth check is complete
+let batchStreaming = false;       // Cards of the current batch are still arriving
+let batchSaved = Promise.resolve();  // Resolves once the current batch has suggestion IDs
 
 // Swipe gesture state
 let isDragging = false;
@@ -133,11 +135,7 @@ async function handleSpotifyResync() {
     actionBtn.disabled = true;
 
     try {
-        const response = await fetch('/api/spotify/sync', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' }
-        });
-        const data = await response.json();
+        const data = await runTasteSync();
 
         if (data.success) {
             actionBtn.textContent = 'Synced!';
@@ -201,24 +199,8 @@ async function loadPreferencesAndStart() {
         // Show loading
         document.getElementById('loading').classList.remove('hidden');
 
-        // Call API
-        const response = await fetch('/api/recommend', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(preferences)
-        });
-
-        const data = await response.json();
-
-        if (data.success) {
-            displaySwipeBatch(data.recommendations);
-        } else {
-            alert('Error getting recommendations: ' + data.error);
-            document.getElementById('loading').classList.add('hidden');
-            document.getElementById('no-preferences').classList.remove('hidden');
-        }
+        // Call API - cards are shown as they stream in
+        await requestRecommendationBatch(preferences);
     } catch (error) {
         console.error('Error loading preferences:', error);
         alert('Error: ' + error.message);
@@ -288,23 +270,149 @@ function initializeSwipeUI() {
     }
 }
 
-// Display recommendations in swipe mode
-function displaySwipeBatch(recommendations) {
+// Request a batch of recommendations, showing cards as they stream in.
+// Resolves once the first card is shown (or the batch is complete);
+// rejects if no card could be loaded.
+function requestRecommendationBatch(preferences) {
+    return new Promise((resolve, reject) => {
+        let resolveSaved;
+        batchSaved = new Promise(r => { resolveSaved = r; });
+        batchStreaming = true;
+        let received = 0;
+
+        const finish = () => {
+            batchStreaming = false;
+            resolveSaved();
+            // The user may already be waiting past the last card
+            if (received > 0 && currentCardIndex >= currentBatch.length) {
+                document.getElementById('loading').classList.add('hidden');
+                showEndCard();
+            }
+        };
+
+        streamRecommendations(preferences, {
+            card: ({ index, recommendation }) => {
+                received++;
+                if (index === 0) {
+                    startSwipeBatch();
+                    resolve();
+                }
+                addSwipeCard(recommendation);
+            },
+            saved: ({ ids }) => applySuggestionIds(ids),
+            done: finish,
+            error: ({ error }) => {
+                finish();
+                if (received === 0) {
+                    reject(new Error(error));
+                }
+            }
+        }).then(() => {
+            if (batchStreaming) {
+                // Stream ended without a done/error event
+                finish();
+            }
+            if (received === 0) {
+                reject(new Error('No recommendations returned'));
+            }
+        }).catch(error => {
+            finish();
+            if (received === 0) {
+                reject(error);
+            }
+        });
+    });
+}
+
+// POST to the streaming endpoint and dispatch each Server-Sent Event to handlers[event]
+async function streamRecommendations(preferences, handlers) {
+    const response = await fetch('/api/recommend/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(preferences)
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`Request failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+
+            if (handlers[eventName]) {
+                handlers[eventName](data ? JSON.parse(data) : {});
+            }
+        }
+    }
+}
+
+// Start an empty swipe batch that streamed cards are appended to
+function startSwipeBatch() {
     document.getElementById('loading').classList.add('hidden');
-    currentBatch = recommendations;
+    document.getElementById('swipe-end-card').classList.add('hidden');
+    document.getElementById('swipe-discovery').classList.remove('hidden');
+    currentBatch = [];
     currentCardIndex = 0;
+}
 
-    // Show swipe container
-    document.getElementById('swipe-discovery').classList.remove('hidden');
-    document.getElementById('swipe-end-card').classList.add('hidden');
+// Append a streamed card, rendering it if the user is waiting for it
+function addSwipeCard(rec) {
+    currentBatch.push(rec);
+    sessionExcluded.add(rec.band_name);
+
+    if (currentCardIndex === currentBatch.length - 1) {
+        document.getElementById('loading').classList.add('hidden');
+        renderSwipeCards();
+    }
+    updateSwipeCounter();
+}
 
-    // Add all to session excluded
-    recommendations.forEach(rec => {
-        sessionExcluded.add(rec.band_name);
+// Attach suggestion IDs once the streamed batch has been saved
+function applySuggestionIds(ids) {
+    ids.forEach((id, index) => {
+        if (currentBatch[index]) {
+            currentBatch[index].id = id;
+        }
     });
 
-    renderSwipeCards();
-    updateSwipeCounter();
+    const topCard = document.querySelector('.swipe-card');
+    if (topCard && currentBatch[topCard.dataset.index]) {
+        topCard.dataset.id = currentBatch[topCard.dataset.index].id;
+    }
+
+    // Cards swiped right before they had an ID
+    swipePlaylistCandidates.forEach(candidate => {
+        if (!candidate.id) {
+            const rec = currentBatch.find(r => r.band_name === candidate.name);
+            if (rec) {
+                candidate.id = rec.id;
+            }
+        }
+    });
 }
 
 // Render swipe cards - only show current card
@@ -325,7 +433,9 @@ function createSwipeCard(rec, index) {
     const card = document.createElement('div');
     card.className = 'swipe-card';
     card.dataset.index = index;
-    card.dataset.id = rec.id;
+    if (rec.id) {
+        card.dataset.id = rec.id;
+    }
     card.dataset.name = rec.band_name;
 
     let imageHTML = '';
@@ -546,7 +656,13 @@ function advanceCard() {
     currentCardIndex++;
 
     if (currentCardIndex >= currentBatch.length) {
-        showEndCard();
+        if (batchStreaming) {
+            // Next card is still being generated - it renders when it arrives
+            document.getElementById('swipe-cards').innerHTML = '';
+            document.getElementById('loading').classList.remove('hidden');
+        } else {
+            showEndCard();
+        }
     } else {
         renderSwipeCards();
         updateSwipeCounter();
@@ -628,9 +744,16 @@ async function handleSubmenuFeedback(e) {
         return;
     }
 
-    const suggestionId = topCard.dataset.id;
+    let suggestionId = topCard.dataset.id;
 
     try {
+        if (!suggestionId) {
+            // Card arrived over the stream before the batch was saved
+            const rec = currentBatch[topCard.dataset.index];
+            await batchSaved;
+            suggestionId = rec.id;
+        }
+
         await fetch('/api/feedback', {
             method: 'POST',
             headers: {
@@ -670,28 +793,11 @@ async function generateMoreRecommendations() {
     `;
 
     try {
-        const response = await fetch('/api/recommend', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(lastRequestData)
-        });
-
-        const data = await response.json();
-
-        if (data.success) {
-            generateBtn.disabled = false;
-            generateBtn.innerHTML = originalContent;
-            document.getElementById('swipe-end-card').classList.add('hidden');
-            displaySwipeBatch(data.recommendations);
-        } else {
-            alert('Error getting recommendations: ' + data.error);
-            generateBtn.disabled = false;
-            generateBtn.innerHTML = originalContent;
-        }
+        await requestRecommendationBatch(lastRequestData);
+        generateBtn.disabled = false;
+        generateBtn.innerHTML = originalContent;
     } catch (error) {
-        alert('Error: ' + error.message);
+        alert('Error getting recommendations: ' + error.message);
         generateBtn.disabled = false;
         generateBtn.innerHTML = originalContent;
     }
@@ -1027,7 +1133,7 @@ async function createPlaylistFromModal(modal, selectedBands) {
             body: JSON.stringify(requestData)
         });
 
-        const data = await response.json();
+        const data = await resumePlaylistWriteIfNeeded(await response.json());
 
         if (data.success) {
             alert(`Playlist "${data.playlist.name}" created successfully!\n${data.playlist.track_count} tracks added.`);
@@ -1,7 +1,11 @@
 // State
-let allHistory = [];
+let loadedHistory = [];
+let nextCursor = null;
+let hasMoreHistory = false;
+let historyRequestId = 0;  // Ignore responses from superseded requests
 let currentFilter = 'all';
 let searchTerm = '';
+let searchDebounceTimer = null;
 let advancedFilters = {
     time: '',
     tempo: '',
@@ -19,6 +23,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeFilters();
     initializeSearch();
     initializeAdvancedFilters();
+    initializeLoadMore();
     checkSpotifyAuth();
     restorePlaylistSelectionsAfterOAuth();
 });
@@ -66,16 +71,42 @@ async function loadCurrentUser() {
     }
 }
 
-// Load history from API
+// Build the /api/history URL for the current filters (filtering happens server-side)
+function buildHistoryUrl(cursor = null) {
+    const params = new URLSearchParams();
+
+    if (cursor) params.set('cursor', cursor);
+    if (currentFilter !== 'all') params.set('feedback_type', currentFilter);
+    if (searchTerm) params.set('q', searchTerm);
+    if (advancedFilters.time) params.set('time_of_day', advancedFilters.time);
+    if (advancedFilters.tempo) params.set('tempo', advancedFilters.tempo);
+    if (advancedFilters.genre) params.set('genre', advancedFilters.genre);
+    if (advancedFilters.mood) params.set('mood', advancedFilters.mood);
+
+    const query = params.toString();
+    return query ? `/api/history?${query}` : '/api/history';
+}
+
+// Load the first page of history for the current filters
 async function loadHistory() {
+    const requestId = ++historyRequestId;
+
     try {
-        const response = await fetch('/api/history');
+        const response = await fetch(buildHistoryUrl());
         const data = await response.json();
-        
+
+        if (requestId !== historyRequestId) {
+            return;  // A newer filter change already replaced this request
+        }
+
         if (data.success) {
-            allHistory = data.history;
-            updateStats();
-            displayHistory();
+            loadedHistory = data.history;
+            nextCursor = data.next_cursor;
+            hasMoreHistory = data.has_more;
+            if (data.stats) {
+                updateStats(data.stats);
+            }
+            displayHistory(data.history, false);
         } else {
             alert('Error loading history: ' + data.error);
         }
@@ -88,19 +119,54 @@ async function loadHistory() {
     }
 }
 
-// Update statistics
-function updateStats() {
-    const total = allHistory.length;
-    const loved = allHistory.filter(h => h.feedback_type === 'positive').length;
-    const savedLater = allHistory.filter(h => h.feedback_type === 'save_later').length;
-    const skipped = allHistory.filter(h => h.feedback_type === 'skipped').length;
-    const disliked = allHistory.filter(h => h.feedback_type === 'negative').length;
-
-    document.getElementById('total-count').textContent = total;
-    document.getElementById('loved-count').textContent = loved;
-    document.getElementById('saved-later-count').textContent = savedLater;
-    document.getElementById('skipped-count').textContent = skipped;
-    document.getElementById('disliked-count').textContent = disliked;
+// Load the next page and append it
+async function loadMoreHistory() {
+    if (!hasMoreHistory || !nextCursor) {
+        return;
+    }
+
+    const requestId = historyRequestId;
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    loadMoreBtn.disabled = true;
+    loadMoreBtn.textContent = 'Loading...';
+
+    try {
+        const response = await fetch(buildHistoryUrl(nextCursor));
+        const data = await response.json();
+
+        if (requestId !== historyRequestId) {
+            return;
+        }
+
+        if (data.success) {
+            loadedHistory = loadedHistory.concat(data.history);
+            nextCursor = data.next_cursor;
+            hasMoreHistory = data.has_more;
+            displayHistory(data.history, true);
+        } else {
+            alert('Error loading history: ' + data.error);
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Failed to load more history');
+    } finally {
+        loadMoreBtn.disabled = false;
+        loadMoreBtn.textContent = 'Load More';
+    }
+}
+
+// Initialize load more button
+function initializeLoadMore() {
+    document.getElementById('load-more-btn').addEventListener('click', loadMoreHistory);
+}
+
+// Update statistics (counts come from the server's aggregate query)
+function updateStats(stats) {
+    document.getElementById('total-count').textContent = stats.total;
+    document.getElementById('loved-count').textContent = stats.positive;
+    document.getElementById('saved-later-count').textContent = stats.save_later;
+    document.getElementById('skipped-count').textContent = stats.skipped;
+    document.getElementById('disliked-count').textContent = stats.negative;
 }
 
 // Initialize filter buttons
@@ -118,8 +184,8 @@ function initializeFilters() {
             // Update filter
             currentFilter = this.getAttribute('data-filter');
             
-            // Re-display with new filter
-            displayHistory();
+            // Reload with new filter
+            loadHistory();
         });
     });
 }
@@ -129,8 +195,11 @@ function initializeSearch() {
     const searchInput = document.getElementById('search-input');
 
     searchInput.addEventListener('input', function() {
-        searchTerm = this.value.toLowerCase();
-        displayHistory();
+        searchTerm = this.value.trim();
+
+        // Wait for typing to pause before hitting the server
+        clearTimeout(searchDebounceTimer);
+        searchDebounceTimer = setTimeout(loadHistory, 300);
     });
 }
 
@@ -156,9 +225,9 @@ function initializeAdvancedFilters() {
     applyBtn.addEventListener('click', function() {
         advancedFilters.time = document.getElementById('filter-time').value;
         advancedFilters.tempo = document.getElementById('filter-tempo').value;
-        advancedFilters.genre = document.getElementById('filter-genre').value.toLowerCase().trim();
-        advancedFilters.mood = document.getElementById('filter-mood').value.toLowerCase().trim();
-        displayHistory();
+        advancedFilters.genre = document.getElementById('filter-genre').value.trim();
+        advancedFilters.mood = document.getElementById('filter-mood').value.trim();
+        loadHistory();
     });
 
     // Clear filters
@@ -168,73 +237,44 @@ function initializeAdvancedFilters() {
         document.getElementById('filter-genre').value = '';
         document.getElementById('filter-mood').value = '';
         advancedFilters = { time: '', tempo: '', genre: '', mood: '' };
-        displayHistory();
+        loadHistory();
     });
 }
 
-// Display history with current filter and search
-function displayHistory() {
+// Display a page of history (replacing the list, or appending when loading more)
+function displayHistory(items, append) {
     const container = document.getElementById('history-container');
     const noResults = document.getElementById('no-results');
+    const loadMoreBtn = document.getElementById('load-more-btn');
 
-    // Filter history
-    let filteredHistory = allHistory;
-
-    // Apply feedback type filter
-    if (currentFilter !== 'all') {
-        filteredHistory = filteredHistory.filter(h => h.feedback_type === currentFilter);
-    }
-
-    // Apply search filter
-    if (searchTerm) {
-        filteredHistory = filteredHistory.filter(h =>
-            h.band_name.toLowerCase().includes(searchTerm)
-        );
-    }
-
-    // Apply advanced filters
-    if (advancedFilters.time) {
-        filteredHistory = filteredHistory.filter(h => h.time_of_day === advancedFilters.time);
-    }
-
-    if (advancedFilters.tempo) {
-        filteredHistory = filteredHistory.filter(h => h.tempo && h.tempo.toString() === advancedFilters.tempo);
-    }
-
-    if (advancedFilters.genre) {
-        filteredHistory = filteredHistory.filter(h =>
-            h.genre && h.genre.toLowerCase().includes(advancedFilters.genre)
-        );
+    if (!append) {
+        container.innerHTML = '';
     }
 
-    if (advancedFilters.mood) {
-        filteredHistory = filteredHistory.filter(h =>
-            h.mood && h.mood.toLowerCase().includes(advancedFilters.mood)
-        );
-    }
-    
-    // Clear container
-    container.innerHTML = '';
-    
     // Show/hide no results message
-    if (filteredHistory.length === 0) {
+    if (loadedHistory.length === 0) {
         noResults.classList.remove('hidden');
-        return;
     } else {
         noResults.classList.add('hidden');
     }
-    
+
+    loadMoreBtn.classList.toggle('hidden', !hasMoreHistory);
+
     // Create cards for each item
-    filteredHistory.forEach(item => {
-        const card = createHistoryCard(item);
-        container.appendChild(card);
+    const newCards = document.createDocumentFragment();
+    items.forEach(item => {
+        newCards.appendChild(createHistoryCard(item));
     });
+    const cards = Array.from(newCards.children);
+    container.appendChild(newCards);
 
-    // Initialize change rating buttons
-    initializeChangeRatingButtons();
+    cards.forEach(card => {
+        // Initialize change rating buttons
+        initializeChangeRatingButtons(card);
 
-    // Initialize playlist checkboxes
-    initializePlaylistCheckboxes();
+        // Initialize playlist checkboxes
+        initializePlaylistCheckboxes(card);
+    });
 }
 
 // Create a history card
@@ -291,7 +331,7 @@ function createHistoryCard(item) {
 
         <div class="spotify-link-container">
             <label class="playlist-checkbox-label">
-                <input type="checkbox" class="playlist-checkbox" data-band-id="${item.id}" data-band-name="${item.band_name}">
+                <input type="checkbox" class="playlist-checkbox" data-band-id="${item.id}" data-band-name="${item.band_name}" ${selectedForPlaylist.has(JSON.stringify({ id: String(item.id), name: item.band_name })) ? 'checked' : ''}>
                 <span>Add to Playlist</span>
             </label>
         </div>
@@ -307,8 +347,8 @@ function createHistoryCard(item) {
     return card;
 }
 // Initialize change rating buttons
-function initializeChangeRatingButtons() {
-    const changeButtons = document.querySelectorAll('.btn-change-rating');
+function initializeChangeRatingButtons(root = document) {
+    const changeButtons = root.querySelectorAll('.btn-change-rating');
     
     changeButtons.forEach(button => {
         button.addEventListener('click', async function() {
@@ -401,11 +441,7 @@ async function handleSpotifyResync() {
     actionBtn.disabled = true;
 
     try {
-        const response = await fetch('/api/spotify/sync', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' }
-        });
-        const data = await response.json();
+        const data = await runTasteSync();
 
         if (data.success) {
             actionBtn.textContent = 'Synced!';
@@ -500,8 +536,8 @@ function restorePlaylistSelectionsAfterOAuth() {
 }
 
 // Initialize Playlist Checkboxes
-function initializePlaylistCheckboxes() {
-    const checkboxes = document.querySelectorAll('.playlist-checkbox');
+function initializePlaylistCheckboxes(root = document) {
+    const checkboxes = root.querySelectorAll('.playlist-checkbox');
 
     checkboxes.forEach(checkbox => {
         checkbox.addEventListener('change', function() {
@@ -823,7 +859,7 @@ async function createPlaylistFromModal(modal, selectedBands) {
             body: JSON.stringify(requestData)
         });
 
-        const data = await response.json();
+        const data = await resumePlaylistWriteIfNeeded(await response.json());
 
         if (data.success) {
             alert(`Playlist "${data.playlist.name}" created successfully!\n${data.playlist.track_count} tracks added.`);
@@ -626,11 +626,7 @@ async function handleSpotifyResync() {
     actionBtn.disabled = true;
 
     try {
-        const response = await fetch('/api/spotify/sync', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' }
-        });
-        const data = await response.json();
+        const data = await runTasteSync();
 
         if (data.success) {
             actionBtn.textContent = 'Synced!';
@@ -1086,7 +1082,7 @@ async function createPlaylistFromModal(modal, selectedBands) {
             body: JSON.stringify(requestData)
         });
 
-        const data = await response.json();
+        const data = await resumePlaylistWriteIfNeeded(await response.json());
 
         if (data.success) {
             alert(`Playlist "${data.playlist.name}" created successfully!\n${data.playlist.track_count} tracks added.`);
@@ -401,11 +401,7 @@ async function handleHeaderSpotifyResync() {
     actionBtn.disabled = true;
 
     try {
-        const response = await fetch('/api/spotify/sync', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' }
-        });
-        const data = await response.json();
+        const data = await runTasteSync();
 
         if (data.success) {
             actionBtn.textContent = 'Synced!';
@@ -552,10 +548,11 @@ async function syncSpotifyTaste() {
     statusEl.textContent = 'Syncing your taste data...';
 
     try {
-        const response = await fetch('/api/spotify/sync', {
-            method: 'POST'
+        const data = await runTasteSync(job => {
+            const phases = Object.values(job.phases);
+            const finished = phases.filter(phase => phase.status === 'done' || phase.status === 'failed').length;
+            statusEl.textContent = `Syncing your taste data... (${finished}/${phases.length} steps)`;
         });
-        const data = await response.json();
 
         if (data.success) {
             // Show success
@@ -0,0 +1,43 @@
+// ===========================================
+// SPOTIFY - Helpers shared by every page
+// ===========================================
+
+// Offer to finish a playlist write that failed partway; returns the final response data.
+async function resumePlaylistWriteIfNeeded(data) {
+    while (!data.success && data.resumable && confirm(`${data.error}\n\nRetry adding the remaining tracks?`)) {
+        const response = await fetch(`/api/spotify/playlist-writes/${data.write_id}/resume`, { method: 'POST' });
+        data = await response.json();
+    }
+    return data;
+}
+
+// Start a taste sync and wait for the background job to finish.
+// onProgress (optional) is called with the job on every poll.
+async function runTasteSync(onProgress = null) {
+    const response = await fetch('/api/spotify/sync', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    });
+    const data = await response.json();
+    if (!data.success) {
+        return data;
+    }
+
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const statusResponse = await fetch(`/api/spotify/sync/${data.job_id}`);
+        const status = await statusResponse.json();
+        if (!status.success) {
+            return status;
+        }
+        if (onProgress) {
+            onProgress(status.job);
+        }
+        if (status.job.status === 'done') {
+            return status.job.result;
+        }
+        if (status.job.status === 'failed') {
+            return { success: false, error: status.job.error };
+        }
+    }
+}